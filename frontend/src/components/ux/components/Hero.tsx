@@ -108,29 +108,6 @@ const features = [
   { title: 'Tool Recommendation Engine', description: 'Suggests exact tools needed: pruners, mower, rake, etc.', components: 'Reasoning Layer', hardware: 'CPU/GPU' },
 ];
 
-const SYSTEM_PROMPT = `You are GardenWatchAI, a Garden/Park Maintenance Assistant. You analyze photos of gardens, parks, or green spaces and instantly report maintenance issues, required tools from AL-KO's smart garden tools, and prioritized actions. When recommending tools, use ONLY the following AL-KO garden tools:
-
-- Rasenmäher (Lawn mowers): For mowing lawns to maintain a healthy, well-groomed lawn.
-- Rasentraktoren (Ride-on mowers): For mowing larger or uneven lawns.
-- Vertikutierer (Aerators): For aerating lawns to improve health and growth.
-- Motorsensen (Brush cutters): For trimming grass, weeds, or rough areas.
-- Rasentrimmer (Grass trimmers): For precise trimming around edges or obstacles.
-- Mähroboter (Robotic mowers): For automated lawn mowing using modern technology.
-- Multitool: Versatile tool for performing various garden tasks with one device.
-- Combigerät (Multi-tool device): For loosening soil and other ground maintenance.
-- Motorhacken (Motor hoe): For tilling and cultivating soil to prepare garden beds.
-
-Output Format: STRICT JSON ONLY – no extra text, no markdown, no code blocks.
-
-JSON Schema:
-{
-  "overall_condition": "excellent | good | fair | poor | neglected | not_applicable",
-  "maintenance_issues": [ { "issue": "string", "location_description": "string", "severity": "low | medium | high | critical", "recommended_action": "string" } ],
-  "required_tools": [ { "tool_name": "string", "purpose": "string", "priority": "immediate | soon | optional" } ],
-  "general_advice": "string (max 120 characters)",
-  "confidence": 0.0
-}`;
-
 export default function Hero() {
   const [uploading, setUploading] = useState(false);
   const [result, setResult] = useState(null);
@@ -145,7 +122,7 @@ export default function Hero() {
     const formData = new FormData();
     formData.append('file', file);
     formData.append('text', 'Analyze this garden or park photo');
-    formData.append('system_prompt', SYSTEM_PROMPT);
+    formData.append('prompt_id', 'garden-watch');
     formData.append('lat', '52.52'); formData.append('lon', '13.405');
 
     try {
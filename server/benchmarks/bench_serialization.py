@@ -0,0 +1,117 @@
+# File: benchmarks/bench_serialization.py
+"""Capture list serialization: Pydantic + json.dumps versus the orjson fast path.
+
+Run from the server directory:
+    python benchmarks/bench_serialization.py [--rows 100 1000 10000] [--image-bytes 20000]
+
+For each row count, times the default FastAPI path (validate every row into
+UserCaptureResponse, dump in JSON mode, json.dumps) against
+serialization.capture_to_dict + dumps, and reports gzip/brotli sizes and
+compression times for the resulting body. Prints a JSON report.
+"""
+import argparse
+import base64
+import contextlib
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import zlib
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# Importing the models opens the database; keep it away from the real one
+os.environ.setdefault("SQLITE_DB_PATH", str(Path(tempfile.mkdtemp(prefix="gardenia-bench-")) / "app.db"))
+
+import brotli  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+with contextlib.redirect_stdout(sys.stderr):  # SQL echo from creating the tables
+    from schemas import UserCaptureResponse  # noqa: E402
+    from serialization import capture_to_dict, dumps  # noqa: E402
+
+
+def make_rows(count: int, image_bytes: int) -> list:
+    base = datetime(2025, 6, 1, 8, 0, 0)
+    rows = []
+    for i in range(count):
+        image = base64.b64encode(random.randbytes(image_bytes)).decode("ascii")
+        rows.append(SimpleNamespace(
+            id=i + 1,
+            user_id=f"user-{i % 50}",
+            query_text="Analyze this garden or park photo",
+            image=image,
+            latitude=52.52 + random.uniform(-0.01, 0.01),
+            longitude=13.405 + random.uniform(-0.01, 0.01),
+            ai_response=json.dumps({"overall_condition": "fair", "maintenance_issues": [], "confidence": 0.8}),
+            created_at=base + timedelta(seconds=i * 37, microseconds=i),
+        ))
+    return rows
+
+
+def best_of(fn, repeat: int):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--image-bytes", type=int, default=20000, help="Raw image size before base64")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    adapter = TypeAdapter(List[UserCaptureResponse])
+
+    def pydantic_path(rows):
+        models = adapter.validate_python(rows, from_attributes=True)
+        content = adapter.dump_python(models, mode="json", by_alias=True)
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+    def fast_path(rows):
+        return dumps([capture_to_dict(row) for row in rows])
+
+    results = []
+    for count in args.rows:
+        rows = make_rows(count, args.image_bytes)
+        pydantic_s, pydantic_body = best_of(lambda: pydantic_path(rows), args.repeat)
+        fast_s, fast_body = best_of(lambda: fast_path(rows), args.repeat)
+        if json.loads(pydantic_body) != json.loads(fast_body):
+            raise SystemExit(f"Fast path output differs from the Pydantic path at {count} rows")
+
+        gzip_s, gzip_body = best_of(lambda: zlib.compress(fast_body, 6), args.repeat)
+        br_s, br_body = best_of(lambda: brotli.compress(fast_body, quality=4), args.repeat)
+        entry = {
+            "rows": count,
+            "body_bytes": len(fast_body),
+            "pydantic_ms": round(pydantic_s * 1000, 2),
+            "fast_ms": round(fast_s * 1000, 2),
+            "speedup": round(pydantic_s / fast_s, 2) if fast_s else None,
+            "gzip_bytes": len(gzip_body),
+            "gzip_ms": round(gzip_s * 1000, 2),
+            "brotli_bytes": len(br_body),
+            "brotli_ms": round(br_s * 1000, 2),
+        }
+        results.append(entry)
+
+    report = {
+        "encoder": "orjson",
+        "image_bytes": args.image_bytes,
+        "results": results,
+    }
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# File: benchmarks/bench_structured_output.py
+"""Compare the legacy greedy-regex JSON extraction with structured_output.
+
+Run from the server directory:
+    python benchmarks/bench_structured_output.py [--iterations 2000]
+
+Prints a JSON report: per-case outcome for both parsers, overall recovery
+rates, and mean parse time per call in microseconds.
+The corpus is synthetic (see README.md), so the rates are not a measure of
+production failure frequency.
+"""
+import argparse
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from structured_output import extract_json, validate, StructuredOutputError, LAWN_PLAN_SCHEMA  # noqa: E402
+
+CORPUS = Path(__file__).resolve().parent / "corpus" / "malformed_outputs.jsonl"
+
+
+def legacy_parse(raw: str) -> dict:
+    json_match = re.search(r"\{.*\}", raw, re.DOTALL)
+    if not json_match:
+        raise ValueError("Model failed to return valid JSON")
+    return json.loads(json_match.group(0))
+
+
+def tolerant_parse(raw: str) -> dict:
+    return extract_json(raw)
+
+
+def outcome(parser, raw: str) -> str:
+    try:
+        result = parser(raw)
+    except (ValueError, StructuredOutputError):
+        return "parse_error"
+    return "ok" if not validate(result, LAWN_PLAN_SCHEMA) else "schema_error"
+
+
+def time_per_call(parser, raws, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for raw in raws:
+            try:
+                parser(raw)
+            except (ValueError, StructuredOutputError):
+                pass
+    return (time.perf_counter() - start) / (iterations * len(raws)) * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--corpus", type=Path, default=CORPUS)
+    args = parser.parse_args(argv)
+
+    cases = [json.loads(line) for line in args.corpus.read_text(encoding="utf-8").splitlines() if line.strip()]
+    raws = [case["raw"] for case in cases]
+
+    report = {"cases": [], "summary": {}}
+    for case in cases:
+        report["cases"].append({
+            "id": case["id"],
+            "legacy": outcome(legacy_parse, case["raw"]),
+            "tolerant": outcome(tolerant_parse, case["raw"]),
+        })
+    for name, fn in (("legacy", legacy_parse), ("tolerant", tolerant_parse)):
+        ok = sum(1 for c in report["cases"] if c[name] == "ok")
+        report["summary"][name] = {
+            "ok": ok,
+            "total": len(cases),
+            "recovery_rate": round(ok / len(cases), 3),
+            "us_per_call": round(time_per_call(fn, raws, args.iterations), 2),
+        }
+    # Every case the tolerant parser cannot recover still costs a re-prompt
+    report["summary"]["reprompts_avoided"] = (
+        report["summary"]["tolerant"]["ok"] - report["summary"]["legacy"]["ok"]
+    )
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+# File: benchmarks/load_test.py
+"""End-to-end load test: the FastAPI app against the stub model server.
+
+Starts benchmarks/stub_model_server.py and main:app as subprocesses on a
+fresh SQLite database, drives a weighted mix of uploads, list reads,
+time-range queries and /analyze-lawn calls, then prints a JSON report with
+throughput, p50/p95/p99 latency per operation, peak RSS of the app process
+and the database size. Compare reports between commits to catch regressions.
+
+    python benchmarks/load_test.py --duration 30 --concurrency 16 > bench.json
+"""
+import argparse
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import requests
+from PIL import Image
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+
+DEFAULT_MIX = {
+    "upload": 2,
+    "list": 5,
+    "time_range": 2,
+    "analyze_lawn": 1,
+}
+
+
+def make_image(width: int, height: int, quality: int = 90) -> bytes:
+    """A noisy JPEG so compressed size is close to a real phone photo."""
+    noise = Image.effect_noise((width, height), 64)
+    gradient = Image.linear_gradient("L").resize((width, height))
+    img = Image.merge("RGB", (noise, gradient, noise))
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def percentile(sorted_values, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q / 100 * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def peak_rss_kb(pid: int) -> int:
+    """Peak resident set size (VmHWM) of a process, Linux only."""
+    try:
+        for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def db_size_bytes(db_path: Path) -> int:
+    return sum(
+        p.stat().st_size for p in (db_path, Path(f"{db_path}-wal"), Path(f"{db_path}-shm")) if p.exists()
+    )
+
+
+def wait_until_ready(url: str, timeout: float = 30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not become ready within {timeout}s")
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=SERVER_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+class Runner:
+    def __init__(self, base_url: str, image: bytes, mix: dict):
+        self.base_url = base_url
+        self.image = image
+        self.ops = list(mix)
+        self.weights = [mix[op] for op in self.ops]
+        self.latencies = {op: [] for op in self.ops}
+        self.errors = {op: 0 for op in self.ops}
+        self.response_bytes = {op: 0 for op in self.ops}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def session(self) -> requests.Session:
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def upload(self):
+        return self.session.post(
+            f"{self.base_url}/upload_image_query",
+            data={"text": "Analyze this garden or park photo", "prompt_id": "garden-watch",
+                  "lat": str(52.52 + random.uniform(-0.01, 0.01)), "lon": str(13.405 + random.uniform(-0.01, 0.01))},
+            files={"file": ("garden.jpg", self.image, "image/jpeg")},
+            timeout=120,
+        )
+
+    def list(self):
+        return self.session.get(f"{self.base_url}/v1/user-captures/",
+                                params={"skip": random.randint(0, 50), "limit": 100}, timeout=60)
+
+    def time_range(self):
+        end = datetime.utcnow()
+        start = end - timedelta(hours=random.choice([1, 24, 24 * 7]))
+        return self.session.get(f"{self.base_url}/v1/user-captures/time-range/",
+                                params={"start_time": start.isoformat(), "end_time": end.isoformat(), "limit": 100},
+                                timeout=60)
+
+    def analyze_lawn(self):
+        return self.session.post(f"{self.base_url}/analyze-lawn",
+                                 files={"file": ("lawn.jpg", self.image, "image/jpeg")}, timeout=120)
+
+    def run_one(self):
+        op = random.choices(self.ops, weights=self.weights)[0]
+        start = time.perf_counter()
+        try:
+            response = getattr(self, op)()
+            ok = response.status_code < 400
+            size = len(response.content)
+        except requests.RequestException:
+            ok, size = False, 0
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.latencies[op].append(elapsed)
+            self.response_bytes[op] += size
+            if not ok:
+                self.errors[op] += 1
+
+    def run(self, duration: float, concurrency: int):
+        deadline = time.time() + duration
+
+        def worker():
+            while time.time() < deadline:
+                self.run_one()
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for _ in range(concurrency):
+                pool.submit(worker)
+
+
+def summarize(runner: Runner, elapsed: float) -> dict:
+    operations = {}
+    total = 0
+    for op, values in runner.latencies.items():
+        values = sorted(values)
+        total += len(values)
+        operations[op] = {
+            "count": len(values),
+            "errors": runner.errors[op],
+            "throughput_rps": round(len(values) / elapsed, 2),
+            "p50_ms": round(percentile(values, 50) * 1000, 1),
+            "p95_ms": round(percentile(values, 95) * 1000, 1),
+            "p99_ms": round(percentile(values, 99) * 1000, 1),
+            "mean_response_bytes": int(runner.response_bytes[op] / len(values)) if values else 0,
+        }
+    return {"total_requests": total, "throughput_rps": round(total / elapsed, 2), "operations": operations}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="End-to-end load test against a stub model server")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of load per run")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Seconds of load before measuring")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--app-port", type=int, default=8100)
+    parser.add_argument("--stub-port", type=int, default=9100)
+    parser.add_argument("--stub-latency-ms", type=float, default=200.0)
+    parser.add_argument("--stub-jitter-ms", type=float, default=50.0)
+    parser.add_argument("--stub-failure-rate", type=float, default=0.0)
+    parser.add_argument("--image-width", type=int, default=1920)
+    parser.add_argument("--image-height", type=int, default=1080)
+    parser.add_argument("--mix", type=json.loads, default=DEFAULT_MIX,
+                        help='Operation weights as JSON, e.g. \'{"upload": 1, "list": 10}\'')
+    parser.add_argument("--seed-captures", type=int, default=200, help="Uploads performed before the run")
+    args = parser.parse_args(argv)
+
+    workdir = Path(tempfile.mkdtemp(prefix="gardenia-bench-"))
+    db_path = workdir / "app.db"
+    env = {
+        **os.environ,
+        "SQLITE_DB_PATH": str(db_path),
+        "DWANI_API_BASE_URL": f"http://127.0.0.1:{args.stub_port}/v1",
+        "DWANI_API_BASE_URLS": f"http://127.0.0.1:{args.stub_port}/v1",
+        "DWANI_API_KEY": "bench",
+    }
+    log = open(workdir / "server.log", "wb")
+    stub = subprocess.Popen(
+        [sys.executable, str(Path(__file__).resolve().parent / "stub_model_server.py"),
+         "--port", str(args.stub_port), "--latency-ms", str(args.stub_latency_ms),
+         "--jitter-ms", str(args.stub_jitter_ms), "--failure-rate", str(args.stub_failure_rate)],
+        cwd=SERVER_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    app = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(args.app_port),
+         "--log-level", "warning"],
+        cwd=SERVER_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    try:
+        base_url = f"http://127.0.0.1:{args.app_port}"
+        wait_until_ready(f"http://127.0.0.1:{args.stub_port}/v1/models")
+        wait_until_ready(f"{base_url}/docs")
+
+        image = make_image(args.image_width, args.image_height)
+        seeder = Runner(base_url, image, {"upload": 1})
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            for _ in range(args.seed_captures):
+                pool.submit(seeder.run_one)
+
+        if args.warmup > 0:
+            Runner(base_url, image, args.mix).run(args.warmup, args.concurrency)
+
+        runner = Runner(base_url, image, args.mix)
+        start = time.perf_counter()
+        runner.run(args.duration, args.concurrency)
+        elapsed = time.perf_counter() - start
+
+        report = {
+            "commit": git_commit(),
+            "timestamp": datetime.utcnow().isoformat(),
+            "config": {
+                "duration_s": args.duration,
+                "concurrency": args.concurrency,
+                "mix": args.mix,
+                "image_bytes": len(image),
+                "seed_captures": args.seed_captures,
+                "stub_latency_ms": args.stub_latency_ms,
+                "stub_jitter_ms": args.stub_jitter_ms,
+                "stub_failure_rate": args.stub_failure_rate,
+            },
+            **summarize(runner, elapsed),
+            "app_peak_rss_kb": peak_rss_kb(app.pid),
+            "db_size_bytes": db_size_bytes(db_path),
+        }
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    finally:
+        for proc in (app, stub):
+            proc.terminate()
+        for proc in (app, stub):
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        log.close()
+
+
+if __name__ == "__main__":
+    main()
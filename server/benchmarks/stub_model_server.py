@@ -0,0 +1,173 @@
+# File: benchmarks/stub_model_server.py
+"""OpenAI-compatible stub model server for offline benchmarks.
+
+Serves /v1/chat/completions (plain and streaming), /v1/embeddings and
+/v1/models with canned garden/lawn replies. Latency, jitter, streaming
+speed and failure rate are configurable so the app can be measured without
+a GPU or the real gemma3 endpoint.
+
+    python benchmarks/stub_model_server.py --port 9100 --latency-ms 300 --failure-rate 0.01
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+GARDEN_REPLY = json.dumps({
+    "overall_condition": "fair",
+    "maintenance_issues": [
+        {"issue": "overgrown grass", "location_description": "center lawn", "severity": "medium",
+         "recommended_action": "Mow to 5 cm"},
+        {"issue": "litter", "location_description": "near bench", "severity": "low",
+         "recommended_action": "Collect litter"},
+    ],
+    "required_tools": [
+        {"tool_name": "Rasenmäher", "purpose": "Mow the lawn", "priority": "soon"},
+    ],
+    "general_advice": "Mow weekly during the growing season.",
+    "confidence": 0.8,
+}, ensure_ascii=False)
+
+LAWN_DESCRIPTION = (
+    "A medium rectangular lawn with uneven grass height, two bare patches near a fence, "
+    "scattered autumn leaves and some moss in the shaded corner."
+)
+
+LAWN_PLAN_REPLY = json.dumps({
+    "overall_assessment": "The lawn is patchy with leaf cover and moss in shaded areas.",
+    "recommended_actions": [
+        {"step_number": 1, "title": "Clear leaves", "why": "Leaves smother grass",
+         "how_to_do_it": "Rake and remove all leaves.", "tools_and_materials": ["rake"],
+         "best_timing": "Now", "notes": None},
+    ],
+    "ongoing_maintenance": "Mow at 4-5 cm and keep leaves off the lawn.",
+})
+
+
+class StubConfig:
+    latency_ms = 200.0
+    jitter_ms = 50.0
+    failure_rate = 0.0
+    tokens_per_second = 200.0  # streaming speed
+    embedding_dim = 256
+
+
+config = StubConfig()
+app = FastAPI(title="Stub model server")
+
+
+def _reply_for(messages) -> str:
+    system = " ".join(
+        m["content"] for m in messages if m.get("role") == "system" and isinstance(m.get("content"), str)
+    )
+    if "overall_assessment" in system:
+        return LAWN_PLAN_REPLY
+    if "Describe the attached photo" in system:
+        return LAWN_DESCRIPTION
+    return GARDEN_REPLY
+
+
+async def _simulate_latency():
+    delay = max(0.0, random.gauss(config.latency_ms, config.jitter_ms)) / 1000
+    await asyncio.sleep(delay)
+    return random.random() >= config.failure_rate
+
+
+def _usage(prompt_chars: int, completion: str) -> dict:
+    prompt_tokens = prompt_chars // 4
+    completion_tokens = len(completion) // 4
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "prompt_tokens_details": {"cached_tokens": 0},
+    }
+
+
+@app.get("/v1/models")
+async def models():
+    return {"object": "list", "data": [{"id": "gemma3", "object": "model", "owned_by": "stub"}]}
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    if not await _simulate_latency():
+        return JSONResponse(status_code=503, content={"error": {"message": "injected failure"}})
+
+    reply = _reply_for(body.get("messages", []))
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+    model = body.get("model", "gemma3")
+
+    if body.get("stream"):
+        async def events():
+            words = reply.split(" ")
+            for i, word in enumerate(words):
+                delta = word if i == 0 else " " + word
+                chunk = {
+                    "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": {"content": delta}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(1 / config.tokens_per_second)
+            final = {
+                "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            }
+            yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    prompt_chars = len(json.dumps(body.get("messages", [])))
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": created,
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+        "usage": _usage(prompt_chars, reply),
+    }
+
+
+@app.post("/v1/embeddings")
+async def embeddings(request: Request):
+    body = await request.json()
+    if not await _simulate_latency():
+        return JSONResponse(status_code=503, content={"error": {"message": "injected failure"}})
+    inputs = body.get("input", [])
+    if isinstance(inputs, str):
+        inputs = [inputs]
+    data = []
+    for i, item in enumerate(inputs):
+        rng = random.Random(hash(item))
+        data.append({"object": "embedding", "index": i,
+                     "embedding": [rng.uniform(-1, 1) for _ in range(config.embedding_dim)]})
+    return {"object": "list", "data": data, "model": body.get("model"), "usage": {"prompt_tokens": 0, "total_tokens": 0}}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stub model server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=config.latency_ms)
+    parser.add_argument("--jitter-ms", type=float, default=config.jitter_ms)
+    parser.add_argument("--failure-rate", type=float, default=config.failure_rate)
+    parser.add_argument("--tokens-per-second", type=float, default=config.tokens_per_second)
+    args = parser.parse_args(argv)
+
+    config.latency_ms = args.latency_ms
+    config.jitter_ms = args.jitter_ms
+    config.failure_rate = args.failure_rate
+    config.tokens_per_second = args.tokens_per_second
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+# File: chat_sessions.py
+"""Multi-turn chat sessions with bounded prompts and bounded memory.
+
+Every message is appended to ``chat_messages``; ``chat_sessions`` holds a
+rolling summary of everything older than the live window. Hot sessions are
+kept in an in-process LRU, so a turn costs one small staleness check, the
+model call and one append. When a session's window grows past the token
+budget, its oldest messages are folded into the summary in the background,
+and prompts only ever carry the summary plus the newest messages that fit
+the budget. Idle sessions expire after a TTL. Turns on one session id run one
+at a time, from the cache lookup to the append, and a session in use is never
+evicted from the LRU.
+"""
+import asyncio
+import logging
+import os
+import uuid
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from itertools import islice
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, Optional, Tuple
+
+from clients import client
+from database import SessionLocal, ChatSession, ChatMessage
+from prompts import get_prompt, build_messages, count_tokens
+
+logger = logging.getLogger(__name__)
+
+CHAT_MODEL = os.getenv("CHAT_MODEL", "gemma3")
+CHAT_MAX_TOKENS = int(os.getenv("CHAT_MAX_TOKENS", "512"))
+CHAT_HISTORY_TOKENS = int(os.getenv("CHAT_HISTORY_TOKENS", "2000"))  # recent messages sent per turn
+CHAT_SUMMARY_MAX_TOKENS = int(os.getenv("CHAT_SUMMARY_MAX_TOKENS", "300"))
+CHAT_CACHE_SESSIONS = int(os.getenv("CHAT_CACHE_SESSIONS", "512"))
+CHAT_SESSION_TTL_HOURS = float(os.getenv("CHAT_SESSION_TTL_HOURS", "24"))
+# Upper bound on messages loaded for a cold session, whatever their size
+WINDOW_MAX_MESSAGES = 200
+_PRUNE_EVERY = timedelta(hours=1)
+
+
+class _Message:
+    __slots__ = ("id", "role", "content", "tokens")
+
+    def __init__(self, message_id: int, role: str, content: str, tokens: int):
+        self.id = message_id
+        self.role = role
+        self.content = content
+        self.tokens = tokens
+
+
+class _HotSession:
+    """In-memory view of a session: its summary and the unsummarised window."""
+
+    def __init__(self, session_id: str, summary: Optional[str], summary_through: int, last_message_id: int,
+                 last_active: datetime, messages):
+        self.session_id = session_id
+        self.summary = summary
+        self.summary_through = summary_through
+        self.last_message_id = last_message_id
+        self.last_active = last_active
+        self.messages = deque(messages)
+        self.tokens = sum(m.tokens for m in self.messages)
+        self.compacting = False
+
+
+class _SessionLock:
+    """Lock for one session id, counting the tasks holding or waiting for it."""
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+
+def _ttl() -> timedelta:
+    return timedelta(hours=CHAT_SESSION_TTL_HOURS)
+
+
+def _load_session(session_id: str) -> Optional[_HotSession]:
+    db = SessionLocal()
+    try:
+        row = db.get(ChatSession, session_id)
+        if row is None or row.last_active_at < datetime.utcnow() - _ttl():
+            return None
+        messages = (
+            db.query(ChatMessage.id, ChatMessage.role, ChatMessage.content, ChatMessage.token_count)
+            .filter(ChatMessage.session_id == session_id, ChatMessage.id > (row.summary_through or 0))
+            .order_by(ChatMessage.id.desc())
+            .limit(WINDOW_MAX_MESSAGES)
+            .all()
+        )
+        window = [_Message(m.id, m.role, m.content, m.token_count or 0) for m in reversed(messages)]
+        return _HotSession(session_id, row.summary, row.summary_through or 0, row.last_message_id or 0,
+                           row.last_active_at, window)
+    finally:
+        db.close()
+
+
+def _last_message_id(session_id: str) -> Optional[int]:
+    db = SessionLocal()
+    try:
+        row = db.query(ChatSession.last_message_id).filter(ChatSession.id == session_id).first()
+        return row.last_message_id if row else None
+    finally:
+        db.close()
+
+
+def _delete_session(db, session_id: str):
+    db.query(ChatMessage).filter(ChatMessage.session_id == session_id).delete(synchronize_session=False)
+    db.query(ChatSession).filter(ChatSession.id == session_id).delete(synchronize_session=False)
+
+
+def _append_turn(session_id: str, user: Tuple[str, int], assistant: Tuple[str, int]) -> Tuple[int, int]:
+    """Append a user/assistant pair, creating (or replacing an expired) session row."""
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        row = db.get(ChatSession, session_id)
+        if row is not None and row.last_active_at < now - _ttl():
+            _delete_session(db, session_id)
+            row = None
+        if row is None:
+            row = ChatSession(id=session_id, summary=None, summary_through=0, last_message_id=0, turn_count=0,
+                              created_at=now)
+            db.add(row)
+        ids = []
+        for role, (content, tokens) in (("user", user), ("assistant", assistant)):
+            message = ChatMessage(session_id=session_id, role=role, content=content, token_count=tokens)
+            db.add(message)
+            db.flush()
+            ids.append(message.id)
+        row.last_message_id = ids[-1]
+        row.turn_count = (row.turn_count or 0) + 1
+        row.last_active_at = now
+        db.commit()
+        return ids[0], ids[1]
+    finally:
+        db.close()
+
+
+def _save_summary(session_id: str, summary: str, through: int):
+    db = SessionLocal()
+    try:
+        db.query(ChatSession).filter(ChatSession.id == session_id).update(
+            {"summary": summary, "summary_through": through}, synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def _prune_expired() -> int:
+    cutoff = datetime.utcnow() - _ttl()
+    db = SessionLocal()
+    try:
+        expired = [row.id for row in db.query(ChatSession.id).filter(ChatSession.last_active_at < cutoff)]
+        for start in range(0, len(expired), 500):
+            batch = expired[start:start + 500]
+            db.query(ChatMessage).filter(ChatMessage.session_id.in_(batch)).delete(synchronize_session=False)
+            db.query(ChatSession).filter(ChatSession.id.in_(batch)).delete(synchronize_session=False)
+        db.commit()
+        return len(expired)
+    finally:
+        db.close()
+
+
+class ChatStore:
+    def __init__(self, capacity: int = CHAT_CACHE_SESSIONS):
+        self.capacity = capacity
+        self._hot: "OrderedDict[str, _HotSession]" = OrderedDict()
+        self._last_prune = datetime.min
+        self._background = set()
+        self._locks: Dict[str, _SessionLock] = {}
+
+    @asynccontextmanager
+    async def _locked(self, session_id: str):
+        """Hold the session id's lock; the entry lives only while someone uses it."""
+        entry = self._locks.get(session_id)
+        if entry is None:
+            entry = self._locks[session_id] = _SessionLock()
+        entry.users += 1
+        try:
+            async with entry.lock:
+                yield
+        finally:
+            entry.users -= 1
+            if entry.users == 0:
+                del self._locks[session_id]
+
+    def _evictable(self) -> Iterator[str]:
+        """Cached session ids, least recently used first, that no turn is using."""
+        return (session_id for session_id in self._hot if session_id not in self._locks)
+
+    async def _get(self, session_id: str) -> _HotSession:
+        """Cached or loaded session; the caller holds the session id's lock."""
+        session = self._hot.get(session_id)
+        if session is not None:
+            expired = session.last_active < datetime.utcnow() - _ttl()
+            # Another replica may have written to this session since we cached it
+            if not expired and await asyncio.to_thread(_last_message_id, session_id) == session.last_message_id:
+                self._hot.move_to_end(session_id)
+                return session
+            del self._hot[session_id]
+
+        session = await asyncio.to_thread(_load_session, session_id)
+        if session is None:
+            session = _HotSession(session_id, None, 0, 0, datetime.utcnow(), [])
+        self._hot[session_id] = session
+        excess = len(self._hot) - self.capacity
+        if excess > 0:
+            # Sessions with a turn in flight stay; the cache shrinks back once they finish
+            for evicted in list(islice(self._evictable(), excess)):
+                del self._hot[evicted]
+        return session
+
+    def _prompt(self, session: _HotSession, message: str) -> list:
+        """System prompt, rolling summary, newest messages within the budget, then the new message."""
+        messages = build_messages(get_prompt("indic-chat"))
+        if session.summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{session.summary}"})
+        recent = []
+        budget = CHAT_HISTORY_TOKENS
+        for m in reversed(session.messages):
+            if m.tokens > budget:
+                break
+            budget -= m.tokens
+            recent.append({"role": m.role, "content": m.content})
+        messages.extend(reversed(recent))
+        messages.append({"role": "user", "content": message})
+        return messages
+
+    async def turn(self, session_id: Optional[str], message: str) -> Tuple[str, str]:
+        """Run one chat turn; returns (reply, session_id)."""
+        session_id = session_id or uuid.uuid4().hex
+        async with self._locked(session_id):
+            session = await self._get(session_id)
+            response = await asyncio.to_thread(
+                client.chat.completions.create,
+                model=CHAT_MODEL, messages=self._prompt(session, message), max_tokens=CHAT_MAX_TOKENS, temperature=0.7,
+            )
+            reply = response.choices[0].message.content.strip()
+            user_tokens, reply_tokens = count_tokens(message), count_tokens(reply)
+            user_id, reply_id = await asyncio.to_thread(
+                _append_turn, session_id, (message, user_tokens), (reply, reply_tokens)
+            )
+            session.messages.append(_Message(user_id, "user", message, user_tokens))
+            session.messages.append(_Message(reply_id, "assistant", reply, reply_tokens))
+            session.tokens += user_tokens + reply_tokens
+            session.last_message_id = reply_id
+            session.last_active = datetime.utcnow()
+            # Hard cap in case summaries keep failing; dropped messages stay in the log
+            while len(session.messages) > WINDOW_MAX_MESSAGES or session.tokens > CHAT_HISTORY_TOKENS * 4:
+                session.tokens -= session.messages.popleft().tokens
+            if session.tokens > CHAT_HISTORY_TOKENS and not session.compacting:
+                session.compacting = True
+                self._spawn(self._compact(session))
+
+        if datetime.utcnow() - self._last_prune > _PRUNE_EVERY:
+            self._last_prune = datetime.utcnow()
+            self._spawn(self._prune())
+        return reply, session_id
+
+    def _spawn(self, coroutine):
+        task = asyncio.create_task(coroutine)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _compact(self, session: _HotSession):
+        """Fold the oldest messages into the rolling summary until half the budget remains.
+
+        The model call runs outside the session lock so it never delays the
+        next turn; only the final swap takes the lock.
+        """
+        try:
+            async with self._locked(session.session_id):
+                fold = []
+                remaining = session.tokens
+                for m in session.messages:
+                    if remaining <= CHAT_HISTORY_TOKENS // 2:
+                        break
+                    fold.append(m)
+                    remaining -= m.tokens
+                previous = session.summary
+            if not fold:
+                return
+
+            text = (f"Previous summary:\n{previous}\n\n" if previous else "") + "Next messages:\n" + "\n".join(
+                f"{m.role}: {m.content}" for m in fold
+            )
+            response = await asyncio.to_thread(
+                client.chat.completions.create,
+                model=CHAT_MODEL, messages=build_messages(get_prompt("chat-summary"), text),
+                max_tokens=CHAT_SUMMARY_MAX_TOKENS, temperature=0.2,
+            )
+            summary = response.choices[0].message.content.strip()
+            through = fold[-1].id
+            await asyncio.to_thread(_save_summary, session.session_id, summary, through)
+
+            async with self._locked(session.session_id):
+                session.summary = summary
+                session.summary_through = through
+                while session.messages and session.messages[0].id <= through:
+                    session.tokens -= session.messages.popleft().tokens
+            logger.info(f"Compacted chat session {session.session_id}: folded {len(fold)} messages.")
+        except Exception as e:
+            # Prompts stay bounded regardless: _prompt only takes what fits the budget
+            logger.error(f"Chat summary failed for session {session.session_id}: {str(e)}")
+        finally:
+            session.compacting = False
+
+    async def _prune(self):
+        try:
+            removed = await asyncio.to_thread(_prune_expired)
+            cutoff = datetime.utcnow() - _ttl()
+            for session_id in [sid for sid in self._evictable() if self._hot[sid].last_active < cutoff]:
+                self._hot.pop(session_id, None)
+            if removed:
+                logger.info(f"Expired {removed} idle chat sessions.")
+        except Exception as e:
+            logger.error(f"Chat session prune failed: {str(e)}")
+
+
+chat_store = ChatStore()
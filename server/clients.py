@@ -1,9 +1,13 @@
 # clients.py
-from openai import OpenAI
-from config import API_KEY, BASE_URL
+from inference import BackendPool
+from config import API_KEY, BASE_URLS, ROUTING_STRATEGY, HEDGE_AFTER_SECONDS, HEALTH_CHECK_INTERVAL, HEALTH_CHECK_TIMEOUT
 
-# Initialize OpenAI client
-client = OpenAI(
+# Pool of OpenAI-compatible backends; exposes the same chat.completions.create API as OpenAI
+client = BackendPool.from_urls(
+    BASE_URLS,
     api_key=API_KEY,
-    base_url=BASE_URL
-)
\ No newline at end of file
+    strategy=ROUTING_STRATEGY,
+    hedge_after=HEDGE_AFTER_SECONDS,
+    health_interval=HEALTH_CHECK_INTERVAL,
+    health_timeout=HEALTH_CHECK_TIMEOUT,
+)
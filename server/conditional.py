@@ -0,0 +1,88 @@
+# File: conditional.py
+"""Conditional GET support for capture reads.
+
+Validators come from the change log rather than the response body: a single
+capture is versioned by its ``change_seq`` (the id of its latest change
+event) and list responses by the newest event id in ``capture_events``.
+Both are cheap indexed lookups, so a matching ``If-None-Match`` or
+``If-Modified-Since`` is answered with 304 before any row body is loaded.
+ETags are weak because the compression middleware re-encodes the body.
+"""
+import hashlib
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response
+
+from database import CaptureEvent
+
+# Shared caches (nginx) may reuse a list for this long; browsers always revalidate
+LIST_SHARED_MAX_AGE = int(os.getenv("CAPTURE_LIST_SHARED_MAX_AGE", "5"))
+CAPTURE_SHARED_MAX_AGE = int(os.getenv("CAPTURE_SHARED_MAX_AGE", "60"))
+# Captures can still be deleted or archived, so even a versioned URL is only
+# reused privately and for a bounded time
+VERSIONED_MAX_AGE = int(os.getenv("CAPTURE_VERSIONED_MAX_AGE", "3600"))
+
+LIST_CACHE_CONTROL = f"public, max-age=0, s-maxage={LIST_SHARED_MAX_AGE}"
+CAPTURE_CACHE_CONTROL = f"public, max-age=0, s-maxage={CAPTURE_SHARED_MAX_AGE}"
+# A ?version= URL that matches the current change_seq names content that will not be edited
+VERSIONED_CACHE_CONTROL = f"private, max-age={VERSIONED_MAX_AGE}"
+
+
+def capture_etag(capture_id: int, change_seq: Optional[int]) -> str:
+    return f'W/"capture-{capture_id}-v{change_seq or 0}"'
+
+
+def list_etag(request: Request, table_version: int) -> str:
+    query = "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+    digest = hashlib.sha1(f"{request.url.path}?{query}|{table_version}".encode("utf-8")).hexdigest()[:20]
+    return f'W/"list-{digest}"'
+
+
+def table_version(db):
+    """(newest event id, its timestamp) for the whole captures table."""
+    latest = db.query(CaptureEvent.id, CaptureEvent.created_at).order_by(CaptureEvent.id.desc()).first()
+    return (latest.id, latest.created_at) if latest else (0, None)
+
+
+def _strip_weak(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    """RFC 9110 evaluation: If-None-Match (weak comparison) wins over If-Modified-Since."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [_strip_weak(tag) for tag in if_none_match.split(",")]
+        return "*" in tags or _strip_weak(etag) in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        # HTTP dates have one-second resolution
+        return _as_utc(last_modified).replace(microsecond=0) <= since
+    return False
+
+
+def _as_utc(value: datetime) -> datetime:
+    # Timestamps are stored naive in UTC (datetime.utcnow)
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def cache_headers(etag: str, last_modified: Optional[datetime], cache_control: str) -> dict:
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(_as_utc(last_modified), usegmt=True)
+    return headers
+
+
+def not_modified(headers: dict) -> Response:
+    return Response(status_code=304, headers=headers)
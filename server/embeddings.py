@@ -0,0 +1,451 @@
+# File: embeddings.py
+"""Image embeddings and "find similar captures" search.
+
+Each capture image is reduced to a compact, L2-normalised descriptor, either
+locally on the CPU (colour histogram + grayscale thumbnail) or through an
+OpenAI-compatible embeddings endpoint. The shared ``capture_embeddings``
+table is the source of truth, an append-only log every replica can read;
+each process replays it into a memory-mapped matrix next to the SQLite
+database, so search never loads the table or the images and gives the same
+answer on every replica.
+Above EMBEDDING_IVF_THRESHOLD vectors an inverted-file (IVF) index is built so
+a query only scans the closest clusters.
+"""
+import base64
+import io
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "local")  # local | openai
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "gemma3-embed")
+EMBEDDING_DTYPE = np.dtype(os.getenv("EMBEDDING_DTYPE", "float16"))
+EMBEDDING_IVF_THRESHOLD = int(os.getenv("EMBEDDING_IVF_THRESHOLD", "50000"))
+EMBEDDING_IVF_NPROBE = int(os.getenv("EMBEDDING_IVF_NPROBE", "8"))
+EMBEDDING_LOG_LOCK_KEY = 727_130_004  # see events.lock_append_order
+SYNC_BATCH_ROWS = 2000
+
+SEARCH_BLOCK_ROWS = 16384
+_INITIAL_CAPACITY = 1024
+_HUE_BINS, _SAT_BINS, _VAL_BINS = 8, 4, 4
+_THUMB_SIZE = (16, 8)
+
+
+def _decode_image(image: str, size: Optional[Tuple[int, int]] = None) -> Image.Image:
+    """Decode a base64 string or data URL into an RGB PIL image.
+
+    With ``size``, a JPEG is decoded at the smallest scale that still covers
+    it; draft() only works before the pixels are loaded, so it comes before
+    convert().
+    """
+    if image.startswith("data:"):
+        image = image.split(",", 1)[1]
+    img = Image.open(io.BytesIO(base64.b64decode(image)))
+    if size is not None:
+        img.draft("RGB", size)
+    return img.convert("RGB")
+
+
+def _normalise(vector: np.ndarray) -> np.ndarray:
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+def local_descriptor(image: str) -> np.ndarray:
+    """256-d CPU descriptor: HSV colour histogram plus a tiny grayscale layout."""
+    small = _decode_image(image, (128, 128)).resize((64, 64))
+
+    hsv = np.asarray(small.convert("HSV"), dtype=np.uint16).reshape(-1, 3)
+    bins = (
+        (hsv[:, 0] * _HUE_BINS >> 8) * (_SAT_BINS * _VAL_BINS)
+        + (hsv[:, 1] * _SAT_BINS >> 8) * _VAL_BINS
+        + (hsv[:, 2] * _VAL_BINS >> 8)
+    )
+    histogram = np.bincount(bins, minlength=_HUE_BINS * _SAT_BINS * _VAL_BINS).astype(np.float32)
+    histogram = _normalise(np.sqrt(histogram))
+
+    thumb = np.asarray(small.convert("L").resize(_THUMB_SIZE), dtype=np.float32).ravel()
+    thumb = _normalise(thumb - thumb.mean())
+
+    return _normalise(np.concatenate([histogram, thumb]))
+
+
+def remote_descriptor(image: str) -> np.ndarray:
+    """Descriptor from an OpenAI-compatible embeddings endpoint that accepts image data URLs."""
+    from clients import client
+
+    response = client.embeddings.create(model=EMBEDDING_MODEL, input=[image])
+    return _normalise(np.asarray(response.data[0].embedding, dtype=np.float32))
+
+
+def compute_embedding(image: str) -> np.ndarray:
+    if EMBEDDING_BACKEND == "openai":
+        return remote_descriptor(image)
+    return local_descriptor(image)
+
+
+class VectorStore:
+    """Append-only, memory-mapped matrix of capture embeddings.
+
+    Rows are addressed by capture id; deleted captures are tombstoned with
+    id -1 and skipped at search time. ``position`` is the last
+    ``capture_embeddings`` log id applied.
+    """
+
+    def __init__(self, path: Path, dtype: np.dtype = EMBEDDING_DTYPE):
+        self.path = Path(path)
+        self.dtype = np.dtype(dtype)
+        self._meta_path = self.path.with_name(self.path.name + ".json")
+        self._ids_path = self.path.with_name(self.path.name + ".ids.npy")
+        self._vectors_path = self.path.with_name(self.path.name + ".vectors.npy")
+        self._lock = threading.RLock()
+        self._vectors = None
+        self._ids = None
+        self._row_of = {}
+        self.count = 0
+        self.dim = None
+        self.position = 0
+        self._ivf = None
+        self._load()
+
+    # ---- persistence -------------------------------------------------
+
+    def _load(self):
+        if not self._meta_path.exists():
+            return
+        meta = json.loads(self._meta_path.read_text())
+        if np.dtype(meta["dtype"]) != self.dtype:
+            logger.warning("Embedding dtype changed; existing vectors will be rebuilt on demand.")
+            return
+        self.dim = meta["dim"]
+        self.count = meta["count"]
+        self.position = meta.get("position", 0)
+        self._vectors = np.load(self._vectors_path, mmap_mode="r+")
+        self._ids = np.load(self._ids_path, mmap_mode="r+")
+        self._row_of = {int(cid): row for row, cid in enumerate(self._ids[:self.count]) if cid >= 0}
+
+    def _save_meta(self):
+        meta = {"dim": self.dim, "count": self.count, "dtype": self.dtype.name, "position": self.position}
+        self._meta_path.write_text(json.dumps(meta))
+
+    def _grow(self, capacity: int):
+        vectors = np.lib.format.open_memmap(
+            self._vectors_path.with_suffix(".tmp.npy"), mode="w+", dtype=self.dtype, shape=(capacity, self.dim)
+        )
+        ids = np.lib.format.open_memmap(
+            self._ids_path.with_suffix(".tmp.npy"), mode="w+", dtype=np.int64, shape=(capacity,)
+        )
+        ids[:] = -1
+        if self._vectors is not None:
+            vectors[:self.count] = self._vectors[:self.count]
+            ids[:self.count] = self._ids[:self.count]
+            del self._vectors, self._ids
+        vectors.flush()
+        ids.flush()
+        del vectors, ids
+        os.replace(self._vectors_path.with_suffix(".tmp.npy"), self._vectors_path)
+        os.replace(self._ids_path.with_suffix(".tmp.npy"), self._ids_path)
+        self._vectors = np.load(self._vectors_path, mmap_mode="r+")
+        self._ids = np.load(self._ids_path, mmap_mode="r+")
+
+    # ---- mutation ----------------------------------------------------
+
+    def __contains__(self, capture_id: int) -> bool:
+        return capture_id in self._row_of
+
+    def get(self, capture_id: int) -> Optional[np.ndarray]:
+        row = self._row_of.get(capture_id)
+        if row is None:
+            return None
+        return np.asarray(self._vectors[row], dtype=np.float32)
+
+    def add(self, capture_id: int, vector: np.ndarray):
+        with self._lock:
+            self._put(capture_id, vector)
+            self._save_meta()
+
+    def _put(self, capture_id: int, vector: np.ndarray):
+        with self._lock:
+            if self.dim is None:
+                self.dim = int(vector.shape[0])
+            elif vector.shape[0] != self.dim:
+                raise ValueError(f"Embedding has dimension {vector.shape[0]}, index expects {self.dim}")
+
+            row = self._row_of.get(capture_id)
+            if row is None:
+                if self._vectors is None or self.count >= self._vectors.shape[0]:
+                    capacity = _INITIAL_CAPACITY if self._vectors is None else self._vectors.shape[0] * 2
+                    self._grow(capacity)
+                row = self.count
+                self.count += 1
+                self._row_of[capture_id] = row
+                self._ids[row] = capture_id
+            self._vectors[row] = vector.astype(self.dtype)
+
+    def remove(self, capture_id: int):
+        with self._lock:
+            self._drop(capture_id)
+            self._save_meta()
+
+    def _drop(self, capture_id: int):
+        row = self._row_of.pop(capture_id, None)
+        if row is not None:
+            self._ids[row] = -1
+            self._vectors[row] = 0
+
+    def apply(self, entries: List[Tuple[int, Optional[np.ndarray]]], position: int):
+        """Apply (capture_id, vector or None) log entries and advance ``position``."""
+        with self._lock:
+            for capture_id, vector in entries:
+                if vector is None:
+                    self._drop(capture_id)
+                    continue
+                try:
+                    self._put(capture_id, vector)
+                except ValueError as e:
+                    logger.error(f"Skipping embedding for capture {capture_id}: {str(e)}")
+            self.position = position
+            self._save_meta()
+
+    def flush(self):
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+                self._ids.flush()
+
+    # ---- search ------------------------------------------------------
+
+    def _scan(self, query: np.ndarray, rows: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Exact top-k over the given row numbers (or a contiguous range)."""
+        best_scores = np.empty(0, dtype=np.float32)
+        best_rows = np.empty(0, dtype=np.int64)
+        for start in range(0, len(rows), SEARCH_BLOCK_ROWS):
+            block = rows[start:start + SEARCH_BLOCK_ROWS]
+            if isinstance(block, range):
+                matrix = self._vectors[block.start:block.stop]
+                block = np.arange(block.start, block.stop)
+            else:
+                matrix = self._vectors[block]
+            # upcast per block: float16 matmul has no BLAS path and loses precision
+            scores = np.asarray(matrix, dtype=np.float32) @ query
+            scores[self._ids[block] < 0] = -np.inf
+            best_scores = np.concatenate([best_scores, scores])
+            best_rows = np.concatenate([best_rows, block])
+            if len(best_scores) > k:
+                keep = np.argpartition(-best_scores, k)[:k]
+                best_scores, best_rows = best_scores[keep], best_rows[keep]
+        return best_scores, best_rows
+
+    def search(self, query: np.ndarray, k: int = 10, exclude: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Return up to ``k`` (capture_id, cosine similarity) pairs, best first."""
+        if self.count == 0:
+            return []
+        want = k + (1 if exclude is not None else 0)
+        query = _normalise(np.asarray(query, dtype=np.float32))
+
+        with self._lock:
+            if self.count >= EMBEDDING_IVF_THRESHOLD:
+                if self._ivf is None or self._ivf.stale(self.count):
+                    self._ivf = IVFIndex.build(self._vectors, self._ids, self.count)
+                candidates = self._ivf.candidates(query, EMBEDDING_IVF_NPROBE, self.count)
+                scores, rows = self._scan(query, candidates, want)
+            else:
+                scores, rows = self._scan(query, range(0, self.count), want)
+
+        order = np.argsort(-scores)
+        results = []
+        for i in order:
+            if not np.isfinite(scores[i]):
+                continue
+            capture_id = int(self._ids[rows[i]])
+            if capture_id == exclude:
+                continue
+            results.append((capture_id, float(scores[i])))
+            if len(results) == k:
+                break
+        return results
+
+
+class IVFIndex:
+    """Inverted-file index: k-means coarse quantizer over the stored vectors.
+
+    Vectors appended after the build are kept in a brute-force tail, and the
+    index is rebuilt once the store has doubled in size.
+    """
+
+    def __init__(self, centroids: np.ndarray, lists: List[np.ndarray], built_count: int):
+        self.centroids = centroids
+        self.lists = lists
+        self.built_count = built_count
+
+    def stale(self, count: int) -> bool:
+        return count >= 2 * self.built_count
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, ids: np.ndarray, count: int, iterations: int = 10) -> "IVFIndex":
+        nlist = max(1, int(np.sqrt(count)))
+        rng = np.random.default_rng(0)
+        sample_rows = rng.choice(count, size=min(count, nlist * 64), replace=False)
+        sample = np.asarray(vectors[np.sort(sample_rows)], dtype=np.float32)
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)]
+
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            counts = np.bincount(assignment, minlength=nlist)[:, None]
+            centroids = np.where(counts > 0, sums / np.maximum(counts, 1), centroids)
+            norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+            centroids = centroids / np.where(norms > 0, norms, 1)
+
+        assignment = np.empty(count, dtype=np.int64)
+        for start in range(0, count, SEARCH_BLOCK_ROWS):
+            block = np.asarray(vectors[start:start + SEARCH_BLOCK_ROWS][:count - start], dtype=np.float32)
+            assignment[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+        assignment[ids[:count] < 0] = -1
+
+        order = np.argsort(assignment, kind="stable")
+        boundaries = np.searchsorted(assignment[order], np.arange(nlist + 1))
+        lists = [order[boundaries[i]:boundaries[i + 1]] for i in range(nlist)]
+        logger.info(f"Built IVF index with {nlist} lists over {count} embeddings.")
+        return cls(centroids.astype(np.float32), lists, count)
+
+    def candidates(self, query: np.ndarray, nprobe: int, count: int) -> np.ndarray:
+        nprobe = min(nprobe, len(self.lists))
+        nearest = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        tail = np.arange(self.built_count, count, dtype=np.int64)
+        return np.sort(np.concatenate([self.lists[i] for i in nearest] + [tail]))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> VectorStore:
+    """Process-wide vector store located next to the SQLite database."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                from database import SQLITE_DB_PATH
+                _store = VectorStore(Path(SQLITE_DB_PATH).with_suffix(".embeddings"))
+    return _store
+
+
+def _append_log(entries: List[Tuple[int, Optional[np.ndarray]]]):
+    """Write (capture_id, vector or None) entries to the shared log, dropping entries they supersede."""
+    from database import SessionLocal, CaptureEmbedding
+    from events import lock_append_order
+
+    db = SessionLocal()
+    try:
+        lock_append_order(db, EMBEDDING_LOG_LOCK_KEY)
+        capture_ids = [capture_id for capture_id, _ in entries]
+        db.query(CaptureEmbedding).filter(CaptureEmbedding.capture_id.in_(capture_ids)).delete(
+            synchronize_session=False
+        )
+        for capture_id, vector in entries:
+            blob = None if vector is None else np.asarray(vector, dtype=np.float32).tobytes()
+            db.add(CaptureEmbedding(capture_id=capture_id, vector=blob))
+        db.commit()
+    finally:
+        db.close()
+
+
+def sync_store(store: Optional[VectorStore] = None) -> int:
+    """Bring the local store up to date with the shared log; returns entries applied."""
+    from database import SessionLocal, CaptureEmbedding
+
+    store = store or get_store()
+    applied = 0
+    db = SessionLocal()
+    try:
+        with store._lock:
+            while True:
+                rows = (
+                    db.query(CaptureEmbedding.id, CaptureEmbedding.capture_id, CaptureEmbedding.vector)
+                    .filter(CaptureEmbedding.id > store.position)
+                    .order_by(CaptureEmbedding.id)
+                    .limit(SYNC_BATCH_ROWS)
+                    .all()
+                )
+                if not rows:
+                    break
+                store.apply(
+                    [(row.capture_id, None if row.vector is None else np.frombuffer(row.vector, dtype=np.float32))
+                     for row in rows],
+                    rows[-1].id,
+                )
+                applied += len(rows)
+                if len(rows) < SYNC_BATCH_ROWS:
+                    break
+        return applied
+    finally:
+        db.close()
+
+
+def index_capture(capture_id: int, image: Optional[str]) -> Optional[np.ndarray]:
+    """Embed a capture's image and log it; failures are logged, never raised.
+
+    Takes plain values so it can run as a background task after the request's
+    session is closed. The local store picks the vector up on its next
+    sync_store().
+    """
+    if not image:
+        return None
+    try:
+        vector = compute_embedding(image)
+        _append_log([(capture_id, vector)])
+        return vector
+    except Exception as e:
+        logger.error(f"Failed to embed capture {capture_id}: {str(e)}")
+        return None
+
+
+def remove_captures(capture_ids: List[int]):
+    """Record that captures are gone so every replica drops their vectors."""
+    if capture_ids:
+        _append_log([(capture_id, None) for capture_id in capture_ids])
+
+
+def reindex_all(batch_size: int = 500):
+    """Embed every capture that has no entry in the shared log yet."""
+    from sqlalchemy import exists
+    from database import SessionLocal, UserCapture, CaptureEmbedding
+
+    db = SessionLocal()
+    try:
+        last_id = 0
+        while True:
+            batch = (
+                db.query(UserCapture.id, UserCapture.image)
+                .filter(UserCapture.id > last_id)
+                .filter(~exists().where(CaptureEmbedding.capture_id == UserCapture.id))
+                .order_by(UserCapture.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not batch:
+                break
+            for capture in batch:
+                index_capture(capture.id, capture.image)
+            last_id = batch[-1].id
+        sync_store()
+        store = get_store()
+        store.flush()
+        logger.info(f"Embedding index holds {len(store._row_of)} captures.")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    reindex_all()
@@ -0,0 +1,244 @@
+# File: events.py
+"""Capture change feed: event log writes and Server-Sent Events fan-out.
+
+Every committed insert/update/delete of a UserCapture also writes a slim row
+to ``capture_events`` in the same transaction. A single producer task tails
+that table and fans each event out to all connected subscribers; the event is
+encoded once and the same bytes are shared by every connection. Subscribers
+resume with ``Last-Event-ID`` by replaying the log from that offset.
+"""
+import asyncio
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Optional
+
+from sqlalchemy import text
+
+from database import SessionLocal, CaptureEvent, UserCapture
+
+logger = logging.getLogger(__name__)
+
+EVENT_POLL_INTERVAL = float(os.getenv("EVENT_POLL_INTERVAL", "1.0"))
+EVENT_LOG_RETENTION_DAYS = int(os.getenv("EVENT_LOG_RETENTION_DAYS", "30"))
+SUBSCRIBER_QUEUE_SIZE = 1000
+HEARTBEAT_SECONDS = 15.0
+REPLAY_BATCH_SIZE = 500
+_PRUNE_EVERY = timedelta(hours=1)
+EVENT_LOCK_KEY = 727_130_003  # see migrations.STARTUP_LOCK_KEY
+
+
+def slim_capture(capture) -> dict:
+    """Capture fields without the image, as carried in events."""
+    return {
+        "id": capture.id,
+        "user_id": capture.user_id,
+        "query_text": capture.query_text,
+        "latitude": capture.latitude,
+        "longitude": capture.longitude,
+        "ai_response": capture.ai_response,
+        "created_at": capture.created_at.isoformat() if capture.created_at else None,
+    }
+
+
+def lock_append_order(db, key: int = EVENT_LOCK_KEY):
+    """Make ids of an append-only log commit in order; held until the transaction ends.
+
+    Readers page on ``id > offset``. Postgres assigns ids at insert time, but
+    concurrent transactions may commit in any order, so an offset could move
+    past an id that only becomes visible later and that row would be skipped
+    for good. A transaction-level advisory lock taken before the insert
+    serialises appenders across replicas. SQLite already has a single writer.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": key})
+
+
+def record_event(db, op: str, capture) -> CaptureEvent:
+    """Add a change event to the current transaction; the caller commits.
+
+    The capture must already have an id (flush first for inserts). Its
+    change_seq is set to the event id, which is what delta sync pages on.
+    """
+    lock_append_order(db)
+    payload = {"id": capture.id} if op == "delete" else slim_capture(capture)
+    event = CaptureEvent(capture_id=capture.id, op=op, payload=json.dumps(payload))
+    db.add(event)
+    db.flush()
+    if op != "delete":
+        capture.change_seq = event.id
+        db.flush()
+    return event
+
+
+def backfill_change_seq(batch_size: int = 500):
+    """Give captures written before the change log existed an insert event."""
+    db = SessionLocal()
+    try:
+        total = 0
+        while True:
+            batch = (
+                db.query(UserCapture)
+                .filter(UserCapture.change_seq.is_(None))
+                .order_by(UserCapture.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not batch:
+                break
+            for capture in batch:
+                record_event(db, "insert", capture)
+            db.commit()
+            total += len(batch)
+        if total:
+            logger.info(f"Backfilled change_seq for {total} user captures.")
+    finally:
+        db.close()
+
+
+def encode_sse(event_id: int, op: str, payload: str) -> bytes:
+    return f"id: {event_id}\nevent: {op}\ndata: {payload}\n\n".encode("utf-8")
+
+
+def _read_events(after_id: int, limit: int):
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(CaptureEvent.id, CaptureEvent.op, CaptureEvent.payload)
+            .filter(CaptureEvent.id > after_id)
+            .order_by(CaptureEvent.id)
+            .limit(limit)
+            .all()
+        )
+        return [(row.id, row.op, row.payload) for row in rows]
+    finally:
+        db.close()
+
+
+def _oldest_and_latest_ids():
+    db = SessionLocal()
+    try:
+        oldest = db.query(CaptureEvent.id).order_by(CaptureEvent.id.asc()).first()
+        latest = db.query(CaptureEvent.id).order_by(CaptureEvent.id.desc()).first()
+        return (oldest.id if oldest else None), (latest.id if latest else 0)
+    finally:
+        db.close()
+
+
+def _prune_events():
+    cutoff = datetime.utcnow() - timedelta(days=EVENT_LOG_RETENTION_DAYS)
+    db = SessionLocal()
+    try:
+        deleted = db.query(CaptureEvent).filter(CaptureEvent.created_at < cutoff).delete(synchronize_session=False)
+        db.commit()
+        if deleted:
+            logger.info(f"Pruned {deleted} capture events older than {EVENT_LOG_RETENTION_DAYS} days.")
+    finally:
+        db.close()
+
+
+class ChangeFeed:
+    """One producer tailing the event log, many SSE subscribers."""
+
+    def __init__(self):
+        self._subscribers = set()
+        self._last_id = 0
+        self._task = None
+        self._loop = None
+        self._wakeup = None
+        self._last_prune = datetime.min
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def notify(self):
+        """Wake the producer right after a local commit (thread-safe)."""
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        _, self._last_id = await asyncio.to_thread(_oldest_and_latest_ids)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=EVENT_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                # Other replicas write to the same table, so the log (not
+                # notify()) is the source of truth.
+                while True:
+                    events = await asyncio.to_thread(_read_events, self._last_id, REPLAY_BATCH_SIZE)
+                    for event_id, op, payload in events:
+                        self._publish(event_id, encode_sse(event_id, op, payload))
+                    if events:
+                        self._last_id = events[-1][0]
+                    if len(events) < REPLAY_BATCH_SIZE:
+                        break
+                if datetime.utcnow() - self._last_prune > _PRUNE_EVERY:
+                    self._last_prune = datetime.utcnow()
+                    await asyncio.to_thread(_prune_events)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Change feed producer error: {str(e)}")
+
+    def _publish(self, event_id: int, data: bytes):
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait((event_id, data))
+            except asyncio.QueueFull:
+                # Slow consumer: cut it loose; it reconnects and replays from Last-Event-ID
+                self._subscribers.discard(queue)
+                logger.warning("Dropping slow change feed subscriber.")
+
+    async def subscribe(self, last_event_id: Optional[int] = None) -> AsyncIterator[bytes]:
+        """Yield SSE frames: replayed history after ``last_event_id``, then live events."""
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.add(queue)
+        try:
+            sent_id = self._last_id if last_event_id is None else last_event_id
+            if last_event_id is not None:
+                oldest, _ = await asyncio.to_thread(_oldest_and_latest_ids)
+                if oldest is not None and last_event_id < oldest - 1:
+                    # History was pruned; tell the client to do a full refetch
+                    yield encode_sse(oldest - 1, "reset", "{}")
+                while True:
+                    events = await asyncio.to_thread(_read_events, sent_id, REPLAY_BATCH_SIZE)
+                    for event_id, op, payload in events:
+                        yield encode_sse(event_id, op, payload)
+                        sent_id = event_id
+                    if len(events) < REPLAY_BATCH_SIZE:
+                        break
+
+            while True:
+                if queue not in self._subscribers and queue.empty():
+                    return
+                try:
+                    event_id, data = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+                if event_id <= sent_id:
+                    continue  # already delivered during replay
+                sent_id = event_id
+                yield data
+        finally:
+            self._subscribers.discard(queue)
+
+
+change_feed = ChangeFeed()
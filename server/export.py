@@ -0,0 +1,189 @@
+# File: export.py
+"""Streaming bulk export of user captures (NDJSON, Arrow IPC, Parquet).
+
+Rows are pulled through a server-side cursor in fixed-size chunks and encoded
+as they arrive, so memory stays constant no matter how large the table is.
+"""
+import hashlib
+import io
+from datetime import datetime
+from typing import Iterator, Optional
+
+from sqlalchemy import select
+
+from database import SessionLocal, UserCapture
+from serialization import dumps
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional; only needed for arrow/parquet output
+    pa = None
+    pq = None
+
+EXPORT_FORMATS = ("ndjson", "arrow", "parquet")
+IMAGE_MODES = ("full", "omit", "key")
+DEFAULT_CHUNK_SIZE = 5000
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+FILE_EXTENSIONS = {
+    "ndjson": "ndjson",
+    "arrow": "arrows",
+    "parquet": "parquet",
+}
+
+
+def image_key(image: Optional[str]) -> Optional[str]:
+    """Return a content-addressed blob key for a base64 image."""
+    if image is None:
+        return None
+    return "sha256:" + hashlib.sha256(image.encode("utf-8")).hexdigest()
+
+
+def _columns(images: str):
+    table = UserCapture.__table__
+    columns = [
+        table.c.id,
+        table.c.user_id,
+        table.c.query_text,
+        table.c.latitude,
+        table.c.longitude,
+        table.c.ai_response,
+        table.c.created_at,
+    ]
+    if images != "omit":
+        columns.append(table.c.image)
+    return columns
+
+
+def iter_capture_chunks(
+    images: str = "full",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+) -> Iterator[list]:
+    """Yield lists of plain-dict rows, at most ``chunk_size`` per list.
+
+    A dedicated session is opened for the lifetime of the iterator so the
+    cursor survives beyond the request dependency scope.
+    """
+    if images not in IMAGE_MODES:
+        raise ValueError(f"images must be one of {IMAGE_MODES}")
+
+    stmt = select(*_columns(images)).order_by(UserCapture.id)
+    if start_time is not None:
+        stmt = stmt.where(UserCapture.created_at >= start_time)
+    if end_time is not None:
+        stmt = stmt.where(UserCapture.created_at <= end_time)
+    stmt = stmt.execution_options(stream_results=True, yield_per=chunk_size)
+
+    db = SessionLocal()
+    try:
+        result = db.execute(stmt)
+        for partition in result.partitions(chunk_size):
+            rows = []
+            for row in partition:
+                record = dict(row._mapping)
+                if images == "key":
+                    record["image_key"] = image_key(record.pop("image"))
+                rows.append(record)
+            yield rows
+    finally:
+        db.close()
+
+
+def stream_ndjson(chunks: Iterator[list]) -> Iterator[bytes]:
+    for rows in chunks:
+        yield b"".join(dumps(row) + b"\n" for row in rows)
+
+
+def _arrow_schema(images: str):
+    fields = [
+        pa.field("id", pa.int64()),
+        pa.field("user_id", pa.string()),
+        pa.field("query_text", pa.string()),
+        pa.field("latitude", pa.float64()),
+        pa.field("longitude", pa.float64()),
+        pa.field("ai_response", pa.string()),
+        pa.field("created_at", pa.timestamp("us")),
+    ]
+    if images == "full":
+        fields.append(pa.field("image", pa.large_string()))
+    elif images == "key":
+        fields.append(pa.field("image_key", pa.string()))
+    return pa.schema(fields)
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that hands written bytes back to the caller."""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def stream_arrow(chunks: Iterator[list], images: str, fmt: str) -> Iterator[bytes]:
+    if pa is None:
+        raise RuntimeError("pyarrow is required for arrow/parquet export")
+
+    schema = _arrow_schema(images)
+    sink = _ChunkSink()
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+    try:
+        for rows in chunks:
+            batch = pa.RecordBatch.from_pylist(rows, schema=schema)
+            if fmt == "parquet":
+                writer.write_batch(batch, row_group_size=len(rows))
+            else:
+                writer.write_batch(batch)
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    data = sink.drain()
+    if data:
+        yield data
+
+
+def stream_captures(
+    fmt: str = "ndjson",
+    images: str = "full",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+) -> Iterator[bytes]:
+    """Encode all captures in ``fmt`` as an iterator of byte chunks."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"format must be one of {EXPORT_FORMATS}")
+    if fmt != "ndjson" and pa is None:
+        raise RuntimeError("pyarrow is required for arrow/parquet export")
+
+    chunks = iter_capture_chunks(images, chunk_size, start_time, end_time)
+    if fmt == "ndjson":
+        return stream_ndjson(chunks)
+    return stream_arrow(chunks, images, fmt)
@@ -0,0 +1,36 @@
+# File: export_captures.py
+"""Command-line bulk export of user captures.
+
+Example:
+    python export_captures.py --format parquet --images key -o captures.parquet
+"""
+import argparse
+import sys
+from datetime import datetime
+
+from export import stream_captures, EXPORT_FORMATS, IMAGE_MODES, DEFAULT_CHUNK_SIZE
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export user captures without loading the table into memory.")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="ndjson")
+    parser.add_argument("--images", choices=IMAGE_MODES, default="full",
+                        help="full: inline base64, omit: drop images, key: sha256 blob key")
+    parser.add_argument("--start-time", type=datetime.fromisoformat, default=None)
+    parser.add_argument("--end-time", type=datetime.fromisoformat, default=None)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("-o", "--output", default="-", help="Output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    chunks = stream_captures(args.format, args.images, args.chunk_size, args.start_time, args.end_time)
+    out = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+    try:
+        for chunk in chunks:
+            out.write(chunk)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
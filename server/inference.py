@@ -0,0 +1,314 @@
+# File: inference.py
+"""Pool of OpenAI-compatible inference backends.
+
+``BackendPool`` exposes the same ``chat.completions.create`` /
+``embeddings.create`` surface as an ``OpenAI`` client, so call sites do not
+change. Each call is routed to the backend with the best score (peak-EWMA
+latency or least outstanding requests), fails over to the next backend when
+the backend itself failed (connection error, timeout or 5xx; a 4xx is the
+caller's fault and is raised straight away), and can optionally be hedged: if the first backend has not answered
+after ``hedge_after`` seconds a duplicate request goes to the next one and
+whichever finishes first wins.
+"""
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from types import SimpleNamespace
+from typing import List, Optional
+
+from openai import APIConnectionError, APIStatusError, OpenAI
+
+logger = logging.getLogger(__name__)
+
+EWMA_ALPHA = 0.3
+FAILURES_BEFORE_EJECT = 3
+EJECT_SECONDS = 30.0
+# Latency charged to the EWMA for a failed call, so a backend that fails fast
+# does not look like the fastest one
+FAILURE_PENALTY_SECONDS = 5.0
+
+
+def is_backend_failure(error: Exception) -> bool:
+    """True for errors that say the backend is unwell rather than the request bad."""
+    if isinstance(error, APIStatusError):
+        return error.status_code >= 500
+    return isinstance(error, (APIConnectionError, ConnectionError, TimeoutError))
+
+
+class Backend:
+    """One inference endpoint plus its routing statistics."""
+
+    def __init__(self, name: str, client, model: Optional[str] = None):
+        self.name = name
+        self.client = client
+        self.model = model  # overrides the request's model when set
+        self.ewma_latency = 0.0
+        self.outstanding = 0
+        self.requests = 0
+        self.errors = 0
+        self.hedges_won = 0
+        self.consecutive_failures = 0
+        self.healthy = True
+        self.ejected_until = 0.0
+        self.last_error = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_url(cls, base_url: str, api_key: str, model: Optional[str] = None, timeout: float = 120.0) -> "Backend":
+        """Create a backend; ``fake://<latency_ms>`` gives an offline FakeClient."""
+        if base_url.startswith("fake://"):
+            latency_ms = base_url[len("fake://"):].strip("/")
+            client = FakeClient(latency=float(latency_ms or 0) / 1000)
+        else:
+            client = OpenAI(api_key=api_key, base_url=base_url, timeout=timeout, max_retries=0)
+        return cls(base_url, client, model)
+
+    def available(self, now: float) -> bool:
+        return self.healthy and now >= self.ejected_until
+
+    def score(self, strategy: str) -> tuple:
+        if strategy == "least_outstanding":
+            return (self.outstanding, self.ewma_latency)
+        # Peak-EWMA: expected latency scaled by queue depth
+        return ((self.outstanding + 1) * self.ewma_latency, self.outstanding)
+
+    def begin(self):
+        with self._lock:
+            self.outstanding += 1
+            self.requests += 1
+
+    def _observe(self, latency: float):
+        self.ewma_latency = latency if self.ewma_latency == 0 else (
+            EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * self.ewma_latency
+        )
+
+    def finish(self, latency: float, error: Optional[Exception] = None):
+        with self._lock:
+            self.outstanding -= 1
+            if error is None:
+                self._observe(latency)
+                self.consecutive_failures = 0
+                return
+            if not is_backend_failure(error):
+                # The backend answered; the request was rejected. Not its fault.
+                return
+            self._observe(max(latency, FAILURE_PENALTY_SECONDS))
+            self.errors += 1
+            self.consecutive_failures += 1
+            self.last_error = str(error)
+            if self.consecutive_failures >= FAILURES_BEFORE_EJECT:
+                self.ejected_until = time.monotonic() + EJECT_SECONDS
+                logger.warning(f"Ejecting backend {self.name} for {EJECT_SECONDS}s after repeated failures")
+
+    def metrics(self) -> dict:
+        return {
+            "name": self.name,
+            "model": self.model,
+            "healthy": self.healthy,
+            "ejected": time.monotonic() < self.ejected_until,
+            "ewma_latency_ms": round(self.ewma_latency * 1000, 1),
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "errors": self.errors,
+            "hedges_won": self.hedges_won,
+            "last_error": self.last_error,
+        }
+
+
+class _Endpoint:
+    """Callable stand-in for ``client.<group>.create``."""
+
+    def __init__(self, pool: "BackendPool", path: tuple):
+        self._pool = pool
+        self._path = path
+
+    def create(self, **kwargs):
+        return self._pool.call(self._path, kwargs)
+
+
+class BackendPool:
+    def __init__(self, backends: List[Backend], strategy: str = "ewma", hedge_after: float = 0.0,
+                 health_interval: float = 15.0, health_timeout: float = 5.0):
+        if not backends:
+            raise ValueError("BackendPool needs at least one backend")
+        self.backends = backends
+        self.strategy = strategy
+        self.hedge_after = hedge_after
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self._executor = ThreadPoolExecutor(max_workers=max(4, 4 * len(backends)), thread_name_prefix="inference")
+        self._health_thread = None
+        self._stop = threading.Event()
+
+        self.chat = SimpleNamespace(completions=_Endpoint(self, ("chat", "completions")))
+        self.embeddings = _Endpoint(self, ("embeddings",))
+
+    @classmethod
+    def from_urls(cls, base_urls: List[str], api_key: str, **kwargs) -> "BackendPool":
+        """Build a pool from ``url`` or ``url|model`` entries."""
+        backends = []
+        for entry in base_urls:
+            url, _, model = entry.strip().partition("|")
+            if url:
+                backends.append(Backend.from_url(url, api_key, model or None))
+        return cls(backends, **kwargs)
+
+    # ---- routing -----------------------------------------------------
+
+    def ranked(self) -> List[Backend]:
+        """Backends in routing order; unavailable ones go last rather than vanish."""
+        now = time.monotonic()
+        # Shuffle first so equal scores spread load instead of always hitting backend 0
+        candidates = random.sample(self.backends, len(self.backends))
+        return sorted(candidates, key=lambda b: (not b.available(now), b.score(self.strategy)))
+
+    def _invoke(self, backend: Backend, path: tuple, kwargs: dict):
+        target = backend.client
+        for attr in path:
+            target = getattr(target, attr)
+        if backend.model and "model" in kwargs:
+            kwargs = {**kwargs, "model": backend.model}
+        backend.begin()
+        start = time.perf_counter()
+        try:
+            result = target.create(**kwargs)
+        except Exception as e:
+            backend.finish(time.perf_counter() - start, e)
+            raise
+        backend.finish(time.perf_counter() - start)
+        return result
+
+    def call(self, path: tuple, kwargs: dict):
+        ranked = self.ranked()
+        if self.hedge_after > 0 and len(ranked) > 1 and not kwargs.get("stream"):
+            return self._call_hedged(ranked, path, kwargs)
+
+        last_error = None
+        for backend in ranked:
+            try:
+                return self._invoke(backend, path, kwargs)
+            except Exception as e:
+                if not is_backend_failure(e):
+                    raise
+                last_error = e
+                logger.warning(f"Backend {backend.name} failed, failing over: {str(e)}")
+        raise last_error
+
+    def _call_hedged(self, ranked: List[Backend], path: tuple, kwargs: dict):
+        """Primary request, plus a duplicate on the next backend if it is slow.
+
+        Backend failures also trigger the next backend immediately, so
+        hedging doubles as failover; a rejected request is raised at once.
+        """
+        pending = {}
+        remaining = list(ranked)
+        last_error = None
+
+        def launch():
+            backend = remaining.pop(0)
+            pending[self._executor.submit(self._invoke, backend, path, kwargs)] = backend
+
+        launch()
+        while pending:
+            timeout = self.hedge_after if remaining else None
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                launch()
+                continue
+            for future in done:
+                backend = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    if not is_backend_failure(e):
+                        raise
+                    last_error = e
+                    logger.warning(f"Backend {backend.name} failed, failing over: {str(e)}")
+                    if remaining:
+                        launch()
+                    continue
+                if backend is not ranked[0]:
+                    backend.hedges_won += 1
+                return result
+        raise last_error
+
+    # ---- health ------------------------------------------------------
+
+    def check_health(self):
+        for backend in self.backends:
+            try:
+                backend.client.models.list(timeout=self.health_timeout)
+                if not backend.healthy:
+                    logger.info(f"Backend {backend.name} is healthy again")
+                backend.healthy = True
+            except Exception as e:
+                if backend.healthy:
+                    logger.warning(f"Backend {backend.name} failed health check: {str(e)}")
+                backend.healthy = False
+                backend.last_error = str(e)
+
+    def start_health_checks(self):
+        if self._health_thread is not None or self.health_interval <= 0:
+            return
+
+        def loop():
+            while not self._stop.wait(self.health_interval):
+                self.check_health()
+
+        self._health_thread = threading.Thread(target=loop, name="inference-health", daemon=True)
+        self._health_thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._executor.shutdown(wait=False)
+
+    def metrics(self) -> dict:
+        return {
+            "strategy": self.strategy,
+            "hedge_after_seconds": self.hedge_after,
+            "backends": [backend.metrics() for backend in self.backends],
+        }
+
+
+class FakeClient:
+    """Offline stand-in for an ``OpenAI`` client, for exercising the router.
+
+    ``latency`` is in seconds (a callable may return a per-call value) and
+    ``failure_rate`` is the probability that a call raises ``error`` (an
+    exception class or factory; a connection error by default).
+    """
+
+    def __init__(self, reply: str = "{}", latency=0.0, failure_rate: float = 0.0, healthy: bool = True,
+                 error=None):
+        self.reply = reply
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.error = error or (lambda: ConnectionError("fake backend failure"))
+        self.is_healthy = healthy
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._chat))
+        self.embeddings = SimpleNamespace(create=self._embed)
+        self.models = SimpleNamespace(list=self._models)
+
+    def _delay(self):
+        self.calls += 1
+        time.sleep(self.latency() if callable(self.latency) else self.latency)
+        if random.random() < self.failure_rate:
+            raise self.error()
+
+    def _chat(self, **kwargs):
+        self._delay()
+        message = SimpleNamespace(content=self.reply, role="assistant")
+        usage = SimpleNamespace(prompt_tokens=0, completion_tokens=0, prompt_tokens_details=None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage, model=kwargs.get("model"))
+
+    def _embed(self, **kwargs):
+        self._delay()
+        return SimpleNamespace(data=[SimpleNamespace(embedding=[0.0] * 8) for _ in kwargs.get("input", [])])
+
+    def _models(self, timeout=None):
+        if not self.is_healthy:
+            raise ConnectionError("fake backend unhealthy")
+        return SimpleNamespace(data=[])
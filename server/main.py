@@ -2,12 +2,20 @@
 from fastapi import FastAPI
 import uvicorn
 from fastapi.middleware.cors import CORSMiddleware
-from middleware import TimingMiddleware
-from database import startup_event
+from middleware import TimingMiddleware, CompressionMiddleware
+from config import COMPRESSION_MINIMUM_SIZE
+from database import startup_event, engine
+from migrations import startup_lock
+from clients import client
+from events import change_feed, backfill_change_seq
+from pdf_pipeline import shutdown_pool
+from retention import retention_worker
 from fastapi.responses import RedirectResponse
 
 from routers.core import router as core_router
 from routers.v1 import router as v1_router
+from routers.live import router as live_router
+from routers.mowing import router as mowing_router
 
 app = FastAPI(title="Thunder EDTH", description="Danger Detection")
 
@@ -18,9 +26,12 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MINIMUM_SIZE)
 
 app.include_router(core_router)
 app.include_router(v1_router)
+app.include_router(live_router)
+app.include_router(mowing_router)
 
 
 @app.get("/",
@@ -32,7 +43,20 @@ async def home():
 
 @app.on_event("startup")
 async def on_startup():
-    await startup_event()
+    # Replicas starting together would otherwise both seed and backfill
+    with startup_lock(engine):
+        await startup_event()
+        backfill_change_seq()
+    client.start_health_checks()
+    await change_feed.start()
+    await retention_worker.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await change_feed.stop()
+    await retention_worker.stop()
+    client.stop()
+    shutdown_pool()
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
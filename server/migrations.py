@@ -0,0 +1,102 @@
+# File: migrations.py
+"""Additive schema migrations for databases created by older versions.
+
+``Base.metadata.create_all`` only creates missing tables, so columns added to
+existing models are applied here with ALTER TABLE. Each step is idempotent
+and written to run on both SQLite and PostgreSQL; steps that need PostGIS
+only run when it is in use.
+"""
+import logging
+from contextlib import contextmanager
+
+from sqlalchemy import inspect, text
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary constant shared by every replica; see startup_lock
+STARTUP_LOCK_KEY = 727_130_001
+
+# (table, column, column DDL, PostGIS only)
+COLUMNS = [
+    ("user_captures", "change_seq", "change_seq INTEGER", False),
+    ("user_captures", "client_capture_id", "client_capture_id VARCHAR", False),
+    ("user_captures", "location", "location geography(POINT, 4326)", True),
+    ("user_captures", "image_preview_at", "image_preview_at TIMESTAMP", False),
+    ("pdf_documents", "last_used_at", "last_used_at TIMESTAMP", False),
+]
+
+# (index name, table, columns, unique)
+INDEXES = [
+    ("ix_user_captures_change_seq", "user_captures", "change_seq", False),
+    ("ix_user_captures_client_capture_id", "user_captures", "client_capture_id", True),
+    ("ix_user_captures_lat_lon", "user_captures", "latitude, longitude", False),  # bounding-box prefilter
+    ("ix_user_captures_created_at", "user_captures", "created_at", False),  # retention and time-range scans
+    ("ix_pdf_documents_last_used_at", "pdf_documents", "last_used_at", False),  # PDF cache expiry
+]
+
+POSTGIS_STATEMENTS = [
+    "CREATE INDEX IF NOT EXISTS ix_user_captures_location ON user_captures USING GIST (location)",
+    # Rows written before the column existed
+    "UPDATE user_captures SET location = ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)::geography "
+    "WHERE location IS NULL AND latitude IS NOT NULL AND longitude IS NOT NULL",
+]
+
+
+@contextmanager
+def startup_lock(engine):
+    """Serialise schema setup and seeding across replicas starting together.
+
+    Uses a Postgres session-level advisory lock; SQLite has a single writer
+    on a single node, so it is a no-op there.
+    """
+    if engine.dialect.name != "postgresql":
+        yield
+        return
+    with engine.connect() as conn:
+        conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": STARTUP_LOCK_KEY})
+        conn.commit()
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": STARTUP_LOCK_KEY})
+            conn.commit()
+
+
+def postgis_available(engine) -> bool:
+    """Whether the server can load PostGIS (it is a separate install from Postgres itself)."""
+    if engine.dialect.name != "postgresql":
+        return False
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT 1 FROM pg_available_extensions WHERE name = 'postgis'")).first() is not None
+
+
+def prepare_database(engine, postgis: bool = False):
+    """Steps that must run before ``create_all``."""
+    if engine.dialect.name == "sqlite":
+        # Only takes effect on a new file; existing files need one VACUUM (see retention.py)
+        with engine.connect() as conn:
+            conn.execute(text("PRAGMA auto_vacuum = INCREMENTAL"))
+            if conn.execute(text("PRAGMA auto_vacuum")).scalar() != 2:
+                logger.warning("SQLite auto_vacuum is not INCREMENTAL; set SQLITE_CONVERT_AUTO_VACUUM=1 "
+                               "to convert with a one-off VACUUM.")
+    if postgis:
+        with engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS postgis"))
+
+
+def run_migrations(engine, postgis: bool = False):
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table, column, ddl, postgis_only in COLUMNS:
+            if postgis_only and not postgis:
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table)}
+            if column not in existing:
+                logger.info(f"Adding column {table}.{column}")
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {ddl}"))
+        for name, table, columns, unique in INDEXES:
+            unique_sql = "UNIQUE " if unique else ""
+            conn.execute(text(f"CREATE {unique_sql}INDEX IF NOT EXISTS {name} ON {table} ({columns})"))
+        if postgis:
+            for statement in POSTGIS_STATEMENTS:
+                conn.execute(text(statement))
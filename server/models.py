@@ -1,11 +1,11 @@
 # models.py
-from pydantic import BaseModel
-from typing import Optional
-from config import DEFAULT_SYSTEM_PROMPT
+from pydantic import BaseModel, Field
+from typing import List, Optional
 
 class TextQueryRequest(BaseModel):
     prompt: str
-    system_prompt: str = DEFAULT_SYSTEM_PROMPT
+    prompt_id: Optional[str] = None  # Registered prompt, e.g. "garden-watch@1"; wins over system_prompt
+    system_prompt: Optional[str] = None
 
 class ImageQueryRequest(BaseModel):
     text: str
@@ -29,8 +29,63 @@ class ExtractTextResponse(BaseModel):
     extracted_text: str
     page_number: int
     language: str
+    page_count: Optional[int] = None
+    cached: Optional[bool] = None  # Served from the page cache without parsing the PDF
 
 class PdfSummaryResponse(BaseModel):
     summary: str
     tgt_lang: str
-    model: str
\ No newline at end of file
+    model: str
+    page_count: Optional[int] = None
+    model_calls: Optional[int] = None
+    input_tokens: Optional[int] = None  # Document tokens sent to the map stage
+    budget_scale: Optional[float] = None  # < 1 when pages were shortened to fit the token budget
+
+class PromptInfo(BaseModel):
+    prompt_id: str
+    name: str
+    version: int
+    sha256: str
+    token_count: int
+    text: str
+
+class MowingObstacle(BaseModel):
+    polygon: Optional[List[List[float]]] = None  # [[lat, lon], ...]
+    center: Optional[List[float]] = None  # [lat, lon], with radius_m
+    radius_m: Optional[float] = None
+
+class MowingPlanRequest(BaseModel):
+    boundary: Optional[List[List[float]]] = None  # [[lat, lon], ...]; defaults to the hull of capture_ids
+    capture_ids: Optional[List[int]] = None
+    obstacles: List[MowingObstacle] = []
+    cutting_width_m: float = Field(0.5, gt=0.05, le=5.0)
+    overlap: float = Field(0.02, ge=0.0, lt=0.5)
+    resolution_m: float = Field(0.1, ge=0.02, le=2.0)
+    heading_deg: Optional[float] = None  # Fixed stripe heading; searched when omitted
+
+class MowingPlanResponse(BaseModel):
+    plan_id: str
+    area_m2: float
+    heading_deg: float
+    stripe_spacing_m: float
+    stripes: int
+    turns: int
+    mowing_length_m: float
+    path_length_m: float
+    transit_length_m: float  # Part of path_length_m driven between mowing segments
+    overlap_fraction: float
+    path: List[List[float]]  # [[lat, lon], ...]
+
+class MowingTraceRequest(BaseModel):
+    points: List[List[float]]  # [[lat, lon], ...] in driving order
+    new_segment: bool = False  # Do not join on to the previous trace (e.g. after lifting the blade)
+
+class MowingCoverageResponse(BaseModel):
+    plan_id: str
+    coverage: float
+    covered_m2: float
+    mowable_m2: float
+    newly_covered_m2: Optional[float] = None
+    heatmap: Optional[List[List[Optional[float]]]] = None
+    heatmap_cell_m: Optional[float] = None
+    heatmap_origin: Optional[List[float]] = None  # [lat, lon] of the south-west corner
@@ -0,0 +1,55 @@
+# File: pdf_extract.py
+"""Page text extraction, run inside the PDF process pool.
+
+Kept free of application imports (database, clients) so spawned workers
+start quickly and never open database connections.
+"""
+import shutil
+from typing import List, Tuple
+
+from pypdf import PdfReader
+
+try:
+    import pytesseract
+    from pdf2image import convert_from_path
+except ImportError:  # OCR is optional; scanned pages then come back empty
+    pytesseract = None
+    convert_from_path = None
+
+OCR_MIN_CHARS = 20  # Pages with less extractable text than this are treated as scanned
+OCR_DPI = 200
+
+
+def ocr_available() -> bool:
+    return pytesseract is not None and shutil.which("tesseract") is not None and shutil.which("pdftoppm") is not None
+
+
+def page_count(path: str) -> int:
+    return len(PdfReader(path).pages)
+
+
+def _ocr_page(path: str, index: int) -> str:
+    images = convert_from_path(path, dpi=OCR_DPI, first_page=index + 1, last_page=index + 1)
+    return "\n".join(pytesseract.image_to_string(image) for image in images)
+
+
+def extract_pages(path: str, page_numbers: List[int], ocr: bool = False) -> List[Tuple[int, str]]:
+    """(page number, text) for the given 1-based pages.
+
+    The reader parses pages lazily, so only the requested pages are decoded.
+    A page that fails to parse yields empty text rather than failing the batch.
+    """
+    reader = PdfReader(path)
+    results = []
+    for page_number in page_numbers:
+        try:
+            text = reader.pages[page_number - 1].extract_text() or ""
+        except Exception:
+            text = ""
+        if ocr and len(text.strip()) < OCR_MIN_CHARS:
+            try:
+                text = _ocr_page(path, page_number - 1) or text
+            except Exception:
+                pass
+        results.append((page_number, text))
+    return results
@@ -0,0 +1,362 @@
+# File: pdf_pipeline.py
+"""PDF text extraction and map-reduce summarization.
+
+Uploads are spooled to disk while they are hashed, so memory does not grow
+with the file. Pages are extracted lazily in a process pool, a small batch of
+pages per task, and each page's text is cached in ``pdf_pages`` under the
+document's SHA-256 as soon as its batch finishes; a page that is already
+cached is served without opening the PDF. Summaries pack pages into
+token-bounded chunks, summarise them concurrently (map) and merge the partial
+summaries until one remains (reduce). Cached documents expire
+``PDF_CACHE_TTL_DAYS`` after they were last used. When the document is larger than the
+token budget, every page is cut down by the same ratio so the summary still
+covers the whole document.
+"""
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy import and_, func, or_
+from sqlalchemy.exc import IntegrityError
+
+from clients import client
+from database import SessionLocal, PdfDocument, PdfPage
+from pdf_extract import extract_pages, page_count, ocr_available
+from prompts import get_prompt, build_messages, count_tokens
+
+logger = logging.getLogger(__name__)
+
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "8"))
+PDF_MAX_BYTES = int(os.getenv("PDF_MAX_BYTES", str(100 * 1024 * 1024)))
+PDF_CACHE_TTL_DAYS = int(os.getenv("PDF_CACHE_TTL_DAYS", "30"))
+PDF_OCR = os.getenv("PDF_OCR", "1") == "1"
+PDF_CHUNK_TOKENS = int(os.getenv("PDF_CHUNK_TOKENS", "3000"))  # input per model call
+PDF_SUMMARY_TOKEN_BUDGET = int(os.getenv("PDF_SUMMARY_TOKEN_BUDGET", "120000"))  # document text sent in total
+PDF_SUMMARY_CONCURRENCY = int(os.getenv("PDF_SUMMARY_CONCURRENCY", "4"))
+PDF_MAP_MAX_TOKENS = int(os.getenv("PDF_MAP_MAX_TOKENS", "400"))
+PDF_SUMMARY_MAX_TOKENS = int(os.getenv("PDF_SUMMARY_MAX_TOKENS", "800"))
+SPOOL_CHUNK_BYTES = 1024 * 1024
+# last_used_at is written at most this often per document, so reads stay reads
+LAST_USED_RESOLUTION = timedelta(hours=1)
+PAGE_READ_WINDOW = 32
+
+
+class PdfError(ValueError):
+    """The upload is not a readable PDF or the request does not fit it."""
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn: workers import only pdf_extract, never the server's threads or connections
+                _pool = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def spool_upload(upload) -> Tuple[str, str]:
+    """Copy an UploadFile to a temp file in fixed-size chunks; returns (path, sha256)."""
+    digest = hashlib.sha256()
+    size = 0
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await upload.read(SPOOL_CHUNK_BYTES)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > PDF_MAX_BYTES:
+                    raise PdfError(f"PDF exceeds the {PDF_MAX_BYTES // (1024 * 1024)} MB limit")
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path, digest.hexdigest()
+
+
+def _document_page_count(sha256: str) -> Optional[int]:
+    """Page count of a known document, marking it as used; None for a new one."""
+    db = SessionLocal()
+    try:
+        document = db.get(PdfDocument, sha256)
+        if document is None:
+            return None
+        now = datetime.utcnow()
+        if document.last_used_at is None or now - document.last_used_at >= LAST_USED_RESOLUTION:
+            document.last_used_at = now
+            db.commit()
+        return document.page_count
+    finally:
+        db.close()
+
+
+def _record_document(sha256: str, count: int):
+    db = SessionLocal()
+    try:
+        if db.get(PdfDocument, sha256) is None:
+            db.add(PdfDocument(sha256=sha256, page_count=count))
+            # Opportunistic expiry of documents nobody has used for a while
+            cutoff = datetime.utcnow() - timedelta(days=PDF_CACHE_TTL_DAYS)
+            unused = or_(
+                PdfDocument.last_used_at < cutoff,
+                and_(PdfDocument.last_used_at.is_(None), PdfDocument.created_at < cutoff),  # recorded before the column
+            )
+            expired = [row.sha256 for row in db.query(PdfDocument.sha256).filter(unused)]
+            if expired:
+                db.query(PdfPage).filter(PdfPage.sha256.in_(expired)).delete(synchronize_session=False)
+                db.query(PdfDocument).filter(PdfDocument.sha256.in_(expired)).delete(synchronize_session=False)
+                logger.info(f"Expired {len(expired)} cached PDF documents.")
+            db.commit()
+    except IntegrityError:
+        db.rollback()  # another request recorded the same document first
+    finally:
+        db.close()
+
+
+def get_cached_page(sha256: str, page_number: int) -> Optional[str]:
+    db = SessionLocal()
+    try:
+        row = db.query(PdfPage.text).filter(PdfPage.sha256 == sha256, PdfPage.page_number == page_number).first()
+        return row.text if row else None
+    finally:
+        db.close()
+
+
+def _cached_page_numbers(sha256: str) -> set:
+    db = SessionLocal()
+    try:
+        return {row.page_number for row in db.query(PdfPage.page_number).filter(PdfPage.sha256 == sha256)}
+    finally:
+        db.close()
+
+
+def _store_pages(sha256: str, pages: List[Tuple[int, str]]):
+    db = SessionLocal()
+    try:
+        cached = {
+            row.page_number for row in db.query(PdfPage.page_number).filter(
+                PdfPage.sha256 == sha256, PdfPage.page_number.in_([number for number, _ in pages])
+            )
+        }
+        for page_number, text in pages:
+            if page_number not in cached:
+                db.add(PdfPage(sha256=sha256, page_number=page_number, text=text, token_count=count_tokens(text)))
+        db.commit()
+    except IntegrityError:
+        db.rollback()  # a concurrent extraction of the same document stored these pages
+    finally:
+        db.close()
+
+
+async def ensure_pages(path: str, sha256: str, page_numbers: Optional[List[int]] = None) -> int:
+    """Extract and cache the given pages (all when None) that are not cached yet.
+
+    At most two batches per worker are in flight, and each batch is written
+    to the cache as it completes, so memory is bounded by the batch size, not
+    the document. Returns the document's page count.
+    """
+    loop = asyncio.get_running_loop()
+    pool = get_pool()
+    count = await asyncio.to_thread(_document_page_count, sha256)
+    if count is None:
+        try:
+            count = await loop.run_in_executor(pool, page_count, path)
+        except BrokenProcessPool:
+            shutdown_pool()  # a worker died (e.g. out of memory); start fresh on the next request
+            raise
+        except Exception as e:
+            raise PdfError(f"Could not read PDF: {str(e)}")
+        await asyncio.to_thread(_record_document, sha256, count)
+
+    wanted = range(1, count + 1) if page_numbers is None else page_numbers
+    for page_number in wanted:
+        if not 1 <= page_number <= count:
+            raise PdfError(f"page_number must be between 1 and {count}")
+    cached = await asyncio.to_thread(_cached_page_numbers, sha256)
+    missing = [n for n in wanted if n not in cached]
+    if not missing:
+        return count
+
+    ocr = PDF_OCR and ocr_available()
+    batches = [missing[i:i + PDF_PAGES_PER_TASK] for i in range(0, len(missing), PDF_PAGES_PER_TASK)]
+    in_flight = asyncio.Semaphore(PDF_WORKERS * 2)
+
+    async def run(batch):
+        async with in_flight:
+            pages = await loop.run_in_executor(pool, extract_pages, path, batch, ocr)
+            await asyncio.to_thread(_store_pages, sha256, pages)
+
+    try:
+        await asyncio.gather(*(run(batch) for batch in batches))
+    except BrokenProcessPool:
+        shutdown_pool()
+        raise
+    logger.info(f"Extracted {len(missing)} pages of PDF {sha256[:12]} ({count} pages total).")
+    return count
+
+
+def _total_tokens(sha256: str) -> int:
+    db = SessionLocal()
+    try:
+        return db.query(func.coalesce(func.sum(PdfPage.token_count), 0)).filter(PdfPage.sha256 == sha256).scalar()
+    finally:
+        db.close()
+
+
+def _read_pages(sha256: str, first: int, last: int) -> List[Tuple[int, str, int]]:
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(PdfPage.page_number, PdfPage.text, PdfPage.token_count)
+            .filter(PdfPage.sha256 == sha256, PdfPage.page_number.between(first, last))
+            .order_by(PdfPage.page_number)
+            .all()
+        )
+        return [(row.page_number, row.text or "", row.token_count or 0) for row in rows]
+    finally:
+        db.close()
+
+
+def iter_chunks(sha256: str, count: int, chunk_tokens: int, scale: float) -> Iterator[str]:
+    """Page text packed into chunks of about ``chunk_tokens``, each page cut to ``scale`` of its length.
+
+    Pages are read from the cache a window at a time.
+    """
+    parts: List[str] = []
+    size = 0
+    for first in range(1, count + 1, PAGE_READ_WINDOW):
+        for page_number, text, tokens in _read_pages(sha256, first, min(count, first + PAGE_READ_WINDOW - 1)):
+            if scale < 1.0:
+                text = text[:int(len(text) * scale)]
+                tokens = int(tokens * scale)
+            if not text.strip():
+                continue
+            # Oversized pages are split by character share of their token count
+            pieces = max(1, -(-tokens // chunk_tokens))
+            step = -(-len(text) // pieces)
+            for i in range(pieces):
+                piece = text[i * step:(i + 1) * step]
+                piece_tokens = tokens // pieces
+                if parts and size + piece_tokens > chunk_tokens:
+                    yield "\n\n".join(parts)
+                    parts, size = [], 0
+                parts.append(f"[Page {page_number}]\n{piece}")
+                size += piece_tokens
+    if parts:
+        yield "\n\n".join(parts)
+
+
+async def _complete(prompt_id: str, text: str, model: str, max_tokens: int) -> str:
+    messages = build_messages(get_prompt(prompt_id), text)
+    response = await asyncio.to_thread(
+        client.chat.completions.create, model=model, messages=messages, max_tokens=max_tokens, temperature=0.2
+    )
+    return response.choices[0].message.content.strip()
+
+
+async def _map_bounded(prompt_id: str, texts: Iterator[str], model: str, max_tokens: int,
+                       concurrency: int) -> Tuple[List[str], int]:
+    """Run one model call per text, at most ``concurrency`` at once, results in input order.
+
+    Texts are pulled from the iterator only when a slot frees up, so no more
+    than ``concurrency`` chunks are held in memory.
+    """
+    slots = asyncio.Semaphore(concurrency)
+    tasks = []
+
+    async def run(text):
+        try:
+            return await _complete(prompt_id, text, model, max_tokens)
+        finally:
+            slots.release()
+
+    while True:
+        await slots.acquire()
+        text = await asyncio.to_thread(next, texts, None)  # may read pages from the database
+        if text is None:
+            slots.release()
+            break
+        tasks.append(asyncio.create_task(run(text)))
+    try:
+        results = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+    return list(results), len(tasks)
+
+
+def _reduce_groups(summaries: List[str], chunk_tokens: int) -> List[str]:
+    """Inputs for the next reduce level, always fewer than ``summaries``.
+
+    When no two summaries fit in one chunk, packing would give back one input
+    per summary and the reduce loop would never finish, so fall back to
+    merging pairs; the model call bounds each merged summary again.
+    """
+    groups = list(_pack(summaries, chunk_tokens))
+    if len(groups) < len(summaries):
+        return groups
+    return ["\n\n".join(summaries[i:i + 2]) for i in range(0, len(summaries), 2)]
+
+
+def _pack(texts: List[str], chunk_tokens: int) -> Iterator[str]:
+    parts: List[str] = []
+    size = 0
+    for text in texts:
+        tokens = count_tokens(text)
+        if parts and size + tokens > chunk_tokens:
+            yield "\n\n".join(parts)
+            parts, size = [], 0
+        parts.append(text)
+        size += tokens
+    if parts:
+        yield "\n\n".join(parts)
+
+
+async def summarize_document(sha256: str, count: int, tgt_lang: str, model: str) -> dict:
+    """Map-reduce summary of a document whose pages are already cached."""
+    total = await asyncio.to_thread(_total_tokens, sha256)
+    scale = min(1.0, PDF_SUMMARY_TOKEN_BUDGET / total) if total else 1.0
+    chunks = iter_chunks(sha256, count, PDF_CHUNK_TOKENS, scale)
+    calls = 0
+
+    summaries, made = await _map_bounded("pdf-map", chunks, model, PDF_MAP_MAX_TOKENS, PDF_SUMMARY_CONCURRENCY)
+    calls += made
+    # Reduce partial summaries level by level until they fit one call
+    while len(summaries) > 1 and sum(count_tokens(s) for s in summaries) > PDF_CHUNK_TOKENS:
+        summaries, made = await _map_bounded(
+            "pdf-map", iter(_reduce_groups(summaries, PDF_CHUNK_TOKENS)), model, PDF_MAP_MAX_TOKENS,
+            PDF_SUMMARY_CONCURRENCY
+        )
+        calls += made
+
+    if not summaries:
+        return {"summary": "", "calls": calls, "input_tokens": 0, "budget_scale": scale}
+    final_input = f"Target language: {tgt_lang}\n\n" + "\n\n".join(summaries)
+    summary = await _complete("pdf-reduce", final_input, model, PDF_SUMMARY_MAX_TOKENS)
+    calls += 1
+    logger.info(f"Summarized PDF {sha256[:12]}: {count} pages, {total} tokens, scale {scale:.2f}, {calls} model calls.")
+    return {"summary": summary, "calls": calls, "input_tokens": int(total * scale), "budget_scale": round(scale, 4)}
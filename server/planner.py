@@ -0,0 +1,520 @@
+# File: planner.py
+"""Lawn coverage and mowing-path planning (MowGO).
+
+Geometry is handled in a local metric frame (equirectangular projection
+around the lawn). Stripe paths are computed analytically by intersecting
+parallel lines with the lawn and obstacle polygons, trying several headings
+and keeping the one with the fewest turns; moves between segments are routed
+through free space. Coverage is tracked on a boolean
+NumPy grid (10 cm by default) that streamed GPS traces paint into
+incrementally, touching only the cells around each new trace segment.
+"""
+import heapq
+import math
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371008.8
+CIRCLE_SEGMENTS = 24
+GEOMETRY_EPS = 1e-6  # metres; points this close to an edge count as on it
+# Rows per vectorised batch in FreeSpace, bounding the (rows x edges) temporaries
+_BATCH = 4096
+_LEG_BATCH = 1024
+
+
+class LocalProjection:
+    """Equirectangular lat/lon <-> metres around a reference point."""
+
+    def __init__(self, lat0: float, lon0: float):
+        self.lat0 = lat0
+        self.lon0 = lon0
+        self._kx = math.radians(1) * EARTH_RADIUS_M * math.cos(math.radians(lat0))
+        self._ky = math.radians(1) * EARTH_RADIUS_M
+
+    def to_xy(self, latlon) -> np.ndarray:
+        latlon = np.asarray(latlon, dtype=np.float64).reshape(-1, 2)
+        return np.column_stack(((latlon[:, 1] - self.lon0) * self._kx, (latlon[:, 0] - self.lat0) * self._ky))
+
+    def to_latlon(self, xy) -> np.ndarray:
+        xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+        return np.column_stack((xy[:, 1] / self._ky + self.lat0, xy[:, 0] / self._kx + self.lon0))
+
+
+def _cross(o, a, b) -> float:
+    return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+
+def convex_hull(points: np.ndarray) -> np.ndarray:
+    """Andrew's monotone chain; used when only capture GPS points are known."""
+    pts = np.unique(np.asarray(points, dtype=np.float64), axis=0)
+    if len(pts) < 3:
+        raise ValueError("At least three distinct points are needed to outline a lawn")
+    pts = pts[np.lexsort((pts[:, 1], pts[:, 0]))]
+
+    def half(sequence):
+        chain = []
+        for p in sequence:
+            while len(chain) >= 2 and _cross(chain[-2], chain[-1], p) <= 0:
+                chain.pop()
+            chain.append(p)
+        return chain
+
+    lower, upper = half(pts), half(pts[::-1])
+    return np.array(lower[:-1] + upper[:-1])
+
+
+def circle_polygon(center_xy: Sequence[float], radius: float) -> np.ndarray:
+    angles = np.linspace(0, 2 * np.pi, CIRCLE_SEGMENTS, endpoint=False)
+    return np.column_stack((center_xy[0] + radius * np.cos(angles), center_xy[1] + radius * np.sin(angles)))
+
+
+def polygon_area(poly: np.ndarray) -> float:
+    x, y = poly[:, 0], poly[:, 1]
+    return 0.5 * abs(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1)))
+
+
+def _edges(polygons: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    starts = np.concatenate(polygons)
+    ends = np.concatenate([np.roll(p, -1, axis=0) for p in polygons])
+    return starts[:, 0], starts[:, 1], ends[:, 0], ends[:, 1]
+
+
+def scanline_intervals(polygons: List[np.ndarray], ys: np.ndarray) -> List[np.ndarray]:
+    """For each horizontal line y in ``ys``, the sorted x crossings (even-odd rule).
+
+    Vectorised over all lines and edges at once; returns one array per line
+    whose consecutive pairs are inside-intervals.
+    """
+    x0, y0, x1, y1 = _edges(polygons)
+    y = ys[:, None]
+    crosses = (y0 <= y) != (y1 <= y)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        xs = x0 + (y - y0) * (x1 - x0) / (y1 - y0)
+    xs = np.where(crosses, xs, np.inf)
+    xs.sort(axis=1)
+    counts = crosses.sum(axis=1)
+    return [row[:n] for row, n in zip(xs, counts)]
+
+
+def rasterize(polygons: List[np.ndarray], origin: Tuple[float, float], resolution: float,
+              shape: Tuple[int, int]) -> np.ndarray:
+    """Boolean grid of cell centres inside ``polygons`` (even-odd rule)."""
+    rows, cols = shape
+    if not polygons:
+        return np.zeros(shape, dtype=bool)
+    ys = origin[1] + (np.arange(rows) + 0.5) * resolution
+    x0, y0, x1, y1 = _edges(polygons)
+    y = ys[:, None]
+    crosses = (y0 <= y) != (y1 <= y)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        xs = x0 + (y - y0) * (x1 - x0) / (y1 - y0)
+    xs = np.where(crosses, xs, np.inf)
+    xs.sort(axis=1)
+    counts = crosses.sum(axis=1)
+
+    # Span fill via a difference array: +1 at each span start, -1 after its end
+    diff = np.zeros((rows, cols + 1), dtype=np.int32)
+    row_index = np.arange(rows)
+    for k in range(0, int(counts.max(initial=0)) - 1, 2):
+        valid = counts > k + 1
+        start = np.ceil((xs[valid, k] - origin[0]) / resolution - 0.5).astype(np.int64)
+        end = np.floor((xs[valid, k + 1] - origin[0]) / resolution - 0.5).astype(np.int64) + 1
+        start = np.clip(start, 0, cols)
+        end = np.clip(end, 0, cols)
+        keep = end > start
+        np.add.at(diff, (row_index[valid][keep], start[keep]), 1)
+        np.add.at(diff, (row_index[valid][keep], end[keep]), -1)
+    return np.cumsum(diff, axis=1)[:, :cols] > 0
+
+
+def _subtract(intervals: List[Tuple[float, float]], holes: List[Tuple[float, float]]) -> List[Tuple[float, float]]:
+    result = []
+    for a, b in intervals:
+        pieces = [(a, b)]
+        for h0, h1 in holes:
+            next_pieces = []
+            for p0, p1 in pieces:
+                if h1 <= p0 or h0 >= p1:
+                    next_pieces.append((p0, p1))
+                    continue
+                if h0 > p0:
+                    next_pieces.append((p0, h0))
+                if h1 < p1:
+                    next_pieces.append((h1, p1))
+            pieces = next_pieces
+        result.extend(pieces)
+    return result
+
+
+def _rotate(points: np.ndarray, angle: float) -> np.ndarray:
+    c, s = math.cos(angle), math.sin(angle)
+    return points @ np.array([[c, -s], [s, c]])
+
+
+def stripe_segments(boundary: np.ndarray, obstacles: List[np.ndarray], heading: float, spacing: float,
+                    min_length: float) -> List[List[Tuple[float, float]]]:
+    """Mowable segments along each stripe, in the frame rotated by ``heading``.
+
+    Rotating by -heading makes the stripes horizontal, so each stripe is one
+    scanline; obstacle crossings are subtracted from the lawn crossings.
+    """
+    rb = _rotate(boundary, heading)
+    ro = [_rotate(o, heading) for o in obstacles]
+    v_min, v_max = rb[:, 1].min(), rb[:, 1].max()
+    count = max(1, int(math.ceil((v_max - v_min) / spacing)))
+    # Centre the stripe set so the leftover margin is split between both edges
+    offset = ((v_max - v_min) - (count - 1) * spacing) / 2
+    ys = v_min + offset + np.arange(count) * spacing
+
+    lawn = scanline_intervals([rb], ys)
+    holes = scanline_intervals(ro, ys) if ro else [np.empty(0)] * count
+    stripes = []
+    for y, crossings, hole_crossings in zip(ys, lawn, holes):
+        spans = list(zip(crossings[0::2], crossings[1::2]))
+        hole_spans = list(zip(hole_crossings[0::2], hole_crossings[1::2]))
+        segments = [(a, b) for a, b in _subtract(spans, hole_spans) if b - a >= min_length]
+        stripes.append([(a, b, y) for a, b in segments])
+    return stripes
+
+
+class FreeSpace:
+    """The lawn minus its obstacles, for routing transits between stripe segments.
+
+    A leg is drivable when no part of it lies outside the lawn or strictly
+    inside an obstacle; running along an edge is allowed. Transits that
+    cannot be driven straight follow the shortest path through polygon
+    vertices: A* over a vertex visibility graph that is built once, with all
+    vertex pairs tested in vectorised batches, and reused for every transit.
+    """
+
+    def __init__(self, boundary: np.ndarray, obstacles: List[np.ndarray]):
+        self.boundary = boundary
+        self.obstacles = list(obstacles)
+        polygons = [boundary] + self.obstacles
+        self._polygons = polygons
+        self._polygon_edges = [_edges([p]) for p in polygons]
+        self._boxes = [(p.min(axis=0) - GEOMETRY_EPS, p.max(axis=0) + GEOMETRY_EPS) for p in polygons]
+        self.vertices = np.concatenate(polygons)
+        self._visible = None  # vertex x vertex visibility, built on the first blocked transit
+        self._distance = None
+
+    @staticmethod
+    def _locate(edges, points: np.ndarray) -> np.ndarray:
+        """Per point: 1 inside, 0 on an edge, -1 outside (even-odd rule)."""
+        x0, y0, x1, y1 = edges
+        px, py = points[:, 0:1], points[:, 1:2]
+        ex, ey = x1 - x0, y1 - y0
+        length_sq = ex * ex + ey * ey
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = np.clip(((px - x0) * ex + (py - y0) * ey) / length_sq, 0.0, 1.0)
+            t = np.where(length_sq > 0, t, 0.0)
+            on_edge = (np.hypot(x0 + t * ex - px, y0 + t * ey - py) <= GEOMETRY_EPS).any(axis=1)
+            crosses = (y0 <= py) != (y1 <= py)
+            xs = x0 + (py - y0) * ex / ey
+        inside = (crosses & (xs > px)).sum(axis=1) % 2 == 1
+        return np.where(on_edge, 0, np.where(inside, 1, -1))
+
+    def free_points(self, points: np.ndarray) -> np.ndarray:
+        """Boolean mask of points inside the lawn and not strictly inside an obstacle."""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        free = np.empty(len(points), dtype=bool)
+        for lo in range(0, len(points), _BATCH):
+            block = points[lo:lo + _BATCH]
+            ok = self._locate(self._polygon_edges[0], block) >= 0
+            for edges, (box_lo, box_hi) in zip(self._polygon_edges[1:], self._boxes[1:]):
+                # Only points within an obstacle's bounding box can be inside it
+                near = ok & (block >= box_lo).all(axis=1) & (block <= box_hi).all(axis=1)
+                if near.any():
+                    ok[near] = self._locate(edges, block[near]) <= 0
+            free[lo:lo + _BATCH] = ok
+        return free
+
+    def is_free(self, point) -> bool:
+        return bool(self.free_points(point)[0])
+
+    def legs_free(self, p: np.ndarray, q: np.ndarray) -> np.ndarray:
+        """Drivability of each leg p[k] -> q[k].
+
+        Each leg is split wherever it meets an edge or vertex, and the
+        midpoints of all pieces of all legs are tested in one batch.
+        """
+        p = np.asarray(p, dtype=np.float64).reshape(-1, 2)
+        q = np.asarray(q, dtype=np.float64).reshape(-1, 2)
+        result = np.empty(len(p), dtype=bool)
+        for lo in range(0, len(p), _LEG_BATCH):
+            result[lo:lo + _LEG_BATCH] = self._legs_free(p[lo:lo + _LEG_BATCH], q[lo:lo + _LEG_BATCH])
+        return result
+
+    def _legs_free(self, p: np.ndarray, q: np.ndarray) -> np.ndarray:
+        d = q - p
+        length_sq = (d * d).sum(axis=1, keepdims=True)
+        safe_length_sq = np.where(length_sq > GEOMETRY_EPS ** 2, length_sq, 1.0)
+        leg_lo = np.minimum(p, q) - GEOMETRY_EPS
+        leg_hi = np.maximum(p, q) + GEOMETRY_EPS
+        every = np.arange(len(p))
+        legs, ts = [every, every], [np.zeros(len(p)), np.ones(len(p))]
+        for polygon, (x0, y0, x1, y1), (box_lo, box_hi) in zip(self._polygons, self._polygon_edges, self._boxes):
+            # Only legs that overlap a polygon's bounding box can meet its edges
+            near = np.nonzero((leg_lo <= box_hi).all(axis=1) & (leg_hi >= box_lo).all(axis=1))[0]
+            if not len(near):
+                continue
+            pn, dx, dy, ln = p[near], d[near, 0:1], d[near, 1:2], safe_length_sq[near]
+            ex, ey = x1 - x0, y1 - y0
+            wx, wy = x0 - pn[:, 0:1], y0 - pn[:, 1:2]
+            denom = dx * ey - dy * ex
+            with np.errstate(divide="ignore", invalid="ignore"):
+                t = (wx * ey - wy * ex) / denom
+                u = (wx * dy - wy * dx) / denom
+            crossing = (np.abs(denom) > GEOMETRY_EPS) & (t > 0) & (t < 1) & (u >= 0) & (u <= 1)
+            rows, cols = np.nonzero(crossing)
+            legs.append(near[rows])
+            ts.append(t[rows, cols])
+            # Vertices on the leg itself (touching corners, collinear edges)
+            tv = (wx * dx + wy * dy) / ln
+            on_leg = (np.abs(wx * dy - wy * dx) / np.sqrt(ln) <= GEOMETRY_EPS) & (tv > 0) & (tv < 1)
+            rows, cols = np.nonzero(on_leg)
+            legs.append(near[rows])
+            ts.append(tv[rows, cols])
+
+        legs, ts = np.concatenate(legs), np.concatenate(ts)
+        order = np.lexsort((ts, legs))
+        legs, ts = legs[order], ts[order]
+        # Consecutive split points of the same leg bound one piece; a zero-length
+        # leg keeps its single piece, whose midpoint is the point itself
+        piece = (legs[1:] == legs[:-1]) & (ts[1:] - ts[:-1] > 1e-9)
+        piece_legs = legs[:-1][piece]
+        middles = p[piece_legs] + d[piece_legs] * ((ts[:-1] + ts[1:])[piece] / 2)[:, None]
+        free = np.ones(len(p), dtype=bool)
+        free[piece_legs[~self.free_points(middles)]] = False
+        return free
+
+    def leg_is_free(self, p: np.ndarray, q: np.ndarray) -> bool:
+        return bool(self.legs_free(p, q)[0])
+
+    def _visibility(self) -> Tuple[np.ndarray, np.ndarray]:
+        if self._visible is None:
+            n = len(self.vertices)
+            i, j = np.triu_indices(n, 1)
+            visible = np.zeros((n, n), dtype=bool)
+            ok = self.legs_free(self.vertices[i], self.vertices[j])
+            visible[i[ok], j[ok]] = True
+            visible |= visible.T
+            delta = self.vertices[:, None, :] - self.vertices[None, :, :]
+            self._visible = visible
+            self._distance = np.hypot(delta[..., 0], delta[..., 1])
+        return self._visible, self._distance
+
+    def route(self, p: np.ndarray, q: np.ndarray) -> List[np.ndarray]:
+        """Intermediate waypoints of the shortest drivable path from p to q ([] if straight)."""
+        return self.routes(p[None, :], q[None, :])[0]
+
+    def routes(self, p: np.ndarray, q: np.ndarray) -> List[List[np.ndarray]]:
+        """``route`` for every pair p[k] -> q[k], testing all legs of all transits in shared batches."""
+        p = np.asarray(p, dtype=np.float64).reshape(-1, 2)
+        q = np.asarray(q, dtype=np.float64).reshape(-1, 2)
+        result = [[] for _ in range(len(p))]
+        blocked = np.nonzero(~self.legs_free(p, q))[0]
+        if not len(blocked):
+            return result
+        n = len(self.vertices)
+        count = len(blocked)
+        # Which vertices each blocked transit can reach straight from its start and from its end
+        reach = self.legs_free(
+            np.concatenate((np.repeat(p[blocked], n, axis=0), np.tile(self.vertices, (count, 1)))),
+            np.concatenate((np.tile(self.vertices, (count, 1)), np.repeat(q[blocked], n, axis=0))),
+        )
+        from_p = reach[:count * n].reshape(count, n)
+        to_q = reach[count * n:].reshape(count, n)
+        for k, index in enumerate(blocked):
+            result[index] = self._search(p[index], q[index], from_p[k], to_q[k])
+        return result
+
+    def _search(self, p: np.ndarray, q: np.ndarray, from_p: np.ndarray, to_q: np.ndarray) -> List[np.ndarray]:
+        """A* from p to q through the vertex visibility graph."""
+        visible, distance = self._visibility()
+        n = len(self.vertices)
+        estimate = np.hypot(*(q - self.vertices).T)
+        goal = n
+
+        best = np.full(n + 1, math.inf)
+        parent = np.full(n + 1, -1)
+        done = np.zeros(n, dtype=bool)
+        best[:n] = np.where(from_p, np.hypot(*(self.vertices - p).T), math.inf)
+        frontier = [(best[i] + estimate[i], best[i], int(i)) for i in np.nonzero(from_p)[0]]
+        heapq.heapify(frontier)
+        while frontier:
+            _, cost, i = heapq.heappop(frontier)
+            if i == goal:
+                path = []
+                node = parent[goal]
+                while node >= 0:
+                    path.append(self.vertices[node])
+                    node = parent[node]
+                return path[::-1]
+            if done[i] or cost > best[i]:
+                continue
+            done[i] = True
+            if to_q[i] and cost + estimate[i] < best[goal]:
+                best[goal] = cost + estimate[i]
+                parent[goal] = i
+                heapq.heappush(frontier, (best[goal], best[goal], goal))
+            step = cost + distance[i]
+            better = visible[i] & ~done & (step < best[:n])
+            for j in np.nonzero(better)[0]:
+                best[j] = step[j]
+                parent[j] = i
+                heapq.heappush(frontier, (step[j] + estimate[j], step[j], int(j)))
+        raise ValueError("Obstacles split the lawn into parts that cannot be reached from each other")
+
+
+def _candidate_headings(boundary: np.ndarray, step_deg: float = 10.0) -> List[float]:
+    headings = set(round(math.radians(a), 6) for a in np.arange(0, 180, step_deg))
+    deltas = np.roll(boundary, -1, axis=0) - boundary
+    lengths = np.hypot(deltas[:, 0], deltas[:, 1])
+    for i in np.argsort(-lengths)[:4]:  # long edges are the usual best stripe direction
+        headings.add(round(math.atan2(deltas[i, 1], deltas[i, 0]) % math.pi, 6))
+    return sorted(headings)
+
+
+def plan_stripes(boundary: np.ndarray, obstacles: List[np.ndarray], cutting_width: float, overlap: float = 0.02,
+                 heading_deg: Optional[float] = None) -> dict:
+    """Boustrophedon path over the lawn with the heading that minimises turns.
+
+    Stripes are ``cutting_width * (1 - overlap)`` apart. Each stripe is
+    driven in the opposite direction to the previous one. ``path_xy`` is a
+    single polyline: mowing segments joined by transits that never leave the
+    lawn or cross an obstacle.
+    """
+    spacing = cutting_width * (1 - overlap)
+    min_length = cutting_width / 2
+    headings = [math.radians(heading_deg)] if heading_deg is not None else _candidate_headings(boundary)
+
+    best = None
+    for heading in headings:
+        stripes = stripe_segments(boundary, obstacles, heading, spacing, min_length)
+        segments = sum(len(s) for s in stripes)
+        length = sum(b - a for s in stripes for a, b, _ in s)
+        key = (segments, -length)
+        if best is None or key < best[0]:
+            best = (key, heading, stripes)
+    _, heading, stripes = best
+
+    # Transits between segments are routed around obstacles and inside concave boundaries
+    space = FreeSpace(_rotate(boundary, heading), [_rotate(o, heading) for o in obstacles])
+    mowing = []
+    forward = True
+    for stripe in stripes:
+        ordered = stripe if forward else stripe[::-1]
+        for a, b, y in ordered:
+            mowing.append(((a, y), (b, y)) if forward else ((b, y), (a, y)))
+        if stripe:
+            forward = not forward
+    mowing = np.array(mowing, dtype=np.float64).reshape(-1, 2, 2)
+    transits = space.routes(mowing[:-1, 1], mowing[1:, 0]) if len(mowing) > 1 else []
+    waypoints = []
+    for k, (start, end) in enumerate(mowing):
+        if k > 0:
+            waypoints.extend(transits[k - 1])
+        waypoints.extend([start, end])
+
+    path = _rotate(np.array(waypoints), -heading) if waypoints else np.empty((0, 2))
+    steps = np.diff(path, axis=0)
+    path_length = float(np.hypot(steps[:, 0], steps[:, 1]).sum()) if len(path) > 1 else 0.0
+    mow_length = float(sum(b - a for s in stripes for a, b, _ in s))
+    segments = sum(len(s) for s in stripes)
+    return {
+        "heading_deg": round(math.degrees(heading), 2),
+        "stripe_spacing_m": round(spacing, 4),
+        "stripes": sum(1 for s in stripes if s),
+        "turns": max(0, segments - 1),
+        "mowing_length_m": round(mow_length, 2),
+        "path_length_m": round(path_length, 2),
+        "transit_length_m": round(max(0.0, path_length - mow_length), 2),
+        "overlap_fraction": round(overlap, 4),
+        "path_xy": path,
+    }
+
+
+class CoverageGrid:
+    """Mowable-area mask plus a coverage mask updated from GPS traces."""
+
+    def __init__(self, boundary: np.ndarray, obstacles: List[np.ndarray], resolution: float = 0.1,
+                 margin: float = 1.0):
+        lo = boundary.min(axis=0) - margin
+        hi = boundary.max(axis=0) + margin
+        self.resolution = resolution
+        self.origin = (float(lo[0]), float(lo[1]))
+        self.shape = (int(math.ceil((hi[1] - lo[1]) / resolution)), int(math.ceil((hi[0] - lo[0]) / resolution)))
+        self.mowable = rasterize([boundary], self.origin, resolution, self.shape)
+        if obstacles:
+            self.mowable &= ~rasterize(obstacles, self.origin, resolution, self.shape)
+        self.covered = np.zeros(self.shape, dtype=bool)
+        self.mowable_cells = int(self.mowable.sum())
+        self.covered_cells = 0
+        self._last_point = None
+
+    @property
+    def coverage(self) -> float:
+        return self.covered_cells / self.mowable_cells if self.mowable_cells else 0.0
+
+    def paint_segment(self, p: np.ndarray, q: np.ndarray, radius: float) -> int:
+        """Mark cells within ``radius`` of segment pq; returns newly covered cells."""
+        res = self.resolution
+        lo = np.minimum(p, q) - radius
+        hi = np.maximum(p, q) + radius
+        c0 = max(0, int((lo[0] - self.origin[0]) / res))
+        c1 = min(self.shape[1], int(math.ceil((hi[0] - self.origin[0]) / res)))
+        r0 = max(0, int((lo[1] - self.origin[1]) / res))
+        r1 = min(self.shape[0], int(math.ceil((hi[1] - self.origin[1]) / res)))
+        if c0 >= c1 or r0 >= r1:
+            return 0
+
+        xs = self.origin[0] + (np.arange(c0, c1) + 0.5) * res
+        ys = self.origin[1] + (np.arange(r0, r1) + 0.5) * res
+        d = q - p
+        length_sq = float(d @ d)
+        px = xs[None, :] - p[0]
+        py = ys[:, None] - p[1]
+        if length_sq > 0:
+            t = np.clip((px * d[0] + py * d[1]) / length_sq, 0.0, 1.0)
+        else:
+            t = 0.0
+        dist_sq = (px - t * d[0]) ** 2 + (py - t * d[1]) ** 2
+
+        window = self.covered[r0:r1, c0:c1]
+        newly = (dist_sq <= radius * radius) & self.mowable[r0:r1, c0:c1] & ~window
+        added = int(newly.sum())
+        window |= newly
+        self.covered_cells += added
+        return added
+
+    def update(self, trace_xy: np.ndarray, cutting_width: float, continue_trace: bool = True) -> int:
+        """Paint a streamed trace; by default joins on to the previous trace's last point."""
+        points = np.asarray(trace_xy, dtype=np.float64).reshape(-1, 2)
+        if continue_trace and self._last_point is not None:
+            points = np.vstack([self._last_point, points])
+        added = 0
+        radius = cutting_width / 2
+        if len(points) == 1:
+            added += self.paint_segment(points[0], points[0], radius)
+        for p, q in zip(points[:-1], points[1:]):
+            added += self.paint_segment(p, q, radius)
+        if len(points):
+            self._last_point = points[-1]
+        return added
+
+    def heatmap(self, cell_m: float = 1.0) -> np.ndarray:
+        """Coverage fraction per ``cell_m`` block; NaN where nothing is mowable."""
+        factor = max(1, int(round(cell_m / self.resolution)))
+        rows = math.ceil(self.shape[0] / factor) * factor
+        cols = math.ceil(self.shape[1] / factor) * factor
+        mowable = np.zeros((rows, cols), dtype=np.int32)
+        covered = np.zeros((rows, cols), dtype=np.int32)
+        mowable[:self.shape[0], :self.shape[1]] = self.mowable
+        covered[:self.shape[0], :self.shape[1]] = self.covered
+        shape = (rows // factor, factor, cols // factor, factor)
+        m = mowable.reshape(shape).sum(axis=(1, 3))
+        c = covered.reshape(shape).sum(axis=(1, 3))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(m > 0, c / m, np.nan)
@@ -0,0 +1,168 @@
+# File: prompts.py
+"""Named, versioned system prompts and cache-friendly message assembly.
+
+Clients reference prompts by id ("garden-watch" or "garden-watch@1") instead
+of sending the prompt text, so every request starts with a byte-identical
+prefix and the inference server's prefix cache can reuse the prefill.
+Token counts use tiktoken (in requirements.txt), loaded on first use and
+computed once per prompt.
+
+Clients: the web frontend sends prompt_id. The Android app under android/ is
+still the ARCore sample and does not call this API yet; when it does, it
+should send prompt_id rather than a system_prompt.
+"""
+import hashlib
+import logging
+from functools import cached_property, lru_cache
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, computed_field
+
+from config import (
+    DEFAULT_SYSTEM_PROMPT, LAWN_DESCRIBE_PROMPT, LAWN_PLAN_PROMPT, JSON_REPAIR_PROMPT, LIVE_MOW_PROMPT,
+    PDF_MAP_PROMPT, PDF_REDUCE_PROMPT, CHAT_SYSTEM_PROMPT, CHAT_SUMMARY_PROMPT,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROMPT_ID = "garden-watch"
+
+
+@lru_cache(maxsize=None)
+def _encoding():
+    """The tiktoken encoding, loaded on first use: fetching it can block for a long time offline."""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:  # not installed, or its encoding file cannot be fetched offline; estimate from bytes
+        logger.warning("tiktoken encoding unavailable; estimating token counts from byte length.")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Token count of ``text`` (approximate when tiktoken is unavailable)."""
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return (len(text.encode("utf-8")) + 3) // 4
+
+
+def normalize_prompt(text: str) -> str:
+    """Canonical form of a prompt: LF line endings, no trailing spaces, no outer blank lines."""
+    lines = text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip()
+
+
+class Prompt(BaseModel):
+    name: str
+    version: int
+    text: str
+    sha256: str
+
+    @property
+    def prompt_id(self) -> str:
+        return f"{self.name}@{self.version}"
+
+    @computed_field
+    @cached_property
+    def token_count(self) -> int:
+        return count_tokens(self.text)
+
+
+_prompts: Dict[str, Prompt] = {}
+_latest: Dict[str, Prompt] = {}
+_by_digest: Dict[str, Prompt] = {}
+
+
+def register_prompt(name: str, version: int, text: str) -> Prompt:
+    """Register a prompt; the text is normalised up front and tokenized once, when first needed."""
+    text = normalize_prompt(text)
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    prompt = Prompt(name=name, version=version, text=text, sha256=digest)
+    _prompts[prompt.prompt_id] = prompt
+    if name not in _latest or _latest[name].version < version:
+        _latest[name] = prompt
+    _by_digest.setdefault(digest, prompt)
+    return prompt
+
+
+def get_prompt(prompt_id: str) -> Optional[Prompt]:
+    """Look up ``name@version``, or the latest version when only ``name`` is given."""
+    if "@" in prompt_id:
+        return _prompts.get(prompt_id)
+    return _latest.get(prompt_id)
+
+
+def list_prompts() -> List[Prompt]:
+    return sorted(_prompts.values(), key=lambda p: (p.name, p.version))
+
+
+def resolve_system_prompt(prompt_id: Optional[str] = None, system_prompt: Optional[str] = None) -> Prompt:
+    """Pick the system prompt for a request.
+
+    A ``prompt_id`` wins. Free-text prompts are normalised and, when they match
+    a registered prompt, replaced by the canonical registered text so legacy
+    clients still share the cached prefix. Raises KeyError for unknown ids.
+    """
+    if prompt_id:
+        prompt = get_prompt(prompt_id)
+        if prompt is None:
+            raise KeyError(prompt_id)
+        return prompt
+    if system_prompt is None:
+        return get_prompt(DEFAULT_PROMPT_ID)
+
+    text = normalize_prompt(system_prompt)
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    if digest in _by_digest:
+        return _by_digest[digest]
+    return Prompt(name="custom", version=0, text=text, sha256=digest)
+
+
+def build_messages(prompt: Optional[Prompt], text: Optional[str] = None, image_url: Optional[str] = None) -> List[dict]:
+    """Assemble chat messages in a fixed, cache-friendly order.
+
+    Most-shared content comes first: system prompt, then the user text, then
+    the per-request image, so the longest possible prefix is reusable.
+    """
+    messages = []
+    if prompt is not None and prompt.text:
+        messages.append({"role": "system", "content": prompt.text})
+    if image_url is None:
+        messages.append({"role": "user", "content": text or ""})
+        return messages
+
+    content = []
+    if text:
+        content.append({"type": "text", "text": text})
+    content.append({"type": "image_url", "image_url": {"url": image_url}})
+    messages.append({"role": "user", "content": content})
+    return messages
+
+
+def usage_report(response, prompt: Optional[Prompt] = None) -> dict:
+    """Token accounting for one completion, including prefix-cache hits when reported."""
+    usage = getattr(response, "usage", None)
+    report = {
+        "prompt_id": prompt.prompt_id if prompt is not None else None,
+        "system_prompt_tokens": prompt.token_count if prompt is not None else 0,
+        "prompt_tokens": getattr(usage, "prompt_tokens", None),
+        "completion_tokens": getattr(usage, "completion_tokens", None),
+        "cached_tokens": None,
+    }
+    details = getattr(usage, "prompt_tokens_details", None)
+    if details is not None:
+        report["cached_tokens"] = getattr(details, "cached_tokens", None)
+    logger.info(f"Token usage: {report}")
+    return report
+
+
+register_prompt("garden-watch", 1, DEFAULT_SYSTEM_PROMPT)
+register_prompt("lawn-describe", 1, LAWN_DESCRIBE_PROMPT)
+register_prompt("lawn-plan", 1, LAWN_PLAN_PROMPT)
+register_prompt("json-repair", 1, JSON_REPAIR_PROMPT)
+register_prompt("mow-live", 1, LIVE_MOW_PROMPT)
+register_prompt("pdf-map", 1, PDF_MAP_PROMPT)
+register_prompt("pdf-reduce", 1, PDF_REDUCE_PROMPT)
+register_prompt("indic-chat", 1, CHAT_SYSTEM_PROMPT)
+register_prompt("chat-summary", 1, CHAT_SUMMARY_PROMPT)
@@ -0,0 +1,446 @@
+# File: retention.py
+"""Capture retention: image previews, date-partitioned archives and incremental VACUUM.
+
+Off unless RETENTION_ENABLED=1, since previews replace original images for
+good. When enabled, a background worker applies the policy in small batches,
+each in its own short transaction, so writers are never held up for long:
+
+1. Captures older than RETENTION_ARCHIVE_DAYS are appended to compressed
+   NDJSON files under ARCHIVE_DIR, one directory per UTC day
+   (``date=YYYY-MM-DD/part-<first id>-<last id>.ndjson.zst``), then deleted
+   from the table. The archive stays queryable through
+   ``/v1/user-captures/archive/``.
+2. Captures older than RETENTION_FULL_IMAGE_DAYS have their image replaced by
+   a downscaled JPEG preview.
+3. On SQLite the freed pages are returned to the filesystem with
+   ``PRAGMA incremental_vacuum`` in fixed-size steps.
+
+Both image and archive changes go through the change log (update and delete
+events), so ETags, delta sync and the SSE feed stay consistent. With several
+replicas or worker processes, only the one holding the lock does the work: a
+Postgres advisory lock, or on SQLite an flock on a file next to the database.
+ARCHIVE_DIR must be a shared volume.
+"""
+import asyncio
+import base64
+import gzip
+import io
+import logging
+import os
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Iterator, List, Optional, Set, Tuple
+
+import orjson
+from PIL import Image
+from sqlalchemy import text
+
+from database import SessionLocal, UserCapture, engine, SQLITE_DB_PATH
+from embeddings import remove_captures
+from events import record_event, change_feed
+from export import image_key
+from serialization import dumps
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional; archives are written with gzip instead
+    zstandard = None
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; SQLite deployments there must run a single process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+RETENTION_ENABLED = os.getenv("RETENTION_ENABLED", "0") == "1"  # opt-in, see module docstring
+RETENTION_FULL_IMAGE_DAYS = int(os.getenv("RETENTION_FULL_IMAGE_DAYS", "90"))  # 0 keeps full images forever
+RETENTION_ARCHIVE_DAYS = int(os.getenv("RETENTION_ARCHIVE_DAYS", "365"))  # 0 never archives
+RETENTION_INTERVAL_SECONDS = float(os.getenv("RETENTION_INTERVAL_SECONDS", "3600"))
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "200"))
+RETENTION_PREVIEW_SIZE = int(os.getenv("RETENTION_PREVIEW_SIZE", "320"))  # longest side in pixels
+RETENTION_PREVIEW_QUALITY = int(os.getenv("RETENTION_PREVIEW_QUALITY", "70"))
+ARCHIVE_DIR = Path(os.getenv("ARCHIVE_DIR", str(Path(SQLITE_DB_PATH).parent / "archive")))
+# Pages freed per incremental_vacuum step (4 KiB each by default) and steps per run
+SQLITE_VACUUM_PAGES = int(os.getenv("SQLITE_VACUUM_PAGES", "2048"))
+SQLITE_VACUUM_MAX_STEPS = int(os.getenv("SQLITE_VACUUM_MAX_STEPS", "256"))
+# One-off full VACUUM to switch an existing SQLite file to auto_vacuum=INCREMENTAL
+SQLITE_CONVERT_AUTO_VACUUM = os.getenv("SQLITE_CONVERT_AUTO_VACUUM", "0") == "1"
+# Processes sharing the SQLite file take turns through this lock file
+RETENTION_LOCK_FILE = Path(os.getenv("RETENTION_LOCK_FILE", SQLITE_DB_PATH + ".retention.lock"))
+
+RETENTION_LOCK_KEY = 727_130_002  # see migrations.STARTUP_LOCK_KEY
+BATCH_PAUSE_SECONDS = 0.05  # yield the write lock between batches
+SQLITE_AUTO_VACUUM_INCREMENTAL = 2
+
+ARCHIVE_FIELDS = (
+    "id", "user_id", "query_text", "image", "latitude", "longitude", "ai_response", "created_at",
+    "change_seq", "client_capture_id",
+)
+
+
+@contextmanager
+def _file_lock(path: Path):
+    """Non-blocking exclusive flock; yields whether it was acquired."""
+    if fcntl is None:
+        yield True
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+b") as f:
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+@contextmanager
+def retention_lock():
+    """Yield True if this process should run retention; False if another replica holds the lock."""
+    if engine.dialect.name != "postgresql":
+        with _file_lock(RETENTION_LOCK_FILE) as acquired:
+            yield acquired
+        return
+    with engine.connect() as conn:
+        acquired = conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": RETENTION_LOCK_KEY}).scalar()
+        conn.commit()
+        try:
+            yield bool(acquired)
+        finally:
+            if acquired:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": RETENTION_LOCK_KEY})
+                conn.commit()
+
+
+def make_preview(image: str) -> str:
+    """Downscaled JPEG of a base64 image (or data URL), in the same encoding as the input."""
+    prefix = ""
+    if image.startswith("data:"):
+        prefix = "data:image/jpeg;base64,"
+        image = image.split(",", 1)[1]
+    picture = Image.open(io.BytesIO(base64.b64decode(image)))
+    picture.draft("RGB", (RETENTION_PREVIEW_SIZE, RETENTION_PREVIEW_SIZE))  # JPEG decodes at reduced scale
+    picture = picture.convert("RGB")
+    picture.thumbnail((RETENTION_PREVIEW_SIZE, RETENTION_PREVIEW_SIZE))
+    out = io.BytesIO()
+    picture.save(out, format="JPEG", quality=RETENTION_PREVIEW_QUALITY, optimize=True)
+    return prefix + base64.b64encode(out.getvalue()).decode("ascii")
+
+
+def downscale_batch(cutoff: datetime, batch_size: int = RETENTION_BATCH_SIZE) -> int:
+    """Replace full images older than ``cutoff`` with previews; returns rows handled."""
+    db = SessionLocal()
+    try:
+        captures = (
+            db.query(UserCapture)
+            .filter(UserCapture.created_at < cutoff, UserCapture.image_preview_at.is_(None))
+            .order_by(UserCapture.id)
+            .limit(batch_size)
+            .all()
+        )
+        now = datetime.utcnow()
+        for capture in captures:
+            # Marked even when the image is missing or undecodable, so it is not retried every run
+            capture.image_preview_at = now
+            if not capture.image:
+                continue
+            try:
+                preview = make_preview(capture.image)
+            except Exception as e:
+                logger.warning(f"Keeping original image for capture {capture.id}: {str(e)}")
+                continue
+            if len(preview) < len(capture.image):
+                capture.image = preview
+                record_event(db, "update", capture)
+        db.commit()
+        if captures:
+            change_feed.notify()
+        return len(captures)
+    finally:
+        db.close()
+
+
+def _partition_path(day: date) -> Path:
+    return ARCHIVE_DIR / "user_captures" / f"date={day.isoformat()}"
+
+
+def _archive_suffix() -> str:
+    return ".ndjson.zst" if zstandard is not None else ".ndjson.gz"
+
+
+def _compress(data: bytes) -> bytes:
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def _write_part(day: date, records: List[dict]) -> Path:
+    """Write one part file atomically; rerunning the same batch overwrites it."""
+    directory = _partition_path(day)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"part-{records[0]['id']:012d}-{records[-1]['id']:012d}{_archive_suffix()}"
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(_compress(b"".join(dumps(record) + b"\n" for record in records)))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return path
+
+
+def archive_batch(cutoff: datetime, batch_size: int = RETENTION_BATCH_SIZE) -> int:
+    """Move up to ``batch_size`` captures of the oldest day before ``cutoff`` into the archive.
+
+    The part file is durable before the rows are deleted; a crash in between
+    leaves rows that are archived again (under the same file name) next run.
+    """
+    db = SessionLocal()
+    try:
+        oldest = (
+            db.query(UserCapture.created_at)
+            .filter(UserCapture.created_at < cutoff)
+            .order_by(UserCapture.created_at)
+            .first()
+        )
+        if oldest is None:
+            return 0
+        day = oldest.created_at.date()
+        day_start = datetime.combine(day, datetime.min.time())
+        end = min(day_start + timedelta(days=1), cutoff)
+        captures = (
+            db.query(UserCapture)
+            .filter(UserCapture.created_at >= day_start, UserCapture.created_at < end)
+            .order_by(UserCapture.id)
+            .limit(batch_size)
+            .all()
+        )
+        records = [{field: getattr(capture, field) for field in ARCHIVE_FIELDS} for capture in captures]
+        path = _write_part(day, records)
+
+        for capture in captures:
+            db.delete(capture)
+            record_event(db, "delete", capture)
+        db.commit()
+        change_feed.notify()
+        remove_captures([capture.id for capture in captures])
+        logger.info(f"Archived {len(captures)} user captures to {path}.")
+        return len(captures)
+    finally:
+        db.close()
+
+
+def auto_vacuum_mode() -> Optional[int]:
+    """SQLite auto_vacuum setting (0 none, 1 full, 2 incremental); None on other databases."""
+    if engine.dialect.name != "sqlite":
+        return None
+    with engine.connect() as conn:
+        return conn.execute(text("PRAGMA auto_vacuum")).scalar()
+
+
+def convert_auto_vacuum():
+    """Switch an existing SQLite file to incremental auto-vacuum (rewrites the file once)."""
+    with engine.connect() as conn:
+        conn.execute(text("PRAGMA auto_vacuum = INCREMENTAL"))
+        conn.execute(text("VACUUM"))
+    # Pooled connections keep reporting the old mode until reopened
+    engine.dispose()
+    logger.info("Converted SQLite database to auto_vacuum=INCREMENTAL.")
+
+
+def incremental_vacuum_step(pages: int = SQLITE_VACUUM_PAGES) -> int:
+    """Release up to ``pages`` free pages; returns how many remain on the freelist."""
+    raw = engine.raw_connection()
+    try:
+        # sqlite3's execute() steps the pragma once, freeing a single page;
+        # executescript() runs it to completion
+        raw.driver_connection.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+        return raw.driver_connection.execute("PRAGMA freelist_count").fetchone()[0]
+    finally:
+        raw.close()
+
+
+class RetentionWorker:
+    """Periodic retention pass; one per process, like the change feed producer."""
+
+    def __init__(self):
+        self._task = None
+        self._converted = False
+
+    async def start(self):
+        if self._task is not None or not RETENTION_ENABLED:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Retention pass failed: {str(e)}")
+            await asyncio.sleep(RETENTION_INTERVAL_SECONDS)
+
+    async def run_once(self) -> dict:
+        stats = {"archived": 0, "previews": 0, "vacuum_steps": 0}
+        with retention_lock() as acquired:
+            if not acquired:
+                return stats
+            now = datetime.utcnow()
+            # Archive first so rows about to leave the table are not downscaled for nothing
+            if RETENTION_ARCHIVE_DAYS > 0:
+                stats["archived"] = await self._drain(archive_batch, now - timedelta(days=RETENTION_ARCHIVE_DAYS))
+            if RETENTION_FULL_IMAGE_DAYS > 0:
+                stats["previews"] = await self._drain(downscale_batch, now - timedelta(days=RETENTION_FULL_IMAGE_DAYS))
+            stats["vacuum_steps"] = await self._vacuum()
+        if any(stats.values()):
+            logger.info(f"Retention pass: {stats}")
+        return stats
+
+    async def _drain(self, step, cutoff: datetime) -> int:
+        total = 0
+        while True:
+            handled = await asyncio.to_thread(step, cutoff)
+            total += handled
+            if handled == 0:
+                return total
+            await asyncio.sleep(BATCH_PAUSE_SECONDS)
+
+    async def _vacuum(self) -> int:
+        """Postgres reclaims space with autovacuum; only SQLite needs this."""
+        mode = await asyncio.to_thread(auto_vacuum_mode)
+        if mode is None:
+            return 0
+        if mode != SQLITE_AUTO_VACUUM_INCREMENTAL:
+            if SQLITE_CONVERT_AUTO_VACUUM and not self._converted:
+                self._converted = True
+                await asyncio.to_thread(convert_auto_vacuum)
+            return 0
+        steps = 0
+        while steps < SQLITE_VACUUM_MAX_STEPS:
+            remaining = await asyncio.to_thread(incremental_vacuum_step)
+            steps += 1
+            if remaining == 0:
+                break
+            await asyncio.sleep(BATCH_PAUSE_SECONDS)
+        return steps
+
+
+def _open_part(path: Path):
+    if path.name.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError(f"zstandard is required to read {path.name}")
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True))
+    return gzip.open(path, "rb")
+
+
+def list_partitions(start_date: Optional[date] = None, end_date: Optional[date] = None) -> List[Tuple[date, List[Path]]]:
+    """(day, part files in id order) for archived days within the range."""
+    root = ARCHIVE_DIR / "user_captures"
+    if not root.is_dir():
+        return []
+    partitions = []
+    for directory in root.iterdir():
+        if not directory.name.startswith("date="):
+            continue
+        try:
+            day = date.fromisoformat(directory.name[len("date="):])
+        except ValueError:
+            continue
+        if (start_date and day < start_date) or (end_date and day > end_date):
+            continue
+        parts = sorted(p for p in directory.iterdir() if p.name.startswith("part-") and not p.name.endswith(".tmp"))
+        if parts:
+            partitions.append((day, parts))
+    partitions.sort()
+    return partitions
+
+
+def _part_range(path: Path) -> Optional[Tuple[int, int]]:
+    """(first id, last id) from a part file name, None if it does not follow the pattern."""
+    try:
+        first, last = path.name[len("part-"):].split(".", 1)[0].split("-")
+        return int(first), int(last)
+    except ValueError:
+        return None
+
+
+def _overlapping_parts(parts: List[Path]) -> Set[Path]:
+    """Parts of one day whose id range overlaps another part's: only these can repeat ids.
+
+    That happens when a crash between writing a part and deleting its rows is
+    followed by a batch that ends at a different id, e.g. after new rows arrived.
+    """
+    ranges = sorted((_part_range(path) or (0, float("inf")), path) for path in parts)
+    overlapping = set()
+    for i, ((_, last), path) in enumerate(ranges):
+        for (other_first, _), other in ranges[i + 1:]:
+            if other_first > last:
+                break
+            overlapping.update((path, other))
+    return overlapping
+
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Stored timestamps are naive UTC; bring aware query bounds to the same form."""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def iter_archived(
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    user_id: Optional[str] = None,
+    images: str = "full",
+    limit: Optional[int] = None,
+) -> Iterator[dict]:
+    """Archived captures in time order, reading only the partitions the range touches."""
+    start_time, end_time = _naive_utc(start_time), _naive_utc(end_time)
+    count = 0
+    partitions = list_partitions(start_time.date() if start_time else None, end_time.date() if end_time else None)
+    for _, parts in partitions:
+        # Ids are remembered only for overlapping parts of the current day, not the whole archive
+        overlapping, seen = _overlapping_parts(parts), set()
+        for path in parts:
+            check = path in overlapping
+            with _open_part(path) as f:
+                for line in f:
+                    record = orjson.loads(line)
+                    if check:
+                        if record["id"] in seen:
+                            continue
+                        seen.add(record["id"])
+                    if user_id is not None and record["user_id"] != user_id:
+                        continue
+                    created_at = datetime.fromisoformat(record["created_at"]) if record["created_at"] else None
+                    if created_at is not None and (
+                        (start_time and created_at < start_time) or (end_time and created_at > end_time)
+                    ):
+                        continue
+                    if images == "omit":
+                        record.pop("image", None)
+                    elif images == "key":
+                        record["image_key"] = image_key(record.pop("image", None))
+                    yield record
+                    count += 1
+                    if limit is not None and count >= limit:
+                        return
+
+
+def stream_archived_ndjson(**filters) -> Iterator[bytes]:
+    for record in iter_archived(**filters):
+        yield dumps(record) + b"\n"
+
+
+retention_worker = RetentionWorker()
@@ -1,20 +1,22 @@
 # routers/core.py
-from fastapi import APIRouter, HTTPException, File, UploadFile, Form, Depends
+from fastapi import APIRouter, HTTPException, File, UploadFile, Form, Depends, BackgroundTasks
 from fastapi.responses import JSONResponse
 from typing import Optional
 import base64
 import uuid
-import re
-import json
 from datetime import datetime
 from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
 
 # Your existing imports
 from models import TextQueryRequest, ImageQueryRequest
 from clients import client
-from config import DEFAULT_SYSTEM_PROMPT
+from prompts import resolve_system_prompt, get_prompt, build_messages, usage_report
 from database import get_db, UserCapture
 from schemas import UserCaptureCreate
+from embeddings import index_capture
+from events import record_event, change_feed
+from structured_output import parse_structured, StructuredOutputError, LAWN_PLAN_SCHEMA
 
 router = APIRouter(prefix="", tags=["core"])
 
@@ -28,15 +30,19 @@ async def text_query_endpoint(request: TextQueryRequest):
     """Handle text-based queries for weapon identification."""
     try:
         user_prompt = "identify the weapon :" + request.prompt
-        messages = [{"role": "user", "content": user_prompt}]
-        if request.system_prompt.strip():
-            messages.insert(0, {"role": "system", "content": request.system_prompt})
+        try:
+            prompt = resolve_system_prompt(request.prompt_id, request.system_prompt)
+        except KeyError:
+            raise HTTPException(status_code=400, detail=f"Unknown prompt_id: {request.prompt_id}")
+        messages = build_messages(prompt, user_prompt)
 
         response = client.chat.completions.create(
             model="gemma3",
             messages=messages,
         )
-        return {"response": response.choices[0].message.content}
+        return {"response": response.choices[0].message.content, "usage": usage_report(response, prompt)}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -48,51 +54,51 @@ async def image_query_endpoint(request: ImageQueryRequest):
         if not (request.image_url.startswith("http") or request.image_url.startswith("data:")):
             raise HTTPException(status_code=400, detail="image_url must be a valid HTTP URL or base64 data URL")
 
-        messages = [
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": request.text},
-                    {"type": "image_url", "image_url": {"url": request.image_url}},
-                ],
-            }
-        ]
+        messages = build_messages(None, request.text, request.image_url)
 
         kwargs = {"model": "gemma3", "messages": messages}
         response = client.chat.completions.create(**kwargs)
-        return {"response": response.choices[0].message.content}
+        return {"response": response.choices[0].message.content, "usage": usage_report(response)}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/upload_image_query")
 async def upload_image_query_endpoint(
+    background_tasks: BackgroundTasks,
     text: str = Form(...),
-    system_prompt: str = Form(DEFAULT_SYSTEM_PROMPT),
+    prompt_id: Optional[str] = Form(None),
+    system_prompt: Optional[str] = Form(None),
     lat: float = Form(52.5200),
     lon: float = Form(13.4050),
     file: UploadFile = File(...),
+    client_capture_id: Optional[str] = Form(None),
     db: Session = Depends(get_db)
 ):
-    """Handle image upload and query with optional system prompt and GPS coordinates."""
+    """Handle image upload and query with a registered prompt (prompt_id), optional free-text system prompt and GPS coordinates.
+
+    Offline clients set client_capture_id so a replayed upload returns the stored answer instead of re-running the model.
+    """
     try:
+        if client_capture_id:
+            replayed = db.query(UserCapture).filter(UserCapture.client_capture_id == client_capture_id).first()
+            if replayed:
+                return {"response": replayed.ai_response, "capture_id": replayed.id, "replayed": True}
+
         if not file.content_type.startswith("image/"):
             raise HTTPException(status_code=400, detail="File must be an image")
+        try:
+            prompt = resolve_system_prompt(prompt_id, system_prompt)
+        except KeyError:
+            raise HTTPException(status_code=400, detail=f"Unknown prompt_id: {prompt_id}")
 
         contents = await file.read()
         base64_image = base64.b64encode(contents).decode('utf-8')
         image_url = f"data:{file.content_type};base64,{base64_image}"
 
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": text},
-                    {"type": "image_url", "image_url": {"url": image_url}},
-                ],
-            }
-        ]
+        messages = build_messages(prompt, text, image_url)
 
         kwargs = {"model": "gemma3", "messages": messages}
         print(f"{text} (Location: {lat}, {lon})")
@@ -106,18 +112,31 @@ async def upload_image_query_endpoint(
             image=image_url,
             latitude=lat,
             longitude=lon,
-            ai_response=ai_response
+            ai_response=ai_response,
+            client_capture_id=client_capture_id
         )
 
         db_capture = UserCapture(**capture_create.dict())
         db.add(db_capture)
+        db.flush()
+        record_event(db, "insert", db_capture)
         db.commit()
         db.refresh(db_capture)
+        change_feed.notify()
+        # Embedding decodes the image; run it after the response is sent
+        background_tasks.add_task(index_capture, db_capture.id, db_capture.image)
 
-        return {"response": ai_response, "capture_id": db_capture.id}
+        return {"response": ai_response, "capture_id": db_capture.id, "usage": usage_report(response, prompt)}
 
     except HTTPException:
         raise
+    except IntegrityError as e:
+        db.rollback()
+        # A concurrent replay of the same offline upload won the race
+        replayed = db.query(UserCapture).filter(UserCapture.client_capture_id == client_capture_id).first()
+        if client_capture_id and replayed:
+            return {"response": replayed.ai_response, "capture_id": replayed.id, "replayed": True}
+        raise HTTPException(status_code=500, detail=str(e))
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
@@ -153,22 +172,8 @@ async def analyze_lawn(
 
     model = "gemma3"
     # === STEP 1: Get precise description ===
-    desc_messages = [
-        {
-            "role": "system",
-            "content": (
-                "You are an expert visual analyst for gardens and lawns. "
-                "Describe the attached photo in 2–4 clear, factual sentences only. "
-                "Include: lawn size/shape, grass condition, bare patches, debris, weeds, moss, "
-                "slopes, fencing, structures, season clues (leaves, light, shadows), and any visible issues. "
-                "Do NOT give advice, opinions, or suggestions — only describe what you see."
-            )
-        },
-        {
-            "role": "user",
-            "content": [{"type": "image_url", "image_url": {"url": data_url}}]
-        }
-    ]
+    describe_prompt = get_prompt("lawn-describe")
+    desc_messages = build_messages(describe_prompt, image_url=data_url)
 
     desc_response = client.chat.completions.create(
         model=model,
@@ -176,48 +181,14 @@ async def analyze_lawn(
         max_tokens=500,
         temperature=0.0
     )
+    usage_report(desc_response, describe_prompt)
     description = desc_response.choices[0].message.content.strip().strip('"')
 
     # === STEP 2: Generate full structured plan ===
-    plan_messages = [
-        {
-            "role": "system",
-            "content": (
-                "You are an expert horticulturist and lawn-care specialist. "
-                "Always respond with valid JSON only using the exact structure below. "
-                "Never include markdown, explanations, or extra text."
-            )
-        },
-        {
-            "role": "user",
-            "content": [
-                {"type": "text", "text": f"""
-The photo shows: {description}
-
-Assume late autumn/early winter (November) and temperate climate (cool-season grasses) unless the image clearly shows otherwise.
-
-Return ONLY this JSON structure:
-
-{{
-  "overall_assessment": "One-paragraph summary of the current lawn condition",
-  "recommended_actions": [
-    {{
-      "step_number": 1,
-      "title": "Short descriptive title",
-      "why": "Why this step is important",
-      "how_to_do_it": "Clear step-by-step instructions",
-      "tools_and_materials": ["list", "of", "required", "items"],
-      "best_timing": "When to perform this action",
-      "notes": "Optional extra tips or warnings (or null)"
-    }}
-  ],
-  "ongoing_maintenance": "Brief summary of regular care needed"
-}}
-                """},
-                {"type": "image_url", "image_url": {"url": data_url}}
-            ]
-        }
-    ]
+    # The static JSON template lives in the registered system prompt so the
+    # per-image description is the only part that varies between requests.
+    plan_prompt = get_prompt("lawn-plan")
+    plan_messages = build_messages(plan_prompt, f"The photo shows: {description}", data_url)
 
     plan_response = client.chat.completions.create(
         model=model,
@@ -225,17 +196,26 @@ Return ONLY this JSON structure:
         max_tokens=2000,
         temperature=0.3
     )
+    usage_report(plan_response, plan_prompt)
 
     raw_output = plan_response.choices[0].message.content
 
-    # Extract JSON block
-    json_match = re.search(r"\{.*\}", raw_output, re.DOTALL)
-    if not json_match:
-        raise HTTPException(status_code=500, detail="Model failed to return valid JSON")
+    def repair_json(broken: str, errors: list) -> str:
+        # Text-only, temperature 0: far cheaper than repeating the vision pipeline
+        repair_prompt = get_prompt("json-repair")
+        problems = "\n".join(f"- {error}" for error in errors)
+        repair_response = client.chat.completions.create(
+            model=model,
+            messages=build_messages(repair_prompt, f"Problems:\n{problems}\n\nJSON:\n{broken}"),
+            max_tokens=2000,
+            temperature=0.0
+        )
+        usage_report(repair_response, repair_prompt)
+        return repair_response.choices[0].message.content
 
     try:
-        final_plan = json.loads(json_match.group(0))
-    except json.JSONDecodeError as e:
-        raise HTTPException(status_code=500, detail=f"Invalid JSON from model: {str(e)}")
+        final_plan = parse_structured(raw_output, LAWN_PLAN_SCHEMA, reprompt=repair_json)
+    except StructuredOutputError as e:
+        raise HTTPException(status_code=500, detail=f"Model failed to return valid JSON: {'; '.join(e.errors) or str(e)}")
 
     return JSONResponse(content=final_plan)
\ No newline at end of file
@@ -0,0 +1,201 @@
+# routers/live.py
+"""Live AR frame analysis over WebSocket (MowGO).
+
+The client streams camera frames with GPS; the server analyses them one at a
+time and pushes results back as they complete. Only the newest waiting frame
+is kept (latest-frame-wins), and frames that barely differ from the last
+analysed one are skipped, so per-session latency stays bounded by a single
+model call instead of growing with a backlog.
+
+Client → server messages (JSON text):
+    {"type": "config", "prompt_id": "mow-live", "text": "...", "diff_threshold": 0.04}
+    {"type": "frame", "frame_id": 17, "image": "<base64 or data URL>", "lat": 52.52, "lon": 13.40}
+Binary messages are treated as a raw JPEG frame at the last known position.
+
+Server → client messages:
+    {"type": "result", "frame_id": 17, "result": {...}, "latency_ms": ..., "queue_ms": ..., "lat": ..., "lon": ...}
+    {"type": "skipped", "frame_id": 18, "reason": "unchanged" | "superseded" | "stale"}
+    {"type": "error", "frame_id": 19, "detail": "..."}
+"""
+import asyncio
+import base64
+import io
+import json
+import logging
+import time
+from typing import Optional
+
+import numpy as np
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from PIL import Image
+
+from clients import client
+from prompts import get_prompt, build_messages
+from structured_output import extract_json, StructuredOutputError
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/v1", tags=["live"])
+
+DEFAULT_DIFF_THRESHOLD = 0.04  # mean absolute grayscale difference, 0..1
+MAX_FRAME_AGE_SECONDS = 5.0
+SIGNATURE_SIZE = (32, 24)
+
+
+def frame_signature(image_b64: str) -> np.ndarray:
+    """Tiny grayscale thumbnail used for the cheap change check."""
+    img = Image.open(io.BytesIO(base64.b64decode(image_b64)))
+    img.draft("L", (SIGNATURE_SIZE[0] * 4, SIGNATURE_SIZE[1] * 4))  # JPEG DCT scaling: decode at 1/8
+    return np.asarray(img.convert("L").resize(SIGNATURE_SIZE), dtype=np.float32) / 255.0
+
+
+def frame_difference(a: Optional[np.ndarray], b: np.ndarray) -> float:
+    if a is None or a.shape != b.shape:
+        return 1.0
+    # Subtract the mean so auto-exposure shifts do not count as scene changes
+    return float(np.mean(np.abs((a - a.mean()) - (b - b.mean()))))
+
+
+class Frame:
+    def __init__(self, frame_id, image_b64: str, mime: str, lat, lon, signature: np.ndarray):
+        self.frame_id = frame_id
+        self.image_b64 = image_b64
+        self.mime = mime
+        self.lat = lat
+        self.lon = lon
+        self.signature = signature
+        self.received = time.monotonic()
+
+
+class LiveSession:
+    """Per-connection state: one pending slot and one analysis worker."""
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.prompt = get_prompt("mow-live")
+        self.text = "Analyze this frame."
+        self.diff_threshold = DEFAULT_DIFF_THRESHOLD
+        self.lat = None
+        self.lon = None
+        self.pending: Optional[Frame] = None
+        self.last_signature: Optional[np.ndarray] = None
+        self.frame_ready = asyncio.Event()
+        self.send_lock = asyncio.Lock()
+        self.stats = {"received": 0, "analyzed": 0, "unchanged": 0, "superseded": 0, "stale": 0}
+
+    async def send(self, message: dict):
+        async with self.send_lock:
+            await self.websocket.send_json(message)
+
+    def configure(self, message: dict):
+        if message.get("prompt_id"):
+            prompt = get_prompt(message["prompt_id"])
+            if prompt is None:
+                raise ValueError(f"Unknown prompt_id: {message['prompt_id']}")
+            self.prompt = prompt
+        if message.get("text"):
+            self.text = message["text"]
+        if message.get("diff_threshold") is not None:
+            self.diff_threshold = float(message["diff_threshold"])
+
+    async def offer(self, frame_id, image: str, lat=None, lon=None):
+        """Accept a frame unless it is unchanged; replace any frame still waiting."""
+        self.stats["received"] += 1
+        mime = "image/jpeg"
+        if image.startswith("data:"):
+            header, image = image.split(",", 1)
+            mime = header[5:].split(";", 1)[0] or mime
+        if lat is not None and lon is not None:
+            self.lat, self.lon = lat, lon
+
+        signature = frame_signature(image)
+        if frame_difference(self.last_signature, signature) < self.diff_threshold:
+            self.stats["unchanged"] += 1
+            await self.send({"type": "skipped", "frame_id": frame_id, "reason": "unchanged"})
+            return
+
+        if self.pending is not None:
+            self.stats["superseded"] += 1
+            await self.send({"type": "skipped", "frame_id": self.pending.frame_id, "reason": "superseded"})
+        self.pending = Frame(frame_id, image, mime, self.lat, self.lon, signature)
+        self.frame_ready.set()
+
+    async def worker(self):
+        while True:
+            await self.frame_ready.wait()
+            self.frame_ready.clear()
+            frame, self.pending = self.pending, None
+            if frame is None:
+                continue
+            queue_seconds = time.monotonic() - frame.received
+            if queue_seconds > MAX_FRAME_AGE_SECONDS:
+                self.stats["stale"] += 1
+                await self.send({"type": "skipped", "frame_id": frame.frame_id, "reason": "stale"})
+                continue
+
+            # Compare later frames against what the model actually saw
+            self.last_signature = frame.signature
+            start = time.monotonic()
+            try:
+                messages = build_messages(self.prompt, self.text, f"data:{frame.mime};base64,{frame.image_b64}")
+                response = await asyncio.to_thread(
+                    client.chat.completions.create, model="gemma3", messages=messages, max_tokens=300, temperature=0.0
+                )
+                raw = response.choices[0].message.content
+                try:
+                    result = extract_json(raw)
+                except StructuredOutputError:
+                    result = {"raw": raw}
+                self.stats["analyzed"] += 1
+                await self.send({
+                    "type": "result",
+                    "frame_id": frame.frame_id,
+                    "result": result,
+                    "lat": frame.lat,
+                    "lon": frame.lon,
+                    "queue_ms": round(queue_seconds * 1000, 1),
+                    "latency_ms": round((time.monotonic() - start) * 1000, 1),
+                })
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                logger.error(f"Live analysis failed for frame {frame.frame_id}: {str(e)}")
+                await self.send({"type": "error", "frame_id": frame.frame_id, "detail": str(e)})
+
+
+@router.websocket("/live-analysis")
+async def live_analysis(websocket: WebSocket):
+    """Stream camera frames + GPS in, get hazard and grass-condition results back."""
+    await websocket.accept()
+    session = LiveSession(websocket)
+    worker = asyncio.create_task(session.worker())
+    binary_frame_id = 0
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            try:
+                if message.get("bytes") is not None:
+                    binary_frame_id += 1
+                    image = base64.b64encode(message["bytes"]).decode("utf-8")
+                    await session.offer(f"b{binary_frame_id}", image)
+                    continue
+
+                data = json.loads(message.get("text") or "{}")
+                if not isinstance(data, dict):
+                    raise ValueError("Expected a JSON object")
+                if data.get("type") == "config":
+                    session.configure(data)
+                elif data.get("type") == "frame":
+                    await session.offer(data.get("frame_id"), data["image"], data.get("lat"), data.get("lon"))
+                elif data.get("type") == "stats":
+                    await session.send({"type": "stats", **session.stats})
+            except (ValueError, KeyError, OSError) as e:
+                # Bad or non-object JSON, unknown prompt, missing image or undecodable frame
+                await session.send({"type": "error", "detail": str(e)})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        worker.cancel()
+        logger.info(f"Live session closed: {session.stats}")
@@ -0,0 +1,173 @@
+# routers/mowing.py
+"""Mowing plans and live coverage (MowGO).
+
+Plans are kept in memory (least recently used evicted first); a client
+creates a plan, streams GPS traces against it while mowing and polls the
+coverage heatmap.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from database import get_db, UserCapture
+from models import MowingPlanRequest, MowingPlanResponse, MowingTraceRequest, MowingCoverageResponse
+from planner import LocalProjection, CoverageGrid, convex_hull, circle_polygon, plan_stripes
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/v1/mowing", tags=["mowing"])
+
+MAX_PLANS = 64
+MAX_GRID_CELLS = 50_000_000  # ~100 MB for the two boolean grids
+
+
+class MowingPlan:
+    def __init__(self, projection: LocalProjection, grid: CoverageGrid, cutting_width: float):
+        self.projection = projection
+        self.grid = grid
+        self.cutting_width = cutting_width
+        self.lock = threading.Lock()
+
+
+_plans: "OrderedDict[str, MowingPlan]" = OrderedDict()
+_plans_lock = threading.Lock()
+
+
+def _get_plan(plan_id: str) -> MowingPlan:
+    with _plans_lock:
+        plan = _plans.get(plan_id)
+        if plan is None:
+            raise HTTPException(status_code=404, detail="Mowing plan not found")
+        _plans.move_to_end(plan_id)
+        return plan
+
+
+def _coverage_response(plan_id: str, plan: MowingPlan, newly: Optional[int] = None,
+                       heatmap_cell_m: Optional[float] = None) -> MowingCoverageResponse:
+    grid = plan.grid
+    cell_area = grid.resolution ** 2
+    response = MowingCoverageResponse(
+        plan_id=plan_id,
+        coverage=round(grid.coverage, 4),
+        covered_m2=round(grid.covered_cells * cell_area, 2),
+        mowable_m2=round(grid.mowable_cells * cell_area, 2),
+        newly_covered_m2=round(newly * cell_area, 2) if newly is not None else None,
+    )
+    if heatmap_cell_m is not None:
+        heat = grid.heatmap(heatmap_cell_m)
+        response.heatmap = [[None if np.isnan(v) else round(float(v), 3) for v in row] for row in heat]
+        response.heatmap_cell_m = max(1, int(round(heatmap_cell_m / grid.resolution))) * grid.resolution
+        response.heatmap_origin = plan.projection.to_latlon(grid.origin)[0].tolist()
+    return response
+
+
+@router.post("/plans", response_model=MowingPlanResponse)
+def create_mowing_plan(request: MowingPlanRequest, db: Session = Depends(get_db)):
+    """
+    Plan a stripe path over a lawn and start tracking its coverage.
+    The lawn is the given boundary or, failing that, the convex hull of the given captures' GPS points.
+    """
+    if request.boundary:
+        boundary_latlon = np.asarray(request.boundary, dtype=np.float64)
+    elif request.capture_ids:
+        rows = (
+            db.query(UserCapture.latitude, UserCapture.longitude)
+            .filter(UserCapture.id.in_(request.capture_ids))
+            .filter(UserCapture.latitude.isnot(None), UserCapture.longitude.isnot(None))
+            .all()
+        )
+        boundary_latlon = np.array([[r.latitude, r.longitude] for r in rows], dtype=np.float64).reshape(-1, 2)
+    else:
+        raise HTTPException(status_code=400, detail="Provide a boundary or capture_ids")
+    if boundary_latlon.ndim != 2 or boundary_latlon.shape[1] != 2:
+        raise HTTPException(status_code=400, detail="Points must be [lat, lon] pairs")
+
+    lat0, lon0 = boundary_latlon.mean(axis=0)
+    projection = LocalProjection(float(lat0), float(lon0))
+    try:
+        boundary = projection.to_xy(boundary_latlon)
+        if not request.boundary:
+            boundary = convex_hull(boundary)
+        elif len(boundary) < 3:
+            raise ValueError("A boundary needs at least three points")
+        obstacles = []
+        for obstacle in request.obstacles:
+            if obstacle.polygon and len(obstacle.polygon) >= 3:
+                obstacles.append(projection.to_xy(obstacle.polygon))
+            elif obstacle.center and obstacle.radius_m:
+                obstacles.append(circle_polygon(projection.to_xy(obstacle.center)[0], obstacle.radius_m))
+            else:
+                raise ValueError("Each obstacle needs a polygon of three or more points, or a center and radius_m")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    extent = boundary.max(axis=0) - boundary.min(axis=0) + 2.0
+    if extent[0] * extent[1] / request.resolution_m ** 2 > MAX_GRID_CELLS:
+        raise HTTPException(status_code=400, detail="Lawn too large for this resolution; increase resolution_m")
+
+    start = time.perf_counter()
+    try:
+        plan = plan_stripes(boundary, obstacles, request.cutting_width_m, request.overlap, request.heading_deg)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    grid = CoverageGrid(boundary, obstacles, request.resolution_m)
+    logger.info(
+        f"Planned {plan['stripes']} stripes / {plan['turns']} turns over {grid.shape} grid "
+        f"in {(time.perf_counter() - start) * 1000:.1f} ms"
+    )
+
+    plan_id = uuid.uuid4().hex
+    with _plans_lock:
+        _plans[plan_id] = MowingPlan(projection, grid, request.cutting_width_m)
+        while len(_plans) > MAX_PLANS:
+            _plans.popitem(last=False)
+
+    path_xy = plan.pop("path_xy")
+    return MowingPlanResponse(
+        plan_id=plan_id,
+        area_m2=round(grid.mowable_cells * grid.resolution ** 2, 2),
+        path=np.round(projection.to_latlon(path_xy), 7).tolist() if len(path_xy) else [],
+        **plan,
+    )
+
+
+@router.post("/plans/{plan_id}/trace", response_model=MowingCoverageResponse)
+def add_mowing_trace(plan_id: str, request: MowingTraceRequest):
+    """
+    Paint a streamed GPS trace (cutting width wide) into the plan's coverage grid.
+    """
+    plan = _get_plan(plan_id)
+    if not request.points:
+        raise HTTPException(status_code=400, detail="points must not be empty")
+    with plan.lock:
+        trace = plan.projection.to_xy(request.points)
+        newly = plan.grid.update(trace, plan.cutting_width, continue_trace=not request.new_segment)
+        return _coverage_response(plan_id, plan, newly=newly)
+
+
+@router.get("/plans/{plan_id}/coverage", response_model=MowingCoverageResponse)
+def get_mowing_coverage(
+    plan_id: str,
+    cell_m: float = Query(1.0, ge=0.1, le=50.0, description="Heatmap cell size in metres"),
+):
+    """
+    Coverage so far plus a heatmap of covered fraction per cell (rows south to north, null = not mowable).
+    """
+    plan = _get_plan(plan_id)
+    with plan.lock:
+        return _coverage_response(plan_id, plan, heatmap_cell_m=cell_m)
+
+
+@router.delete("/plans/{plan_id}")
+def delete_mowing_plan(plan_id: str):
+    with _plans_lock:
+        if _plans.pop(plan_id, None) is None:
+            raise HTTPException(status_code=404, detail="Mowing plan not found")
+    return {"message": "Mowing plan deleted successfully"}
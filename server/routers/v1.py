@@ -1,16 +1,40 @@
 # routers/v1.py
-from fastapi import APIRouter, File, UploadFile, Form, Query, Header, HTTPException, Depends, status
+from fastapi import (
+    APIRouter, BackgroundTasks, File, UploadFile, Form, Query, Header, HTTPException, Depends, Request, status
+)
+from fastapi.responses import StreamingResponse
 from typing import Optional
 from datetime import datetime
 from sqlalchemy.orm import Session
 from typing import List
 from models import (
-    ChatRequest, ChatResponse, VisualQueryResponse, ExtractTextResponse, PdfSummaryResponse
+    ChatRequest, ChatResponse, VisualQueryResponse, ExtractTextResponse, PdfSummaryResponse, PromptInfo
 )
 from routers.core import upload_image_query_endpoint
-from config import DEFAULT_SYSTEM_PROMPT
-from database import get_db, UserCapture
-from schemas import UserCaptureCreate, UserCaptureUpdate, UserCaptureResponse
+from clients import client
+from prompts import list_prompts, get_prompt, DEFAULT_PROMPT_ID
+from database import get_db, UserCapture, CaptureEvent
+from schemas import (
+    UserCaptureCreate, UserCaptureUpdate, UserCaptureResponse, SimilarCaptureResponse, NearbyCaptureResponse, ArchivePartitionResponse,
+    SyncResponse, SyncPushResult, SyncPushResponse
+)
+from embeddings import get_store, index_capture, sync_store, remove_captures
+from events import record_event, change_feed
+from export import (
+    stream_captures, EXPORT_FORMATS, IMAGE_MODES, MEDIA_TYPES, FILE_EXTENSIONS, DEFAULT_CHUNK_SIZE, pa
+)
+from serialization import FastJSONResponse, CAPTURE_COLUMNS, capture_to_dict
+from spatial import nearby_captures
+from pdf_pipeline import spool_upload, ensure_pages, get_cached_page, summarize_document, PdfError
+from chat_sessions import chat_store
+from retention import list_partitions, stream_archived_ndjson
+from conditional import (
+    table_version, list_etag, capture_etag, cache_headers, is_not_modified, not_modified,
+    LIST_CACHE_CONTROL, CAPTURE_CACHE_CONTROL, VERSIONED_CACHE_CONTROL
+)
+from sqlalchemy import func
+import asyncio
+import os
 import logging
 
 logger = logging.getLogger(__name__)
@@ -18,28 +42,165 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/v1", tags=["v1"])
 
 @router.get("/user-captures/", response_model=List[UserCaptureResponse])
-def read_user_captures(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def read_user_captures(request: Request, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     """
     Retrieve a paginated list of user captures.
+    Supports If-None-Match / If-Modified-Since; unchanged lists return 304.
     """
     try:
-        captures = db.query(UserCapture).offset(skip).limit(limit).all()
+        version, last_modified = table_version(db)
+        headers = cache_headers(list_etag(request, version), last_modified, LIST_CACHE_CONTROL)
+        if is_not_modified(request, headers["ETag"], last_modified):
+            return not_modified(headers)
+        captures = db.query(*CAPTURE_COLUMNS).offset(skip).limit(limit).all()
         logger.info(f"Retrieved {len(captures)} user captures.")
-        return captures
+        return FastJSONResponse([capture_to_dict(capture) for capture in captures], headers=headers)
     except Exception as e:
         logger.error(f"Error retrieving user captures: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@router.get("/user-captures/export/")
+def export_user_captures(
+    format: str = Query("ndjson", description="ndjson | arrow | parquet"),
+    images: str = Query("full", description="full | omit | key (replace image with a sha256 blob key)"),
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    chunk_size: int = Query(DEFAULT_CHUNK_SIZE, ge=1, le=100000),
+):
+    """
+    Stream every user capture as NDJSON, Arrow IPC or Parquet.
+    Rows are read through a server-side cursor and sent with chunked encoding.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    if images not in IMAGE_MODES:
+        raise HTTPException(status_code=400, detail=f"images must be one of {', '.join(IMAGE_MODES)}")
+    if format != "ndjson" and pa is None:
+        raise HTTPException(status_code=501, detail="pyarrow is not installed on this server")
+
+    logger.info(f"Exporting user captures as {format} (images={images}).")
+    filename = f"user-captures.{FILE_EXTENSIONS[format]}"
+    return StreamingResponse(
+        stream_captures(format, images, chunk_size, start_time, end_time),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@router.get("/user-captures/archive/")
+def read_archived_user_captures(
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    user_id: Optional[str] = None,
+    images: str = Query("full", description="full | omit | key (replace image with a sha256 blob key)"),
+    limit: Optional[int] = Query(None, ge=1),
+):
+    """
+    Stream archived (retention-expired) captures as NDJSON in time order.
+    Only the day partitions inside [start_time, end_time] are read.
+    """
+    if images not in IMAGE_MODES:
+        raise HTTPException(status_code=400, detail=f"images must be one of {', '.join(IMAGE_MODES)}")
+
+    logger.info(f"Reading archived user captures from {start_time} to {end_time} (user={user_id}).")
+    return StreamingResponse(
+        stream_archived_ndjson(start_time=start_time, end_time=end_time, user_id=user_id, images=images, limit=limit),
+        media_type=MEDIA_TYPES["ndjson"],
+    )
+
+@router.get("/user-captures/archive/partitions", response_model=List[ArchivePartitionResponse])
+def read_archive_partitions():
+    """
+    List archived days with their part file count and size on disk.
+    """
+    try:
+        return [
+            ArchivePartitionResponse(date=day.isoformat(), files=len(parts), bytes=sum(p.stat().st_size for p in parts))
+            for day, parts in list_partitions()
+        ]
+    except Exception as e:
+        logger.error(f"Error listing archive partitions: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.get("/user-captures/events")
+async def stream_user_capture_events(
+    request: Request,
+    last_event_id: Optional[int] = Header(None),
+    since: Optional[int] = Query(None, description="Resume after this event id (for clients that cannot set Last-Event-ID)"),
+):
+    """
+    Server-Sent Events feed of capture inserts, updates and deletes.
+    Each event carries a slim record (no image); reconnect with Last-Event-ID to resume.
+    """
+    resume_from = last_event_id if last_event_id is not None else since
+
+    async def frames():
+        async for frame in change_feed.subscribe(resume_from):
+            if await request.is_disconnected():
+                break
+            yield frame
+
+    logger.info(f"Change feed subscriber connected (resume from {resume_from}, {change_feed.subscriber_count} active).")
+    return StreamingResponse(
+        frames(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/user-captures/nearby", response_model=List[NearbyCaptureResponse])
+def read_nearby_user_captures(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius_m: float = Query(500.0, gt=0, le=50000),
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db)
+):
+    """
+    Retrieve captures within radius_m metres of a point, nearest first.
+    """
+    try:
+        matches = nearby_captures(db, lat, lon, radius_m, limit)
+        logger.info(f"Found {len(matches)} captures within {radius_m} m of ({lat}, {lon}).")
+        return FastJSONResponse([
+            {"distance_m": round(float(distance), 2), "capture": capture_to_dict(capture)}
+            for distance, capture in matches
+        ])
+    except Exception as e:
+        logger.error(f"Error finding captures near ({lat}, {lon}): {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+def _capture_version(db: Session, *criteria):
+    """id, change_seq and last change time of a capture, without loading its body."""
+    return (
+        db.query(UserCapture.id, UserCapture.change_seq, UserCapture.created_at,
+                 CaptureEvent.created_at.label("changed_at"))
+        .outerjoin(CaptureEvent, CaptureEvent.id == UserCapture.change_seq)
+        .filter(*criteria)
+        .order_by(UserCapture.id)
+        .first()
+    )
+
+def _conditional_capture_response(request: Request, db: Session, version, requested_version: Optional[int] = None):
+    last_modified = version.changed_at or version.created_at
+    cache_control = (
+        VERSIONED_CACHE_CONTROL if requested_version is not None and requested_version == version.change_seq
+        else CAPTURE_CACHE_CONTROL
+    )
+    headers = cache_headers(capture_etag(version.id, version.change_seq), last_modified, cache_control)
+    if is_not_modified(request, headers["ETag"], last_modified):
+        return not_modified(headers)
+    capture = db.query(*CAPTURE_COLUMNS).filter(UserCapture.id == version.id).first()
+    return FastJSONResponse(capture_to_dict(capture), headers=headers)
+
 @router.get("/user-captures/by-user/{user_id}", response_model=UserCaptureResponse)
-def read_user_capture_by_user_id(user_id: str, db: Session = Depends(get_db)):
+def read_user_capture_by_user_id(user_id: str, request: Request, db: Session = Depends(get_db)):
     """
     Retrieve a specific user capture by user_id.
     """
     try:
-        capture = db.query(UserCapture).filter(UserCapture.user_id == user_id).first()
-        if capture is None:
+        version = _capture_version(db, UserCapture.user_id == user_id)
+        if version is None:
             raise HTTPException(status_code=404, detail="User capture not found")
-        return capture
+        return _conditional_capture_response(request, db, version)
     except HTTPException:
         raise
     except Exception as e:
@@ -47,27 +208,76 @@ def read_user_capture_by_user_id(user_id: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.get("/user-captures/{capture_id}", response_model=UserCaptureResponse)
-def read_user_capture_by_capture_id(capture_id: int, db: Session = Depends(get_db)):
+def read_user_capture_by_capture_id(
+    capture_id: int,
+    request: Request,
+    version: Optional[int] = Query(None, description="Expected change_seq; when current the client may reuse the response without revalidating"),
+    db: Session = Depends(get_db)
+):
     """
     Retrieve a specific user capture by capture_id.
+    The ETag carries the capture's change_seq; If-None-Match / If-Modified-Since return 304 when unchanged.
     """
     try:
-        capture = db.query(UserCapture).filter(UserCapture.id == capture_id).first()
-        if capture is None:
+        current = _capture_version(db, UserCapture.id == capture_id)
+        if current is None:
             raise HTTPException(status_code=404, detail="User capture not found")
-        return capture
+        return _conditional_capture_response(request, db, current, requested_version=version)
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Error retrieving user capture for capture_id {capture_id}: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@router.get("/user-captures/{capture_id}/similar", response_model=List[SimilarCaptureResponse])
+def read_similar_user_captures(capture_id: int, k: int = Query(5, ge=1, le=100), db: Session = Depends(get_db)):
+    """
+    Retrieve the k past captures whose images look most like this capture's image.
+    """
+    try:
+        store = get_store()
+        sync_store(store)  # pick up captures indexed by other replicas
+        vector = store.get(capture_id)
+        if vector is None:
+            capture = db.query(UserCapture).filter(UserCapture.id == capture_id).first()
+            if capture is None:
+                raise HTTPException(status_code=404, detail="User capture not found")
+            vector = index_capture(capture.id, capture.image)
+            if vector is None:
+                raise HTTPException(status_code=422, detail="User capture image could not be embedded")
+            sync_store(store)
+
+        matches = store.search(vector, k=k, exclude=capture_id)
+        captures = db.query(*CAPTURE_COLUMNS).filter(UserCapture.id.in_([cid for cid, _ in matches])).all()
+        by_id = {capture.id: capture for capture in captures}
+        logger.info(f"Found {len(matches)} captures similar to capture_id {capture_id}.")
+        return FastJSONResponse([
+            {"score": score, "capture": capture_to_dict(by_id[cid])}
+            for cid, score in matches
+            if cid in by_id
+        ])
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error finding captures similar to capture_id {capture_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
 @router.post("/user-captures/", response_model=UserCaptureResponse, status_code=status.HTTP_201_CREATED)
-def create_user_capture(capture_create: UserCaptureCreate, db: Session = Depends(get_db)):
+def create_user_capture(capture_create: UserCaptureCreate, background_tasks: BackgroundTasks,
+                        db: Session = Depends(get_db)):
     """
-    Create a new user capture.
+    Create a new user capture. The image is embedded for /similar after the response is sent.
     """
     try:
+        # Replayed offline upload: return the capture created the first time
+        if capture_create.client_capture_id:
+            replayed = db.query(UserCapture).filter(
+                UserCapture.client_capture_id == capture_create.client_capture_id
+            ).first()
+            if replayed:
+                logger.info(f"Replayed user capture for client_capture_id {capture_create.client_capture_id}")
+                return replayed
+
         # Check if user_id already exists (enforce uniqueness)
         existing = db.query(UserCapture).filter(UserCapture.user_id == capture_create.user_id).first()
         if existing:
@@ -75,8 +285,12 @@ def create_user_capture(capture_create: UserCaptureCreate, db: Session = Depends
         
         db_capture = UserCapture(**capture_create.dict())
         db.add(db_capture)
+        db.flush()
+        record_event(db, "insert", db_capture)
         db.commit()
         db.refresh(db_capture)
+        change_feed.notify()
+        background_tasks.add_task(index_capture, db_capture.id, db_capture.image)
         logger.info(f"Created user capture for user_id {capture_create.user_id}")
         return db_capture
     except HTTPException:
@@ -87,7 +301,8 @@ def create_user_capture(capture_create: UserCaptureCreate, db: Session = Depends
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.put("/user-captures/{capture_id}", response_model=UserCaptureResponse)
-def update_user_capture(capture_id: int, capture_update: UserCaptureUpdate, db: Session = Depends(get_db)):
+def update_user_capture(capture_id: int, capture_update: UserCaptureUpdate, background_tasks: BackgroundTasks,
+                        db: Session = Depends(get_db)):
     """
     Update an existing user capture by ID.
     """
@@ -100,8 +315,12 @@ def update_user_capture(capture_id: int, capture_update: UserCaptureUpdate, db:
         for field, value in update_data.items():
             setattr(db_capture, field, value)
         
+        record_event(db, "update", db_capture)
         db.commit()
         db.refresh(db_capture)
+        change_feed.notify()
+        if "image" in update_data:
+            background_tasks.add_task(index_capture, db_capture.id, db_capture.image)
         logger.info(f"Updated user capture ID {capture_id}")
         return db_capture
     except HTTPException:
@@ -113,6 +332,7 @@ def update_user_capture(capture_id: int, capture_update: UserCaptureUpdate, db:
     
 @router.get("/user-captures/time-range/", response_model=List[UserCaptureResponse])
 def read_user_captures_by_time_range(
+    request: Request,
     start_time: datetime,
     end_time: datetime,
     skip: int = 0,
@@ -126,14 +346,18 @@ def read_user_captures_by_time_range(
     try:
         if start_time > end_time:
             raise HTTPException(status_code=400, detail="start_time must be before end_time")
-        
-        query = db.query(UserCapture).filter(
+
+        version, last_modified = table_version(db)
+        headers = cache_headers(list_etag(request, version), last_modified, LIST_CACHE_CONTROL)
+        if is_not_modified(request, headers["ETag"], last_modified):
+            return not_modified(headers)
+        query = db.query(*CAPTURE_COLUMNS).filter(
             UserCapture.created_at >= start_time,
             UserCapture.created_at <= end_time
         )
         captures = query.offset(skip).limit(limit).all()
         logger.info(f"Retrieved {len(captures)} user captures from {start_time} to {end_time}.")
-        return captures
+        return FastJSONResponse([capture_to_dict(capture) for capture in captures], headers=headers)
     except HTTPException:
         raise
     except Exception as e:
@@ -151,7 +375,10 @@ def delete_user_capture(capture_id: int, db: Session = Depends(get_db)):
             raise HTTPException(status_code=404, detail="User capture not found")
         
         db.delete(db_capture)
+        record_event(db, "delete", db_capture)
         db.commit()
+        change_feed.notify()
+        remove_captures([capture_id])
         logger.info(f"Deleted user capture ID {capture_id}")
     except HTTPException:
         raise
@@ -160,17 +387,184 @@ def delete_user_capture(capture_id: int, db: Session = Depends(get_db)):
         logger.error(f"Error deleting user capture ID {capture_id}: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+def _sync_columns(include_images: bool):
+    columns = [
+        UserCapture.id, UserCapture.user_id, UserCapture.query_text, UserCapture.latitude,
+        UserCapture.longitude, UserCapture.ai_response, UserCapture.created_at,
+        UserCapture.change_seq, UserCapture.client_capture_id,
+    ]
+    if include_images:
+        columns.append(UserCapture.image)
+    return columns
+
+@router.get("/sync", response_model=SyncResponse)
+def sync_user_captures(
+    since: int = Query(0, ge=0, description="High-water mark from the previous sync; 0 for a full sync"),
+    limit: int = Query(500, ge=1, le=5000),
+    include_images: bool = False,
+    db: Session = Depends(get_db)
+):
+    """
+    Delta sync for offline clients: captures changed and ids deleted since the
+    given high-water mark, at most `limit` of the two together. If the event log no longer reaches back to `since`
+    (older events are pruned), the response has reset=true and no changes; the
+    client must discard its local copy and sync again from 0.
+    """
+    try:
+        oldest, latest = db.query(func.min(CaptureEvent.id), func.max(CaptureEvent.id)).one()
+        if since > 0 and (oldest is None or since < oldest - 1):
+            logger.info(f"Sync since {since} predates the event log (oldest {oldest}); asking for a reset.")
+            return FastJSONResponse({
+                "high_water_mark": 0, "has_more": True, "changed": [], "deleted": [], "reset": True,
+            })
+        latest = latest or 0
+        rows = (
+            db.query(*_sync_columns(include_images))
+            .filter(UserCapture.change_seq > since, UserCapture.change_seq <= latest)
+            .order_by(UserCapture.change_seq)
+            .limit(limit)
+            .all()
+        )
+        deletes = []
+        if since > 0:
+            deletes = (
+                db.query(CaptureEvent.id, CaptureEvent.capture_id)
+                .filter(CaptureEvent.op == "delete", CaptureEvent.id > since, CaptureEvent.id <= latest)
+                .order_by(CaptureEvent.id)
+                .limit(limit)
+                .all()
+            )
+
+        # Upserts and deletes share the event sequence, so one cursor pages through both
+        page = sorted(
+            [(row.change_seq, "changed", row) for row in rows]
+            + [(event.id, "deleted", event.capture_id) for event in deletes],
+            key=lambda entry: entry[0],
+        )
+        has_more = len(page) >= limit
+        page = page[:limit]
+        high_water_mark = page[-1][0] if has_more else latest
+        changed = [{"image": None, **row._mapping} for _, kind, row in page if kind == "changed"]
+        deleted = [capture_id for _, kind, capture_id in page if kind == "deleted"]
+
+        logger.info(f"Sync since {since}: {len(changed)} changed, {len(deleted)} deleted, hwm {high_water_mark}.")
+        return FastJSONResponse({
+            "high_water_mark": high_water_mark,
+            "has_more": has_more,
+            "changed": changed,
+            "deleted": deleted,
+            "reset": False,
+        })
+    except Exception as e:
+        logger.error(f"Error syncing user captures since {since}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.post("/sync/push", response_model=SyncPushResponse)
+def push_user_captures(captures: List[UserCaptureCreate], background_tasks: BackgroundTasks,
+                       db: Session = Depends(get_db)):
+    """
+    Apply a batch of queued offline captures in one round trip. Every capture needs a
+    client_capture_id; captures that were already applied are reported, not duplicated.
+    A capture whose user_id is already taken is not stored and comes back with conflict=true.
+    """
+    try:
+        if any(not capture.client_capture_id for capture in captures):
+            raise HTTPException(status_code=400, detail="Every capture needs a client_capture_id")
+
+        client_ids = [capture.client_capture_id for capture in captures]
+        applied = {
+            row.client_capture_id: row.id
+            for row in db.query(UserCapture.client_capture_id, UserCapture.id).filter(
+                UserCapture.client_capture_id.in_(client_ids)
+            )
+        }
+        # Same uniqueness rule as create_user_capture, checked per item
+        taken = {
+            row.user_id
+            for row in db.query(UserCapture.user_id).filter(
+                UserCapture.user_id.in_([capture.user_id for capture in captures])
+            )
+        }
+        results = []
+        created = []
+        conflicts = 0
+        for capture_create in captures:
+            if capture_create.client_capture_id in applied:
+                results.append(SyncPushResult(client_capture_id=capture_create.client_capture_id,
+                                              capture_id=applied[capture_create.client_capture_id], created=False))
+                continue
+            if capture_create.user_id in taken:
+                conflicts += 1
+                results.append(SyncPushResult(client_capture_id=capture_create.client_capture_id, created=False,
+                                              conflict=True))
+                continue
+            taken.add(capture_create.user_id)
+            db_capture = UserCapture(**capture_create.dict())
+            db.add(db_capture)
+            db.flush()
+            record_event(db, "insert", db_capture)
+            applied[capture_create.client_capture_id] = db_capture.id
+            created.append(db_capture)
+            results.append(SyncPushResult(client_capture_id=capture_create.client_capture_id,
+                                          capture_id=db_capture.id, created=True))
+        db.commit()
+        if created:
+            change_feed.notify()
+        for db_capture in created:
+            background_tasks.add_task(index_capture, db_capture.id, db_capture.image)
+        logger.info(f"Sync push: {len(created)} created, {len(captures) - len(created) - conflicts} already applied, "
+                    f"{conflicts} conflicting.")
+        return SyncPushResponse(results=results)
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error applying pushed user captures: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.get("/prompts", response_model=List[PromptInfo])
+def read_prompts():
+    """
+    List registered system prompts. Clients send prompt_id instead of the prompt text.
+    """
+    return [PromptInfo(prompt_id=p.prompt_id, **p.dict()) for p in list_prompts()]
+
+@router.get("/prompts/{prompt_id}", response_model=PromptInfo)
+def read_prompt(prompt_id: str):
+    """
+    Retrieve a registered prompt by name (latest version) or name@version.
+    """
+    prompt = get_prompt(prompt_id)
+    if prompt is None:
+        raise HTTPException(status_code=404, detail="Prompt not found")
+    return PromptInfo(prompt_id=prompt.prompt_id, **prompt.dict())
+
+@router.get("/backends")
+def read_backends():
+    """
+    Routing metrics for each inference backend (latency EWMA, in-flight requests, errors, health).
+    """
+    return client.metrics()
+
 @router.post("/indic_chat", response_model=ChatResponse)
 async def indic_chat_endpoint(chat_request: ChatRequest, api_key: Optional[str] = Header(None)):
-    """Handle chat requests (dummy implementation)."""
-    # In production, validate api_key and integrate real chat logic
-    return ChatResponse(
-        response=f"Response to: {chat_request.message}",
-        session_id=chat_request.session_id or "dummy_session"
-    )
+    """
+    Multi-turn chat. Omit session_id to start a session; send the returned id back to continue it.
+    Sessions expire after CHAT_SESSION_TTL_HOURS of inactivity.
+    """
+    # In production, validate api_key
+    if not chat_request.message.strip():
+        raise HTTPException(status_code=400, detail="message must not be empty")
+    try:
+        reply, session_id = await chat_store.turn(chat_request.session_id, chat_request.message)
+        return ChatResponse(response=reply, session_id=session_id)
+    except Exception as e:
+        logger.error(f"Error in chat session {chat_request.session_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.post("/indic_visual_query", response_model=VisualQueryResponse)
 async def indic_visual_query_endpoint(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     query: str = Form(...),
     src_lang: str = Query("eng_Latn"),
@@ -180,14 +574,17 @@ async def indic_visual_query_endpoint(
 ):
     """Handle visual queries via image upload."""
     # In production, validate api_key
-    # Pass system_prompt explicitly when calling internally
-    # Note: upload_image_query_endpoint now requires db, but since it's async and Depends, it should work
+    # Pass prompt_id and system_prompt explicitly when calling internally
+    # Dependencies are not injected on a direct call, so db and background_tasks are passed through
     response_content = await upload_image_query_endpoint(
+        background_tasks=background_tasks,
         text=query, 
-        system_prompt=DEFAULT_SYSTEM_PROMPT, 
+        prompt_id=DEFAULT_PROMPT_ID,
+        system_prompt=None,
         lat=52.5200,  # Default lat
         lon=13.4050,  # Default lon
         file=file,
+        client_capture_id=None,
         db=db
     )
     return VisualQueryResponse(
@@ -199,19 +596,38 @@ async def indic_visual_query_endpoint(
 @router.post("/extract-text", response_model=ExtractTextResponse)
 async def extract_text_endpoint(
     file: UploadFile = File(...),
-    page_number: int = Query(...),
+    page_number: int = Query(..., ge=1, description="1-based page number"),
     language: str = Query(...),
     api_key: Optional[str] = Header(None)
 ):
-    """Extract text from a specific PDF page (dummy implementation)."""
-    # In production, integrate real PDF extraction logic (e.g., using PyMuPDF or pdfplumber)
-    content = await file.read()
-    decoded_content = content[:200].decode('utf-8', errors='ignore')  # Limit for demo
-    return ExtractTextResponse(
-        extracted_text=f"Extracted from page {page_number}: {decoded_content}...",
-        page_number=page_number,
-        language=language
-    )
+    """
+    Extract the text of one PDF page.
+    Pages are cached by document hash; a cached page is returned without parsing the PDF.
+    """
+    path = None
+    try:
+        path, sha256 = await spool_upload(file)
+        text = await asyncio.to_thread(get_cached_page, sha256, page_number)
+        cached = text is not None
+        page_count = await ensure_pages(path, sha256, [page_number])
+        if not cached:
+            text = await asyncio.to_thread(get_cached_page, sha256, page_number)
+        logger.info(f"Extracted page {page_number}/{page_count} of PDF {sha256[:12]} (cached: {cached}).")
+        return ExtractTextResponse(
+            extracted_text=text or "",
+            page_number=page_number,
+            language=language,
+            page_count=page_count,
+            cached=cached,
+        )
+    except PdfError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error extracting page {page_number} of PDF: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+    finally:
+        if path:
+            os.unlink(path)
 
 @router.post("/indic-summarize-pdf-all", response_model=PdfSummaryResponse)
 async def indic_summarize_pdf_endpoint(
@@ -220,10 +636,31 @@ async def indic_summarize_pdf_endpoint(
     model: str = Form(...),
     api_key: Optional[str] = Header(None)
 ):
-    """Summarize entire PDF (dummy implementation)."""
-    # In production, integrate real PDF summarization (e.g., extract all pages and use LLM)
-    return PdfSummaryResponse(
-        summary="Dummy PDF summary in target language.",
-        tgt_lang=tgt_lang,
-        model=model
-    )
\ No newline at end of file
+    """
+    Summarize an entire PDF in the target language.
+    Pages are extracted in parallel, summarized in concurrent chunks and merged (map-reduce).
+    """
+    path = None
+    try:
+        path, sha256 = await spool_upload(file)
+        page_count = await ensure_pages(path, sha256)
+        os.unlink(path)  # Everything from here on reads the page cache
+        path = None
+        result = await summarize_document(sha256, page_count, tgt_lang, model)
+        return PdfSummaryResponse(
+            summary=result["summary"],
+            tgt_lang=tgt_lang,
+            model=model,
+            page_count=page_count,
+            model_calls=result["calls"],
+            input_tokens=result["input_tokens"],
+            budget_scale=result["budget_scale"],
+        )
+    except PdfError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error summarizing PDF: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+    finally:
+        if path:
+            os.unlink(path)
@@ -1,6 +1,6 @@
 # File: schemas.py (updated - added query_text and ai_response to UserCapture models)
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Optional, List
 from datetime import datetime
 
 
@@ -11,6 +11,7 @@ class UserCaptureCreate(BaseModel):
     latitude: float
     longitude: float
     ai_response: str
+    client_capture_id: Optional[str] = None  # Client-generated id; replays with the same id are no-ops
     # created_at is auto-generated in DB
 
 class UserCaptureUpdate(BaseModel):
@@ -33,4 +34,49 @@ class UserCaptureResponse(BaseModel):
     createdAt: datetime = Field(..., alias="created_at")
 
     class Config:
-        from_attributes = True  # Allows mapping from SQLAlchemy models
\ No newline at end of file
+        from_attributes = True  # Allows mapping from SQLAlchemy models
+
+class SimilarCaptureResponse(BaseModel):
+    score: float  # Cosine similarity in [-1, 1]
+    capture: UserCaptureResponse
+
+class ArchivePartitionResponse(BaseModel):
+    date: str  # UTC day, YYYY-MM-DD
+    files: int
+    bytes: int
+
+
+class SyncCapture(BaseModel):
+    id: int
+    user_id: str
+    query_text: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    ai_response: Optional[str] = None
+    created_at: Optional[datetime] = None
+    change_seq: int
+    client_capture_id: Optional[str] = None
+    image: Optional[str] = None  # Only included when requested
+
+    class Config:
+        from_attributes = True
+
+class SyncResponse(BaseModel):
+    high_water_mark: int  # Pass back as `since` on the next sync
+    has_more: bool
+    changed: List[SyncCapture]
+    deleted: List[int]
+    reset: bool = False  # Deletions since `since` were pruned: drop local captures and sync again from 0
+
+class SyncPushResult(BaseModel):
+    client_capture_id: str
+    capture_id: Optional[int] = None  # None on conflict
+    created: bool  # False when the upload had already been applied or conflicts
+    conflict: bool = False  # user_id already exists (the 409 of POST /v1/user-captures/); nothing was stored
+
+class SyncPushResponse(BaseModel):
+    results: List[SyncPushResult]
+
+class NearbyCaptureResponse(BaseModel):
+    distance_m: float
+    capture: UserCaptureResponse
@@ -0,0 +1,50 @@
+# File: serialization.py
+"""Fast JSON encoding for capture responses.
+
+Capture list endpoints build plain dicts straight from the selected columns
+and encode them with orjson, instead of validating every row into
+UserCaptureResponse and passing the result through jsonable_encoder and
+json.dumps. The JSON is the same as the response models produce (their
+aliases, ISO 8601 datetimes), so the models stay as the documented schema.
+"""
+import orjson
+from fastapi.responses import JSONResponse
+
+from database import UserCapture
+
+# Columns behind UserCaptureResponse; querying these skips building ORM objects
+CAPTURE_COLUMNS = (
+    UserCapture.id,
+    UserCapture.user_id,
+    UserCapture.query_text,
+    UserCapture.image,
+    UserCapture.latitude,
+    UserCapture.longitude,
+    UserCapture.ai_response,
+    UserCapture.created_at,
+)
+
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson."""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def capture_to_dict(capture) -> dict:
+    """UserCaptureResponse-shaped dict from an ORM capture or a CAPTURE_COLUMNS row."""
+    return {
+        "id": capture.id,
+        "user_id": capture.user_id,
+        "query_text": capture.query_text,
+        "image": capture.image,
+        "latitude": capture.latitude,
+        "longitude": capture.longitude,
+        "ai_response": capture.ai_response,
+        "created_at": capture.created_at,
+    }
@@ -0,0 +1,75 @@
+# File: spatial.py
+"""Radius queries over capture positions.
+
+On PostGIS the query runs in the database against the geography column and
+its GiST index. Elsewhere (SQLite, or Postgres without geoalchemy2) a
+latitude/longitude bounding box narrows the rows through
+``ix_user_captures_lat_lon`` and exact haversine distances are computed in
+Python.
+"""
+import math
+from typing import List, Tuple
+
+from sqlalchemy import func
+
+from database import UserCapture, USE_POSTGIS
+from serialization import CAPTURE_COLUMNS
+
+EARTH_RADIUS_M = 6371008.8
+
+
+def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(lat: float, lon: float, radius_m: float) -> Tuple[float, float, float, float]:
+    dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+    cos_lat = math.cos(math.radians(lat))
+    # Near the poles the longitude span covers everything
+    dlon = 180.0 if cos_lat < 1e-6 else min(180.0, math.degrees(radius_m / (EARTH_RADIUS_M * cos_lat)))
+    return lat - dlat, lat + dlat, lon - dlon, lon + dlon
+
+
+def nearby_captures(db, lat: float, lon: float, radius_m: float, limit: int) -> List[Tuple[float, object]]:
+    """(distance in metres, CAPTURE_COLUMNS row) pairs within ``radius_m``, nearest first."""
+    if USE_POSTGIS:
+        point = func.ST_SetSRID(func.ST_MakePoint(lon, lat), 4326).cast(UserCapture.location.type)
+        distance = func.ST_Distance(UserCapture.location, point).label("distance_m")
+        rows = (
+            db.query(*CAPTURE_COLUMNS, distance)
+            .filter(func.ST_DWithin(UserCapture.location, point, radius_m))
+            .order_by(distance)
+            .limit(limit)
+            .all()
+        )
+        return [(row.distance_m, row) for row in rows]
+
+    min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_m)
+    query = db.query(UserCapture.id, UserCapture.latitude, UserCapture.longitude).filter(
+        UserCapture.latitude.between(min_lat, max_lat), UserCapture.longitude.isnot(None)
+    )
+    if max_lon - min_lon < 360.0:
+        if min_lon < -180.0 or max_lon > 180.0:
+            # Box crosses the antimeridian
+            query = query.filter(
+                (UserCapture.longitude >= (min_lon + 360.0 if min_lon < -180.0 else min_lon))
+                | (UserCapture.longitude <= (max_lon - 360.0 if max_lon > 180.0 else max_lon))
+            )
+        else:
+            query = query.filter(UserCapture.longitude.between(min_lon, max_lon))
+
+    # Rank on positions only; load full rows for the winners
+    distances = []
+    for row in query:
+        distance = haversine_m(lat, lon, row.latitude, row.longitude)
+        if distance <= radius_m:
+            distances.append((distance, row.id))
+    distances.sort()
+    distances = distances[:limit]
+    rows = db.query(*CAPTURE_COLUMNS).filter(UserCapture.id.in_([cid for _, cid in distances])).all()
+    by_id = {row.id: row for row in rows}
+    return [(distance, by_id[cid]) for distance, cid in distances if cid in by_id]
@@ -0,0 +1,202 @@
+# File: structured_output.py
+"""Tolerant extraction of JSON objects from model output.
+
+Model replies often wrap JSON in prose or code fences, leave trailing commas,
+use Python literals, or get cut off by max_tokens. ``parse_structured`` finds
+the object with a brace-aware scan, repairs those defects, validates the
+result against a lightweight schema, and only as a last resort asks the model
+to fix its own output.
+"""
+import json
+import re
+from typing import Callable, List, Optional, Tuple
+
+_SPECIAL = re.compile(r'[{}\[\]"\\]')
+_STRING = r'"(?:\\.|[^"\\])*"'
+_TRAILING_COMMA = re.compile(_STRING + r'|,(\s*[}\]])')
+_PY_LITERAL = re.compile(_STRING + r'|\b(True|False|None)\b')
+_PY_TO_JSON = {"True": "true", "False": "false", "None": "null"}
+_MAX_TRIM_ATTEMPTS = 8
+
+
+class StructuredOutputError(ValueError):
+    """Raised when no schema-valid JSON object can be recovered."""
+
+    def __init__(self, message: str, errors: Optional[List[str]] = None):
+        super().__init__(message)
+        self.errors = errors or []
+
+
+def _scan(text: str, start: int) -> Tuple[int, List[str], bool]:
+    """Scan a JSON value starting at ``text[start]`` (a '{').
+
+    Returns (end, open_closers, in_string). ``end`` is one past the matching
+    brace when the object is balanced, otherwise ``len(text)`` with the
+    closers still owed in ``open_closers``.
+    """
+    stack = []
+    in_string = False
+    skip_to = -1
+    for match in _SPECIAL.finditer(text, start):
+        i = match.start()
+        if i < skip_to:
+            continue
+        ch = match.group()
+        if in_string:
+            if ch == "\\":
+                skip_to = i + 2
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch == "{":
+            stack.append("}")
+        elif ch == "[":
+            stack.append("]")
+        elif ch in "}]":
+            while stack and stack.pop() != ch:
+                pass
+            if not stack:
+                return i + 1, [], False
+    return len(text), stack, in_string
+
+
+def _close(fragment: str, closers: List[str], in_string: bool) -> str:
+    """Terminate a truncated JSON fragment."""
+    if in_string:
+        fragment += '"'
+    fragment = fragment.rstrip()
+    if fragment.endswith(":"):
+        fragment += " null"
+    fragment = fragment.rstrip(",").rstrip()
+    return fragment + "".join(reversed(closers))
+
+
+def _repair(candidate: str) -> str:
+    candidate = _TRAILING_COMMA.sub(lambda m: m.group(1) if m.group(1) is not None else m.group(0), candidate)
+    candidate = _PY_LITERAL.sub(lambda m: _PY_TO_JSON.get(m.group(1), m.group(0)) if m.group(1) else m.group(0), candidate)
+    return candidate
+
+
+def _loads(candidate: str):
+    try:
+        return json.loads(candidate, strict=False)
+    except json.JSONDecodeError:
+        return json.loads(_repair(candidate), strict=False)
+
+
+def extract_json(raw: str) -> dict:
+    """Return the first top-level JSON object that can be recovered from ``raw``.
+
+    Only top-level candidates are tried: when one fails, the scan resumes
+    after it rather than inside it, so a nested object (say one item of
+    ``recommended_actions``) is never returned in place of the reply. A
+    truncated candidate runs to the end of the text, so nothing follows it.
+    Raises StructuredOutputError when nothing parses.
+    """
+    if not raw:
+        raise StructuredOutputError("Empty model output")
+
+    stripped = raw.strip()
+    if stripped.startswith("{") and stripped.endswith("}"):
+        # Fast path: the model followed instructions and returned bare JSON
+        try:
+            return json.loads(stripped)
+        except json.JSONDecodeError:
+            pass
+
+    start = raw.find("{")
+    last_error = "No JSON object found"
+    while start != -1:
+        end, closers, in_string = _scan(raw, start)
+        fragment = raw[start:end]
+        if not closers and not in_string:
+            try:
+                return _loads(fragment)
+            except json.JSONDecodeError as e:
+                last_error = str(e)
+        else:
+            # Truncated output: close it, and if the tail is a half-written
+            # member, drop back to the previous comma and try again.
+            for _ in range(_MAX_TRIM_ATTEMPTS):
+                try:
+                    return _loads(_close(fragment, closers, in_string))
+                except json.JSONDecodeError as e:
+                    last_error = str(e)
+                cut = fragment.rfind(",")
+                if cut <= 0:
+                    break
+                fragment = fragment[:cut]
+                _, closers, in_string = _scan(fragment, 0)
+        start = raw.find("{", end)
+    raise StructuredOutputError(f"Invalid JSON from model: {last_error}")
+
+
+def validate(obj, schema, path: str = "$") -> List[str]:
+    """Check ``obj`` against a minimal schema and return a list of errors.
+
+    A schema is a type (or tuple of types), a dict of required keys to
+    sub-schemas, or a one-element list describing every item of a list.
+    """
+    if isinstance(schema, dict):
+        if not isinstance(obj, dict):
+            return [f"{path}: expected object"]
+        errors = []
+        for key, sub_schema in schema.items():
+            if key not in obj:
+                errors.append(f"{path}.{key}: missing")
+            else:
+                errors.extend(validate(obj[key], sub_schema, f"{path}.{key}"))
+        return errors
+    if isinstance(schema, list):
+        if not isinstance(obj, list):
+            return [f"{path}: expected array"]
+        errors = []
+        for i, item in enumerate(obj):
+            errors.extend(validate(item, schema[0], f"{path}[{i}]"))
+        return errors
+    if not isinstance(obj, schema):
+        return [f"{path}: expected {getattr(schema, '__name__', schema)}"]
+    return []
+
+
+def parse_structured(raw: str, schema=None, reprompt: Optional[Callable[[str, List[str]], str]] = None) -> dict:
+    """Extract, repair and validate JSON; call ``reprompt`` once if that fails.
+
+    ``reprompt(raw, errors)`` should return a corrected model reply; if it
+    raises (backend down, timeout), that surfaces as StructuredOutputError
+    with the original errors.
+    """
+    try:
+        result = extract_json(raw)
+        errors = validate(result, schema) if schema is not None else []
+    except StructuredOutputError as e:
+        errors = e.errors or [str(e)]
+    if not errors:
+        return result
+    if reprompt is None:
+        raise StructuredOutputError("Model output does not match the expected schema", errors)
+
+    try:
+        fixed_raw = reprompt(raw, errors)
+    except Exception as e:
+        raise StructuredOutputError("Model output does not match the expected schema and the repair request failed",
+                                    errors + [f"reprompt: {str(e)}"]) from e
+    fixed = extract_json(fixed_raw)
+    errors = validate(fixed, schema) if schema is not None else []
+    if errors:
+        raise StructuredOutputError("Model output does not match the expected schema", errors)
+    return fixed
+
+
+LAWN_PLAN_SCHEMA = {
+    "overall_assessment": str,
+    "recommended_actions": [
+        {
+            "title": str,
+            "how_to_do_it": str,
+        }
+    ],
+    "ongoing_maintenance": str,
+}
@@ -0,0 +1,177 @@
+import random
+
+import pytest
+
+from spatial import haversine_m
+
+
+def test_crud_round_trip(client, new_capture):
+    capture = new_capture(query_text="Is this moss?")
+    capture_id = capture["id"]
+    assert capture["query_text"] == "Is this moss?"
+
+    response = client.get(f"/v1/user-captures/{capture_id}")
+    assert response.status_code == 200
+    assert response.json()["user_id"] == capture["user_id"]
+
+    response = client.put(f"/v1/user-captures/{capture_id}", json={"ai_response": "Yes, moss."})
+    assert response.status_code == 200
+    assert response.json()["ai_response"] == "Yes, moss."
+    assert client.get(f"/v1/user-captures/by-user/{capture['user_id']}").json()["ai_response"] == "Yes, moss."
+
+    assert client.delete(f"/v1/user-captures/{capture_id}").status_code == 204
+    assert client.get(f"/v1/user-captures/{capture_id}").status_code == 404
+    assert client.delete(f"/v1/user-captures/{capture_id}").status_code == 404
+
+
+def test_versioned_capture_urls_are_only_cached_privately(client, new_capture):
+    capture_id = new_capture()["id"]
+    etag = client.get(f"/v1/user-captures/{capture_id}").headers["etag"]
+    change_seq = int(etag.rsplit("-v", 1)[1].rstrip('"'))
+
+    current = client.get(f"/v1/user-captures/{capture_id}", params={"version": change_seq})
+    cache_control = current.headers["cache-control"]
+    assert cache_control.startswith("private, max-age=")
+    assert "immutable" not in cache_control and "public" not in cache_control
+
+    stale = client.get(f"/v1/user-captures/{capture_id}", params={"version": change_seq - 1})
+    assert "s-maxage" in stale.headers["cache-control"]
+
+
+def test_nearby_orders_by_distance_and_respects_radius(client, new_capture):
+    # A spot no other test uses
+    lat, lon = -33.86 + random.random() * 0.01, 151.2 + random.random() * 0.01
+    offsets = [0.0002, 0.001, 0.0005, 0.01]  # degrees of latitude: ~22 m, 111 m, 56 m, 1.1 km
+    ids = [new_capture(latitude=lat + d, longitude=lon)["id"] for d in offsets]
+
+    response = client.get("/v1/user-captures/nearby", params={"lat": lat, "lon": lon, "radius_m": 200})
+    assert response.status_code == 200
+    matches = response.json()
+    assert [m["capture"]["id"] for m in matches] == [ids[0], ids[2], ids[1]]
+    for match, d in zip(matches, [offsets[0], offsets[2], offsets[1]]):
+        assert match["distance_m"] == pytest.approx(haversine_m(lat, lon, lat + d, lon), rel=1e-3)
+
+    limited = client.get("/v1/user-captures/nearby", params={"lat": lat, "lon": lon, "radius_m": 200, "limit": 1})
+    assert [m["capture"]["id"] for m in limited.json()] == [ids[0]]
+
+
+def test_nearby_across_the_antimeridian(client, new_capture):
+    lat = random.uniform(-10, 10)
+    east = new_capture(latitude=lat, longitude=179.9996)["id"]
+    west = new_capture(latitude=lat, longitude=-179.9996)["id"]
+    response = client.get("/v1/user-captures/nearby", params={"lat": lat, "lon": 179.9999, "radius_m": 200})
+    found = {m["capture"]["id"] for m in response.json()}
+    assert {east, west} <= found
+
+
+def _sync_to_end(client, since=0):
+    while True:
+        body = client.get("/v1/sync", params={"since": since, "limit": 5000}).json()
+        since = body["high_water_mark"]
+        if not body["has_more"]:
+            return body
+
+
+def test_sync_reports_changes_and_deletes(client, new_capture):
+    since = _sync_to_end(client)["high_water_mark"]
+    kept = new_capture()
+    removed = new_capture()
+    client.put(f"/v1/user-captures/{kept['id']}", json={"query_text": "edited"})
+    client.delete(f"/v1/user-captures/{removed['id']}")
+
+    body = client.get("/v1/sync", params={"since": since}).json()
+    changed = {c["id"]: c for c in body["changed"]}
+    assert kept["id"] in changed and changed[kept["id"]]["query_text"] == "edited"
+    assert changed[kept["id"]]["image"] is None  # images only on request
+    assert removed["id"] not in changed
+    assert removed["id"] in body["deleted"]
+    assert body["high_water_mark"] > since
+
+    again = client.get("/v1/sync", params={"since": body["high_water_mark"]}).json()
+    assert again["changed"] == [] and again["deleted"] == []
+
+
+def test_sync_pages_with_limit(client, new_capture):
+    since = _sync_to_end(client)["high_water_mark"]
+    created = [new_capture()["id"] for _ in range(5)]
+    seen = []
+    while True:
+        body = client.get("/v1/sync", params={"since": since, "limit": 2}).json()
+        seen.extend(c["id"] for c in body["changed"])
+        since = body["high_water_mark"]
+        if not body["has_more"]:
+            break
+    assert seen == created
+
+
+def test_sync_pages_deletes_with_the_same_cursor(client, new_capture):
+    since = _sync_to_end(client)["high_water_mark"]
+    created = [new_capture()["id"] for _ in range(4)]
+    for capture_id in created[:3]:
+        client.delete(f"/v1/user-captures/{capture_id}")
+    changed, deleted = [], []
+    while True:
+        body = client.get("/v1/sync", params={"since": since, "limit": 2}).json()
+        assert len(body["changed"]) + len(body["deleted"]) <= 2
+        changed.extend(c["id"] for c in body["changed"])
+        deleted.extend(body["deleted"])
+        since = body["high_water_mark"]
+        if not body["has_more"]:
+            break
+    assert changed == created[3:]
+    assert deleted == created[:3]
+
+
+def test_sync_push_is_idempotent(client, capture_payload):
+    payload = capture_payload(client_capture_id=f"offline-{random.getrandbits(64):016x}")
+    first = client.post("/v1/sync/push", json=[payload]).json()["results"][0]
+    second = client.post("/v1/sync/push", json=[payload]).json()["results"][0]
+    assert first["created"] is True and second["created"] is False
+    assert first["capture_id"] == second["capture_id"]
+
+    missing_id = capture_payload()
+    assert client.post("/v1/sync/push", json=[missing_id]).status_code == 400
+
+
+def test_sync_asks_for_reset_once_deletes_were_pruned(client, new_capture, db):
+    from datetime import datetime, timedelta
+    from database import CaptureEvent
+    from events import EVENT_LOG_RETENTION_DAYS, _prune_events
+
+    since = _sync_to_end(client)["high_water_mark"]
+    gone = new_capture()
+    client.delete(f"/v1/user-captures/{gone['id']}")
+    # Age out every event so far, including that delete
+    db.query(CaptureEvent).update(
+        {"created_at": datetime.utcnow() - timedelta(days=EVENT_LOG_RETENTION_DAYS + 1)}, synchronize_session=False
+    )
+    db.commit()
+    _prune_events()
+    new_capture()
+
+    body = client.get("/v1/sync", params={"since": since}).json()
+    assert body["reset"] is True
+    assert body["changed"] == [] and body["deleted"] == [] and body["high_water_mark"] == 0
+
+    full = _sync_to_end(client)
+    assert full["reset"] is False
+    assert client.get("/v1/sync", params={"since": full["high_water_mark"]}).json()["reset"] is False
+
+
+def test_sync_push_reports_user_id_conflicts_per_item(client, new_capture, capture_payload):
+    existing = new_capture()
+    fresh = capture_payload()
+    batch = [
+        capture_payload(user_id=existing["user_id"], client_capture_id=f"offline-{random.getrandbits(64):016x}"),
+        {**fresh, "client_capture_id": f"offline-{random.getrandbits(64):016x}"},
+        {**fresh, "client_capture_id": f"offline-{random.getrandbits(64):016x}"},
+    ]
+    response = client.post("/v1/sync/push", json=batch)
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [(r["created"], r["conflict"]) for r in results] == [(False, True), (True, False), (False, True)]
+    assert results[0]["capture_id"] is None and results[1]["capture_id"] is not None
+
+    # The stored item replays as applied, not as a conflict
+    again = client.post("/v1/sync/push", json=[batch[1]]).json()["results"][0]
+    assert (again["created"], again["conflict"], again["capture_id"]) == (False, False, results[1]["capture_id"])
@@ -0,0 +1,66 @@
+import asyncio
+
+from sqlalchemy import func
+
+from database import SessionLocal, CaptureEvent
+from events import ChangeFeed
+
+
+async def _next_frame(frames, timeout=5.0):
+    """Next event frame, skipping keep-alive comments."""
+    while True:
+        frame = await asyncio.wait_for(frames.__anext__(), timeout)
+        if not frame.startswith(b":"):
+            return frame.decode()
+
+
+def _latest_event_id():
+    db = SessionLocal()
+    try:
+        return db.query(func.max(CaptureEvent.id)).scalar() or 0
+    finally:
+        db.close()
+
+
+def test_change_feed_replays_then_streams_live(client, new_capture):
+    async def run():
+        feed = ChangeFeed()
+        await feed.start()
+        try:
+            before = await asyncio.to_thread(_latest_event_id)
+            first = await asyncio.to_thread(new_capture)
+            frames = feed.subscribe(last_event_id=before)
+
+            replayed = await _next_frame(frames)
+            assert "event: insert" in replayed and f'"id":{first["id"]}' in replayed.replace(" ", "")
+
+            second = await asyncio.to_thread(new_capture)
+            await asyncio.to_thread(client.delete, f"/v1/user-captures/{second['id']}")
+            live = [await _next_frame(frames), await _next_frame(frames)]
+            assert "event: insert" in live[0] and f'"id":{second["id"]}' in live[0].replace(" ", "")
+            assert "event: delete" in live[1]
+            await frames.aclose()
+        finally:
+            await feed.stop()
+
+    asyncio.run(run())
+
+
+def test_change_feed_without_last_event_id_starts_at_now(client, new_capture):
+    async def run():
+        feed = ChangeFeed()
+        await feed.start()
+        try:
+            await asyncio.to_thread(new_capture)  # history a fresh subscriber must not see
+            await asyncio.sleep(0.3)
+            frames = feed.subscribe()
+            pending = asyncio.ensure_future(_next_frame(frames))
+            await asyncio.sleep(0.1)
+            created = await asyncio.to_thread(new_capture)
+            frame = await pending
+            assert f'"id":{created["id"]}' in frame.replace(" ", "")
+            await frames.aclose()
+        finally:
+            await feed.stop()
+
+    asyncio.run(run())
@@ -0,0 +1,73 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import chat_sessions
+from chat_sessions import ChatStore
+
+
+class _EchoClient:
+    """Replies with the user message; records the prompt each call saw."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.prompts = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, messages, **kwargs):
+        self.prompts.append([m["content"] for m in messages])
+        time.sleep(self.latency(messages[-1]["content"]) if callable(self.latency) else self.latency)
+        message = SimpleNamespace(content=f"re: {messages[-1]['content']}")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+@pytest.fixture
+def echo(monkeypatch):
+    def install(latency=0.0):
+        fake = _EchoClient(latency)
+        monkeypatch.setattr(chat_sessions, "client", fake)
+        return fake
+    return install
+
+
+def test_concurrent_turns_on_one_session_run_in_order(echo):
+    fake = echo(latency=0.05)
+    store = ChatStore()
+
+    async def run():
+        _, session_id = await store.turn(None, "first")
+        return await asyncio.gather(*(store.turn(session_id, f"message {i}") for i in range(3)))
+
+    results = asyncio.run(run())
+
+    assert [reply for reply, _ in results] == ["re: message 0", "re: message 1", "re: message 2"]
+    # Every turn saw exactly the turns before it
+    for i, prompt in enumerate(fake.prompts[1:]):
+        assert [f"re: message {j}" in prompt for j in range(3)] == [j < i for j in range(3)]
+    assert not store._locks
+
+
+def test_session_in_use_is_not_evicted(echo):
+    echo(latency=lambda message: 0.3 if message == "slow" else 0.0)
+    store = ChatStore(capacity=1)
+
+    async def run():
+        _, busy = await store.turn(None, "hello")
+        slow = asyncio.create_task(store.turn(busy, "slow"))
+        while busy not in store._locks:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)  # the slow turn is in its model call
+        for i in range(3):
+            await store.turn(None, f"other {i}")
+            assert busy in store._hot
+        busy_session = store._hot[busy]
+        await slow
+        assert busy_session.messages[-1].content == "re: slow"
+        await store.turn(None, "after")
+        return busy
+
+    busy = asyncio.run(run())
+    assert len(store._hot) == 1 and busy not in store._hot
+    assert not store._locks
@@ -0,0 +1,145 @@
+import asyncio
+import gzip
+import json
+import zlib
+from datetime import datetime
+
+import brotli
+import pytest
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from middleware import CompressionMiddleware, negotiate_encoding
+from schemas import UserCaptureResponse
+from serialization import capture_to_dict, dumps
+
+BIG = "lawn " * 1000
+
+
+def _app():
+    app = FastAPI()
+
+    @app.get("/big")
+    def big():
+        return PlainTextResponse(BIG)
+
+    @app.get("/small")
+    def small():
+        return PlainTextResponse("short")
+
+    @app.get("/vary")
+    def vary():
+        return PlainTextResponse(BIG, headers={"Vary": "Origin"})
+
+    @app.get("/encoded")
+    def encoded():
+        return Response(gzip.compress(BIG.encode()), media_type="text/plain", headers={"Content-Encoding": "gzip"})
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse((f"line {i}\n" for i in range(3)), media_type="application/x-ndjson")
+
+    @app.get("/events")
+    def events():
+        return StreamingResponse(iter(["data: 1\n\n", "data: 2\n\n"]), media_type="text/event-stream")
+
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+    return app
+
+
+@pytest.fixture(scope="module")
+def compressed():
+    with TestClient(_app()) as test_client:
+        yield test_client
+
+
+def _raw_messages(app, path, accept_encoding):
+    """Every ASGI message the middleware sends, with bodies left compressed."""
+    messages = []
+    scope = {
+        "type": "http", "method": "GET", "path": path, "raw_path": path.encode(), "query_string": b"",
+        "headers": [(b"accept-encoding", accept_encoding.encode())], "http_version": "1.1", "scheme": "http",
+        "server": ("test", 80), "client": ("test", 1234), "root_path": "",
+    }
+
+    requests = [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receive():
+        if requests:
+            return requests.pop()
+        await asyncio.Event().wait()  # the client never disconnects
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    return messages
+
+
+def test_negotiation_prefers_brotli_then_gzip_then_identity():
+    assert negotiate_encoding("gzip, deflate, br") == "br"
+    assert negotiate_encoding("gzip, br;q=0.5") == "gzip"
+    assert negotiate_encoding("gzip") == "gzip"
+    assert negotiate_encoding("*") == "br"
+    assert negotiate_encoding("br;q=0, gzip;q=0") == ""
+    assert negotiate_encoding("deflate") == ""
+    assert negotiate_encoding("") == ""
+
+
+def test_large_bodies_are_compressed_with_the_negotiated_encoding(compressed):
+    for accept, encoding in (("gzip, br", "br"), ("gzip", "gzip")):
+        response = compressed.get("/big", headers={"Accept-Encoding": accept})
+        assert response.headers["content-encoding"] == encoding
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert int(response.headers["content-length"]) < len(BIG)
+        assert response.text == BIG
+
+    identity = compressed.get("/big", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in identity.headers and identity.text == BIG
+
+
+def test_small_and_already_encoded_bodies_pass_through(compressed):
+    small = compressed.get("/small", headers={"Accept-Encoding": "br"})
+    assert "content-encoding" not in small.headers and small.text == "short"
+
+    encoded = compressed.get("/encoded", headers={"Accept-Encoding": "br"})
+    assert encoded.headers["content-encoding"] == "gzip" and encoded.text == BIG
+
+
+def test_vary_keeps_existing_values(compressed):
+    response = compressed.get("/vary", headers={"Accept-Encoding": "gzip"})
+    assert [v.strip() for v in response.headers["vary"].split(",")] == ["Origin", "Accept-Encoding"]
+
+
+def test_streams_are_compressed_chunk_by_chunk_and_event_streams_pass_through():
+    app = _app()
+    messages = _raw_messages(app, "/stream", "gzip")
+    start, bodies = messages[0], [m for m in messages if m["type"] == "http.response.body"]
+    headers = dict(start["headers"])
+    assert headers[b"content-encoding"] == b"gzip" and b"content-length" not in headers
+    decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    # Each chunk is flushed, so it decodes before the stream ends
+    assert decoder.decompress(bodies[0]["body"]) == b"line 0\n"
+    assert b"".join(decoder.decompress(m["body"]) for m in bodies[1:]) == b"line 1\nline 2\n"
+
+    events = _raw_messages(app, "/events", "br")
+    assert b"content-encoding" not in dict(events[0]["headers"])
+    assert b"".join(m.get("body", b"") for m in events[1:]) == b"data: 1\n\ndata: 2\n\n"
+
+    br = _raw_messages(app, "/stream", "br")
+    assert brotli.decompress(b"".join(m.get("body", b"") for m in br[1:])) == b"line 0\nline 1\nline 2\n"
+
+
+def test_fast_json_matches_the_response_model_output():
+    # created_at columns hold naive UTC timestamps
+    for created_at in (datetime(2024, 5, 6, 7, 8, 9, 123456), datetime(2024, 5, 6, 7, 8, 9), datetime(2024, 5, 6, 7, 8, 9, 5)):
+        row = {
+            "id": 7, "user_id": "u", "query_text": "Klee? ✓", "image": "", "latitude": 51.75,
+            "longitude": 11.43, "ai_response": "ok", "created_at": created_at,
+        }
+        model = UserCaptureResponse.model_validate(row)
+        expected = json.loads(json.dumps(jsonable_encoder(model, by_alias=True)))
+        assert json.loads(dumps(capture_to_dict(type("Row", (), row)))) == expected
+        assert json.loads(dumps(row))["created_at"] == created_at.isoformat()
@@ -0,0 +1,120 @@
+import threading
+import time
+
+import pytest
+from sqlalchemy import inspect, text
+
+import database
+from database import engine, USE_POSTGIS, SessionLocal, UserCapture
+from migrations import run_migrations, startup_lock
+
+requires_postgres = pytest.mark.skipif(engine.dialect.name != "postgresql", reason="Postgres only")
+requires_postgis = pytest.mark.skipif(not USE_POSTGIS, reason="PostGIS only")
+
+
+def _columns():
+    return {c["name"] for c in inspect(engine).get_columns("user_captures")}
+
+
+def _indexes():
+    return {i["name"] for i in inspect(engine).get_indexes("user_captures")}
+
+
+def test_migrations_restore_missing_columns_and_indexes(client):
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_user_captures_created_at"))
+        conn.execute(text("ALTER TABLE user_captures DROP COLUMN image_preview_at"))
+    # Fresh connections, as a process starting against an older database would have;
+    # pooled SQLite connections can keep the schema they last saw
+    engine.dispose()
+    assert "image_preview_at" not in _columns()
+
+    run_migrations(engine, postgis=USE_POSTGIS)
+    run_migrations(engine, postgis=USE_POSTGIS)  # idempotent
+    engine.dispose()
+
+    assert {"change_seq", "client_capture_id", "image_preview_at"} <= _columns()
+    assert {"ix_user_captures_change_seq", "ix_user_captures_client_capture_id", "ix_user_captures_lat_lon",
+            "ix_user_captures_created_at"} <= _indexes()
+
+
+@requires_postgis
+def test_postgis_location_follows_lat_lon(new_capture):
+    capture = new_capture(latitude=10.0, longitude=20.0)
+    with engine.connect() as conn:
+        lon, lat = conn.execute(
+            text("SELECT ST_X(location::geometry), ST_Y(location::geometry) FROM user_captures WHERE id = :id"),
+            {"id": capture["id"]},
+        ).one()
+    assert (lat, lon) == pytest.approx((10.0, 20.0))
+    assert "ix_user_captures_location" in _indexes()
+
+
+def test_startup_lock_is_a_no_op_on_sqlite():
+    if engine.dialect.name == "postgresql":
+        pytest.skip("SQLite only")
+    with startup_lock(engine):
+        with startup_lock(engine):
+            pass
+
+
+@requires_postgres
+def test_startup_lock_serialises_replicas():
+    order = []
+    holding = threading.Event()
+
+    def first():
+        with startup_lock(engine):
+            holding.set()
+            time.sleep(0.3)
+            order.append("first released")
+
+    def second():
+        holding.wait()
+        with startup_lock(engine):
+            order.append("second acquired")
+
+    threads = [threading.Thread(target=first), threading.Thread(target=second)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(10)
+    assert order == ["first released", "second acquired"]
+
+
+@requires_postgres
+def test_pool_settings_and_concurrency():
+    assert engine.pool.size() == database.DB_POOL_SIZE
+    assert engine.pool._pre_ping
+
+    errors = []
+
+    def query():
+        try:
+            with engine.connect() as conn:
+                conn.execute(text("SELECT pg_sleep(0.05)"))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=query) for _ in range(database.DB_POOL_SIZE + database.DB_MAX_OVERFLOW)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(30)
+    assert errors == []
+
+
+def test_orm_round_trip(db):
+    capture = UserCapture(user_id="orm-round-trip", query_text="q", image="", latitude=1.5, longitude=2.5,
+                          ai_response="a")
+    db.add(capture)
+    db.commit()
+    other = SessionLocal()
+    try:
+        loaded = other.get(UserCapture, capture.id)
+        assert (loaded.user_id, loaded.latitude, loaded.longitude) == ("orm-round-trip", 1.5, 2.5)
+        assert loaded.created_at is not None
+    finally:
+        other.close()
+    db.delete(capture)
+    db.commit()
@@ -0,0 +1,38 @@
+import base64
+import io
+
+from PIL import Image
+
+from database import CaptureEmbedding
+from embeddings import _decode_image, local_descriptor
+
+
+def _jpeg(size=(1024, 768)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, (120, 160, 60)).save(buffer, format="JPEG")
+    return "data:image/jpeg;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+def test_jpeg_is_decoded_at_reduced_scale():
+    image = _jpeg()
+    assert _decode_image(image).size == (1024, 768)
+    reduced = _decode_image(image, (128, 128))
+    assert reduced.mode == "RGB"
+    assert 128 <= reduced.size[0] < 1024 and 128 <= reduced.size[1] < 768
+    assert local_descriptor(image).shape == (256,)
+
+
+def test_created_capture_is_embedded_after_the_response(client, capture_payload, db):
+    response = client.post("/v1/user-captures/", json=capture_payload(image=_jpeg((64, 64))))
+    assert response.status_code == 201
+    capture_id = response.json()["id"]
+    assert db.query(CaptureEmbedding).filter(CaptureEmbedding.capture_id == capture_id).count() == 1
+
+
+def test_uploaded_image_query_is_embedded_after_the_response(client, db):
+    image = base64.b64decode(_jpeg((64, 64)).split(",", 1)[1])
+    for path, form in (("/upload_image_query", {"text": "What is this?"}), ("/v1/indic_visual_query", {"query": "And this?"})):
+        before = db.query(CaptureEmbedding).count()
+        response = client.post(path, data=form, files={"file": ("lawn.jpg", image, "image/jpeg")})
+        assert response.status_code == 200, response.text
+        assert db.query(CaptureEmbedding).count() == before + 1
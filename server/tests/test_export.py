@@ -0,0 +1,81 @@
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+import export_captures
+from database import UserCapture
+from export import image_key, stream_captures
+
+IMAGE = "data:image/png;base64,iVBORw0KGgo="
+
+
+@pytest.fixture
+def exported(new_capture, db):
+    """Three captures alone in a one-hour window of their own."""
+    start = datetime(2001, 1, 1) + timedelta(hours=new_capture()["id"])
+    captures = [new_capture(image=IMAGE, query_text=f"export {i}") for i in range(3)]
+    for i, capture in enumerate(captures):
+        db.query(UserCapture).filter(UserCapture.id == capture["id"]).update(
+            {"created_at": start + timedelta(minutes=i)}
+        )
+    db.commit()
+    window = {"start_time": start.isoformat(), "end_time": (start + timedelta(hours=1)).isoformat()}
+    return captures, window
+
+
+def test_ndjson_export_streams_rows_with_each_image_mode(client, exported):
+    captures, window = exported
+    for images in ("full", "omit", "key"):
+        response = client.get("/v1/user-captures/export/", params={**window, "images": images, "chunk_size": 2})
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert [row["id"] for row in rows] == [capture["id"] for capture in captures]
+        assert rows[0]["query_text"] == "export 0"
+        if images == "full":
+            assert rows[0]["image"] == IMAGE
+        elif images == "omit":
+            assert "image" not in rows[0] and "image_key" not in rows[0]
+        else:
+            assert "image" not in rows[0] and rows[0]["image_key"] == image_key(IMAGE)
+
+    assert client.get("/v1/user-captures/export/", params={"format": "csv"}).status_code == 400
+    assert client.get("/v1/user-captures/export/", params={"images": "thumb"}).status_code == 400
+
+
+def test_export_is_encoded_one_chunk_at_a_time(exported):
+    _, window = exported
+    bounds = {name: datetime.fromisoformat(value) for name, value in window.items()}
+    chunks = list(stream_captures("ndjson", "omit", 1, **bounds))
+    assert len(chunks) == 3 and all(chunk.count(b"\n") == 1 for chunk in chunks)
+
+
+def test_parquet_export_round_trips(client, exported):
+    pq = pytest.importorskip("pyarrow.parquet")
+    captures, window = exported
+    response = client.get("/v1/user-captures/export/", params={**window, "format": "parquet", "images": "key"})
+    assert response.status_code == 200
+    table = pq.read_table(io.BytesIO(response.content))
+    assert table.column("id").to_pylist() == [capture["id"] for capture in captures]
+    assert table.column("image_key").to_pylist() == [image_key(IMAGE)] * 3
+    assert table.column("created_at").to_pylist()[0] == datetime.fromisoformat(window["start_time"])
+
+
+def test_command_line_export_writes_the_file(exported, tmp_path):
+    captures, window = exported
+    output = tmp_path / "captures.ndjson"
+    export_captures.main([
+        "--images", "omit", "--start-time", window["start_time"], "--end-time", window["end_time"], "-o", str(output),
+    ])
+    rows = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [row["id"] for row in rows] == [capture["id"] for capture in captures]
+    assert all("image" not in row for row in rows)
+
+    pq = pytest.importorskip("pyarrow.parquet")
+    parquet = tmp_path / "captures.parquet"
+    export_captures.main([
+        "--format", "parquet", "--start-time", window["start_time"], "--end-time", window["end_time"], "-o", str(parquet),
+    ])
+    assert pq.read_table(parquet).column("image").to_pylist() == [IMAGE] * 3
@@ -0,0 +1,122 @@
+import time
+
+import httpx
+import openai
+import pytest
+
+from inference import FAILURES_BEFORE_EJECT, Backend, BackendPool, FakeClient
+
+
+def _pool(*clients, **kwargs):
+    backends = [Backend(f"fake-{i}", client) for i, client in enumerate(clients)]
+    return BackendPool(backends, health_interval=0, **kwargs), backends
+
+
+def _chat(pool):
+    return pool.chat.completions.create(model="gemma3", messages=[{"role": "user", "content": "hi"}])
+
+
+def _bad_request():
+    request = httpx.Request("POST", "http://backend/v1/chat/completions")
+    return openai.BadRequestError("bad request", response=httpx.Response(400, request=request), body=None)
+
+
+def _unavailable():
+    request = httpx.Request("POST", "http://backend/v1/chat/completions")
+    return openai.InternalServerError("unavailable", response=httpx.Response(503, request=request), body=None)
+
+
+def test_ranking_prefers_the_faster_backend():
+    pool, (slow, fast) = _pool(FakeClient(latency=0.03), FakeClient(latency=0.001))
+    for backend in (slow, fast):
+        pool._invoke(backend, ("chat", "completions"), {"model": "gemma3", "messages": []})
+
+    assert pool.ranked()[0] is fast
+    for _ in range(5):
+        _chat(pool)
+    assert fast.requests > slow.requests
+
+
+def test_fast_failures_are_penalised_in_the_ranking():
+    pool, (slow, failing) = _pool(FakeClient(latency=0.02), FakeClient(failure_rate=1.0))
+    pool._invoke(slow, ("chat", "completions"), {"model": "gemma3", "messages": []})
+
+    _chat(pool)  # whichever goes first, the call succeeds via failover
+    with pytest.raises(ConnectionError):
+        pool._invoke(failing, ("chat", "completions"), {"model": "gemma3", "messages": []})
+
+    assert failing.ewma_latency > slow.ewma_latency
+    assert pool.ranked()[0] is slow
+
+
+def test_repeated_backend_failures_eject_and_fail_over():
+    failing_client = FakeClient(error=_unavailable, failure_rate=1.0)
+    pool, (failing, healthy) = _pool(failing_client, FakeClient())
+
+    for _ in range(FAILURES_BEFORE_EJECT):
+        with pytest.raises(openai.InternalServerError):
+            pool._invoke(failing, ("chat", "completions"), {"model": "gemma3", "messages": []})
+    assert failing.errors == FAILURES_BEFORE_EJECT
+    assert not failing.available(time.monotonic())
+
+    calls_before = failing_client.calls
+    for _ in range(3):
+        _chat(pool)
+    assert failing_client.calls == calls_before
+    assert pool.ranked()[-1] is failing
+    assert failing.metrics()["ejected"]
+
+
+def test_client_errors_are_raised_without_failover_or_penalty():
+    rejecting_client, other_client = FakeClient(error=_bad_request, failure_rate=1.0), FakeClient()
+    pool, (rejecting, other) = _pool(rejecting_client, other_client)
+    rejecting.ewma_latency, other.ewma_latency = 0.001, 1.0  # rejecting backend ranks first
+
+    for _ in range(FAILURES_BEFORE_EJECT + 1):
+        with pytest.raises(openai.BadRequestError):
+            _chat(pool)
+
+    assert other_client.calls == 0
+    assert rejecting.consecutive_failures == 0
+    assert rejecting.errors == 0
+    assert rejecting.outstanding == 0
+    assert rejecting.available(time.monotonic())
+
+
+def test_hedged_request_goes_to_the_next_backend_when_the_first_is_slow():
+    slow_client, fast_client = FakeClient(latency=0.5), FakeClient(latency=0.0)
+    pool, (slow, fast) = _pool(slow_client, fast_client, hedge_after=0.05)
+    slow.ewma_latency, fast.ewma_latency = 0.001, 0.002  # slow backend ranks first
+
+    start = time.perf_counter()
+    _chat(pool)
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.4
+    assert slow_client.calls == 1 and fast_client.calls == 1
+    assert fast.hedges_won == 1
+    pool.stop()
+
+
+def test_hedged_request_raises_client_errors_at_once():
+    rejecting_client, other_client = FakeClient(error=_bad_request, failure_rate=1.0), FakeClient()
+    pool, (rejecting, other) = _pool(rejecting_client, other_client, hedge_after=1.0)
+    rejecting.ewma_latency, other.ewma_latency = 0.001, 1.0
+
+    with pytest.raises(openai.BadRequestError):
+        _chat(pool)
+    assert other_client.calls == 0
+    pool.stop()
+
+
+def test_health_check_marks_unreachable_backends():
+    down_client = FakeClient(healthy=False)
+    pool, (down, up) = _pool(down_client, FakeClient())
+
+    pool.check_health()
+    assert not down.healthy and up.healthy
+    assert pool.ranked()[-1] is down
+
+    down_client.is_healthy = True
+    pool.check_health()
+    assert down.healthy
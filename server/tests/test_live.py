@@ -0,0 +1,72 @@
+import base64
+import io
+import threading
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from inference import FakeClient
+from routers import live
+
+
+def _frame(seed: int) -> str:
+    """A coarse random pattern, so frames differ even at signature size."""
+    pixels = np.random.default_rng(seed).integers(0, 256, (24, 32), dtype=np.uint8)
+    out = io.BytesIO()
+    Image.fromarray(pixels).resize((256, 192), Image.NEAREST).convert("RGB").save(out, format="JPEG")
+    return base64.b64encode(out.getvalue()).decode("ascii")
+
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    def install(latency=0.0):
+        fake = FakeClient(reply='{"hazard": "none"}', latency=latency)
+        monkeypatch.setattr(live, "client", fake)
+        return fake
+    return install
+
+
+def test_frame_is_analysed_and_an_unchanged_one_skipped(client, fake_model):
+    fake = fake_model()
+    with client.websocket_connect("/v1/live-analysis") as ws:
+        ws.send_json({"type": "frame", "frame_id": 1, "image": _frame(1), "lat": 52.5, "lon": 13.4})
+        result = ws.receive_json()
+        assert result["type"] == "result" and result["frame_id"] == 1
+        assert result["result"] == {"hazard": "none"}
+        assert (result["lat"], result["lon"]) == (52.5, 13.4)
+
+        ws.send_json({"type": "frame", "frame_id": 2, "image": _frame(1)})
+        assert ws.receive_json() == {"type": "skipped", "frame_id": 2, "reason": "unchanged"}
+    assert fake.calls == 1
+
+
+def test_waiting_frame_is_superseded_by_a_newer_one(client, fake_model):
+    started = threading.Event()
+
+    def latency():
+        started.set()
+        return 0.2
+
+    fake = fake_model(latency)
+    with client.websocket_connect("/v1/live-analysis") as ws:
+        ws.send_json({"type": "frame", "frame_id": 1, "image": _frame(1)})
+        assert started.wait(5)  # frame 1 is in its model call
+        ws.send_json({"type": "frame", "frame_id": 2, "image": _frame(2)})
+        ws.send_json({"type": "frame", "frame_id": 3, "image": _frame(3)})
+        messages = [ws.receive_json() for _ in range(3)]
+
+    assert {"type": "skipped", "frame_id": 2, "reason": "superseded"} in messages
+    assert [m["frame_id"] for m in messages if m["type"] == "result"] == [1, 3]
+    assert fake.calls == 2
+
+
+def test_non_object_json_is_reported_like_other_bad_input(client, fake_model):
+    fake_model()
+    with client.websocket_connect("/v1/live-analysis") as ws:
+        for text in ("[1, 2]", '"x"', "not json"):
+            ws.send_text(text)
+            message = ws.receive_json()
+            assert message["type"] == "error" and message["detail"]
+        ws.send_json({"type": "stats"})
+        assert ws.receive_json()["type"] == "stats"
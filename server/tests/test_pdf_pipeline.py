@@ -0,0 +1,66 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+import pdf_pipeline
+from database import PdfDocument, PdfPage
+from prompts import count_tokens
+
+
+def _sha():
+    return uuid.uuid4().hex * 2
+
+
+def _document(db, pages, **columns):
+    sha256 = _sha()
+    db.add(PdfDocument(sha256=sha256, page_count=len(pages), **columns))
+    for number, text in enumerate(pages, start=1):
+        db.add(PdfPage(sha256=sha256, page_number=number, text=text, token_count=count_tokens(text)))
+    db.commit()
+    return sha256
+
+
+def test_reduce_finishes_when_summaries_are_too_long_to_pack(db, monkeypatch):
+    chunk_tokens = 200
+    monkeypatch.setattr(pdf_pipeline, "PDF_CHUNK_TOKENS", chunk_tokens)
+    # Every partial summary takes more than half a chunk, so no two ever pack together
+    long_summary = "leaf " * 150
+    assert chunk_tokens / 2 < count_tokens(long_summary) <= chunk_tokens
+    calls = []
+
+    async def fake_complete(prompt_id, text, model, max_tokens):
+        calls.append(prompt_id)
+        return "final" if prompt_id == "pdf-reduce" else long_summary
+
+    monkeypatch.setattr(pdf_pipeline, "_complete", fake_complete)
+    sha256 = _document(db, ["page text " * 60 for _ in range(9)])
+
+    result = asyncio.run(asyncio.wait_for(pdf_pipeline.summarize_document(sha256, 9, "eng_Latn", "gemma3"), 10))
+
+    assert result["summary"] == "final"
+    assert calls[-1] == "pdf-reduce"
+    assert result["calls"] == len(calls) < 40
+
+
+def test_reduce_groups_always_shrink():
+    assert len(pdf_pipeline._reduce_groups(["a", "b", "c"], 1000)) == 1
+    assert pdf_pipeline._reduce_groups(["x" * 100, "y" * 100, "z" * 100], 1) == ["x" * 100 + "\n\n" + "y" * 100, "z" * 100]
+
+
+def test_cache_expires_by_last_use_not_first_upload(db):
+    old = datetime.utcnow() - timedelta(days=pdf_pipeline.PDF_CACHE_TTL_DAYS + 5)
+    in_use = _document(db, ["kept"], created_at=old, last_used_at=old)
+    unused = _document(db, ["dropped"], created_at=old, last_used_at=old)
+    legacy = _document(db, ["legacy"], created_at=old)
+    db.get(PdfDocument, legacy).last_used_at = None  # recorded before the column existed
+    db.commit()
+
+    assert pdf_pipeline._document_page_count(in_use) == 1  # a later request reads it
+    pdf_pipeline._record_document(_sha(), 3)  # recording a new document runs the expiry
+
+    db.expire_all()
+    assert db.get(PdfDocument, in_use).last_used_at > old
+    assert db.get(PdfDocument, unused) is None
+    assert db.get(PdfDocument, legacy) is None
+    assert db.query(PdfPage).filter(PdfPage.sha256 == unused).count() == 0
+    assert pdf_pipeline.get_cached_page(in_use, 1) == "kept"
@@ -0,0 +1,96 @@
+import math
+import time
+
+import numpy as np
+import pytest
+
+from planner import CoverageGrid, circle_polygon, plan_stripes
+
+TOLERANCE = 1e-4  # metres
+
+
+def _distance_to_edges(poly, points):
+    a = poly
+    b = np.roll(poly, -1, axis=0)
+    e = b - a
+    w = points[:, None, :] - a[None, :, :]
+    t = np.clip((w * e).sum(axis=2) / (e * e).sum(axis=1), 0.0, 1.0)
+    closest = a[None, :, :] + t[:, :, None] * e[None, :, :]
+    return np.hypot(*(points[:, None, :] - closest).transpose(2, 0, 1)).min(axis=1)
+
+
+def _contains(poly, points):
+    x, y = points[:, 0][:, None], points[:, 1][:, None]
+    x0, y0 = poly[:, 0], poly[:, 1]
+    x1, y1 = np.roll(x0, -1), np.roll(y0, -1)
+    crosses = (y0 <= y) != (y1 <= y)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        xs = x0 + (y - y0) * (x1 - x0) / (y1 - y0)
+    return (crosses & (xs > x)).sum(axis=1) % 2 == 1
+
+
+def _bad_legs(path, boundary, obstacles, step=0.02):
+    """Indices of legs with a sample outside the lawn or strictly inside an obstacle."""
+    bad = []
+    for i, (p, q) in enumerate(zip(path[:-1], path[1:])):
+        n = max(2, int(math.ceil(np.hypot(*(q - p)) / step)) + 1)
+        points = p + np.linspace(0, 1, n)[:, None] * (q - p)
+        outside = ~_contains(boundary, points) & (_distance_to_edges(boundary, points) > TOLERANCE)
+        blocked = np.zeros(len(points), dtype=bool)
+        for obstacle in obstacles:
+            blocked |= _contains(obstacle, points) & (_distance_to_edges(obstacle, points) > TOLERANCE)
+        if outside.any() or blocked.any():
+            bad.append(i)
+    return bad
+
+
+def _rectangle(width, height):
+    return np.array([[0, 0], [width, 0], [width, height], [0, height]], dtype=np.float64)
+
+
+def test_legs_avoid_circular_obstacle():
+    boundary = _rectangle(200, 150)
+    obstacles = [circle_polygon((100, 75), 10)]
+    plan = plan_stripes(boundary, obstacles, cutting_width=2.0)
+    assert _bad_legs(plan["path_xy"], boundary, obstacles) == []
+    assert plan["transit_length_m"] > 0
+
+
+@pytest.mark.parametrize("heading_deg", [0.0, 90.0, 35.0])
+def test_transits_stay_inside_concave_lawn(heading_deg):
+    # U shape: stripes across the arms must go round through the base, not across the notch
+    boundary = np.array([[0, 0], [60, 0], [60, 50], [40, 50], [40, 15], [20, 15], [20, 50], [0, 50]],
+                        dtype=np.float64)
+    obstacles = [np.array([[5, 3], [12, 3], [12, 9], [5, 9]], dtype=np.float64), circle_polygon((50, 30), 4)]
+    plan = plan_stripes(boundary, obstacles, cutting_width=1.5, heading_deg=heading_deg)
+    assert _bad_legs(plan["path_xy"], boundary, obstacles) == []
+
+
+def test_unreachable_part_raises():
+    boundary = _rectangle(40, 20)
+    wall = np.array([[19, -1], [21, -1], [21, 21], [19, 21]], dtype=np.float64)
+    with pytest.raises(ValueError):
+        plan_stripes(boundary, [wall], cutting_width=1.0, heading_deg=90.0)
+
+
+def test_following_the_plan_covers_the_lawn():
+    boundary = _rectangle(30, 20)
+    obstacles = [circle_polygon((15, 10), 3)]
+    plan = plan_stripes(boundary, obstacles, cutting_width=1.0)
+    grid = CoverageGrid(boundary, obstacles, resolution=0.1)
+    grid.update(plan["path_xy"], cutting_width=1.0)
+    assert grid.coverage > 0.97
+
+
+def test_realistic_lawn_plans_well_under_a_second():
+    boundary = _rectangle(200, 100)
+    obstacles = [circle_polygon(centre, radius) for centre, radius in
+                 [((30, 30), 5), ((70, 60), 8), ((110, 25), 6), ((150, 70), 10), ((180, 40), 4)]]
+    plan_stripes(_rectangle(10, 10), [circle_polygon((5, 5), 1)], cutting_width=1.0)  # warm up imports and caches
+
+    start = time.perf_counter()
+    plan = plan_stripes(boundary, obstacles, cutting_width=0.5)
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 1.0, f"planning took {elapsed:.2f}s"
+    assert plan["turns"] > 300 and plan["transit_length_m"] > 0
@@ -0,0 +1,84 @@
+import hashlib
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+import prompts
+from prompts import build_messages, count_tokens, get_prompt, register_prompt, resolve_system_prompt, usage_report
+
+
+def test_importing_prompts_does_not_load_the_tokenizer():
+    code = "import prompts; assert prompts._encoding.cache_info().currsize == 0"
+    server = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, "-c", code], cwd=server, check=True, timeout=60)
+
+
+def test_token_count_falls_back_to_a_length_estimate(monkeypatch):
+    monkeypatch.setattr(prompts, "_encoding", lambda: None)
+    assert count_tokens("") == 0
+    assert count_tokens("abcd") == 1
+    assert count_tokens("abcde") == 2
+
+
+def test_resolve_by_id_free_text_and_default():
+    registered = get_prompt("garden-watch")
+    assert resolve_system_prompt("garden-watch") is registered
+    assert resolve_system_prompt("garden-watch@1", "ignored when an id is given") is registered
+    assert resolve_system_prompt() is get_prompt(prompts.DEFAULT_PROMPT_ID)
+
+    # Legacy clients sending the registered text, even reformatted, share its prefix
+    reformatted = "\r\n" + registered.text.replace("\n", "  \r\n") + "\n\n"
+    assert resolve_system_prompt(system_prompt=reformatted) is registered
+
+    custom = resolve_system_prompt(system_prompt="  Only answer about hedges.  ")
+    assert (custom.name, custom.text) == ("custom", "Only answer about hedges.")
+    assert custom.token_count == count_tokens("Only answer about hedges.")
+
+    with pytest.raises(KeyError):
+        resolve_system_prompt("no-such-prompt")
+    with pytest.raises(KeyError):
+        resolve_system_prompt("garden-watch@99")
+
+
+def test_unknown_prompt_id_is_a_bad_request(client):
+    response = client.post("/text_query", json={"prompt": "x", "prompt_id": "no-such-prompt"})
+    assert response.status_code == 400
+    assert "no-such-prompt" in response.json()["detail"]
+
+
+def test_digest_is_stable_across_formatting_and_versions():
+    first = register_prompt("test-digest", 1, "Line one\nLine two")
+    second = register_prompt("test-digest", 2, "Line one   \r\nLine two\r\n")
+    assert first.sha256 == second.sha256 == hashlib.sha256(b"Line one\nLine two").hexdigest()
+    assert get_prompt("test-digest") is second and get_prompt("test-digest@1") is first
+
+
+def test_messages_put_the_system_prompt_first_and_the_image_last():
+    prompt = get_prompt("garden-watch")
+    messages = build_messages(prompt, "What is this?", "data:image/jpeg;base64,AAAA")
+    assert messages[0] == {"role": "system", "content": prompt.text}
+    assert [part["type"] for part in messages[1]["content"]] == ["text", "image_url"]
+    assert messages[1]["content"][-1]["image_url"]["url"] == "data:image/jpeg;base64,AAAA"
+
+    assert build_messages(None, "hi") == [{"role": "user", "content": "hi"}]
+    assert build_messages(prompt, None, "data:x")[1]["content"] == [{"type": "image_url", "image_url": {"url": "data:x"}}]
+
+
+def test_usage_report_includes_cached_tokens_when_reported():
+    prompt = get_prompt("garden-watch")
+    usage = SimpleNamespace(prompt_tokens=900, completion_tokens=40,
+                            prompt_tokens_details=SimpleNamespace(cached_tokens=512))
+    assert usage_report(SimpleNamespace(usage=usage), prompt) == {
+        "prompt_id": "garden-watch@1",
+        "system_prompt_tokens": prompt.token_count,
+        "prompt_tokens": 900,
+        "completion_tokens": 40,
+        "cached_tokens": 512,
+    }
+    assert usage_report(SimpleNamespace(usage=None)) == {
+        "prompt_id": None, "system_prompt_tokens": 0, "prompt_tokens": None, "completion_tokens": None,
+        "cached_tokens": None,
+    }
@@ -0,0 +1,99 @@
+"""Behaviour that must hold when several API replicas share one database."""
+import base64
+import io
+import threading
+import time
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from database import SessionLocal, UserCapture, engine
+from embeddings import VectorStore, index_capture, remove_captures, sync_store
+from events import record_event
+
+requires_postgres = pytest.mark.skipif(engine.dialect.name != "postgresql", reason="Postgres only")
+
+
+def _image(pattern: int, colour) -> str:
+    """A textured image; the same pattern with a similar colour looks alike."""
+    texture = np.random.default_rng(pattern).random((32, 32, 1))
+    pixels = (texture * np.array(colour)).astype(np.uint8)
+    out = io.BytesIO()
+    Image.fromarray(pixels).save(out, format="PNG")
+    return base64.b64encode(out.getvalue()).decode("ascii")
+
+
+@requires_postgres
+def test_event_ids_commit_in_id_order():
+    """A later event id must not become visible before an earlier one."""
+    first = SessionLocal()
+    capture = UserCapture(user_id="ordering-1", query_text="q", image="", latitude=0.0, longitude=0.0,
+                          ai_response="a")
+    first.add(capture)
+    first.flush()
+    first_event_id = record_event(first, "insert", capture).id
+
+    second_result = {}
+
+    def second_writer():
+        db = SessionLocal()
+        try:
+            other = UserCapture(user_id="ordering-2", query_text="q", image="", latitude=0.0, longitude=0.0,
+                                ai_response="a")
+            db.add(other)
+            db.flush()
+            second_result["event_id"] = record_event(db, "insert", other).id
+            db.commit()
+            second_result["committed_at"] = time.monotonic()
+        finally:
+            db.close()
+
+    thread = threading.Thread(target=second_writer)
+    thread.start()
+    time.sleep(0.3)
+    assert "committed_at" not in second_result  # waits for the open transaction
+    first_committed_at = time.monotonic()
+    first.commit()
+    first.close()
+    thread.join(10)
+
+    assert second_result["committed_at"] >= first_committed_at
+    assert second_result["event_id"] > first_event_id
+
+
+def test_embedding_index_is_shared_between_replicas(tmp_path, new_capture, db):
+    replica_a = VectorStore(tmp_path / "a.embeddings")
+    replica_b = VectorStore(tmp_path / "b.embeddings")
+    red = new_capture(image=_image(1, (220, 30, 30)))
+    reddish = new_capture(image=_image(1, (200, 40, 40)))
+    blue = new_capture(image=_image(2, (30, 30, 220)))
+    for capture in (red, reddish, blue):
+        index_capture(capture["id"], db.get(UserCapture, capture["id"]).image)  # as if indexed on whichever replica took the upload
+
+    sync_store(replica_a)
+    sync_store(replica_b)
+    query = replica_a.get(red["id"])
+    assert query is not None
+    assert np.allclose(query, replica_b.get(red["id"]), atol=1e-3)
+    results_a = replica_a.search(query, k=2, exclude=red["id"])
+    results_b = replica_b.search(query, k=2, exclude=red["id"])
+    assert [cid for cid, _ in results_a] == [cid for cid, _ in results_b]
+    assert results_a[0][0] == reddish["id"]
+
+    remove_captures([reddish["id"]])
+    assert sync_store(replica_b) == 1
+    assert reddish["id"] not in replica_b
+    assert reddish["id"] in replica_a  # until it syncs
+    sync_store(replica_a)
+    assert reddish["id"] not in replica_a
+
+
+def test_similar_endpoint_sees_captures_indexed_elsewhere(client, new_capture, db):
+    green = new_capture(image=_image(3, (30, 200, 30)))
+    greenish = new_capture(image=_image(3, (40, 190, 40)))
+    # Written straight to the shared log, never through this process's store
+    index_capture(greenish["id"], db.get(UserCapture, greenish["id"]).image)
+    response = client.get(f"/v1/user-captures/{green['id']}/similar", params={"k": 1})
+    assert response.status_code == 200
+    assert response.json()[0]["capture"]["id"] == greenish["id"]
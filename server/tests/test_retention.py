@@ -0,0 +1,128 @@
+import base64
+import io
+import json
+from datetime import datetime, timedelta
+
+import numpy as np
+from PIL import Image
+
+import retention
+from database import UserCapture
+
+OLD = datetime.utcnow() - timedelta(days=400)
+
+
+def _photo(seed: int) -> str:
+    """A noisy JPEG, large enough that its preview is smaller."""
+    pixels = np.random.default_rng(seed).integers(0, 256, (600, 800, 3), dtype=np.uint8)
+    out = io.BytesIO()
+    Image.fromarray(pixels).save(out, format="JPEG", quality=95)
+    return "data:image/jpeg;base64," + base64.b64encode(out.getvalue()).decode("ascii")
+
+
+def _backdate(db, capture_id: int, created_at: datetime):
+    db.query(UserCapture).filter(UserCapture.id == capture_id).update({"created_at": created_at})
+    db.commit()
+
+
+def _drain(step, cutoff):
+    total = 0
+    while True:
+        handled = step(cutoff)
+        if handled == 0:
+            return total
+        total += handled
+
+
+def test_archive_round_trip_with_time_and_user_filters(client, new_capture, db):
+    captures = [
+        new_capture(user_id="archive-alice-1", query_text="day one"),
+        new_capture(user_id="archive-bob-1", query_text="day one"),
+        new_capture(user_id="archive-alice-2", query_text="day two"),
+    ]
+    days = [OLD, OLD + timedelta(hours=1), OLD + timedelta(days=1)]
+    for capture, created_at in zip(captures, days):
+        _backdate(db, capture["id"], created_at)
+    since = db.query(UserCapture.change_seq).filter(UserCapture.id == captures[-1]["id"]).scalar()
+
+    assert _drain(retention.archive_batch, OLD + timedelta(days=2)) >= 3
+    ids = [capture["id"] for capture in captures]
+    assert db.query(UserCapture).filter(UserCapture.id.in_(ids)).count() == 0
+
+    archived = {record["id"]: record for record in retention.iter_archived(start_time=OLD - timedelta(minutes=1))}
+    for capture in captures:
+        record = archived[capture["id"]]
+        assert record["user_id"] == capture["user_id"]
+        assert record["query_text"] == capture["query_text"]
+
+    first_day = list(retention.iter_archived(start_time=OLD - timedelta(minutes=1), end_time=OLD + timedelta(hours=2)))
+    assert {r["id"] for r in first_day} >= set(ids[:2]) and ids[2] not in {r["id"] for r in first_day}
+    bob = list(retention.iter_archived(user_id="archive-bob-1", images="omit"))
+    assert [r["id"] for r in bob] == [ids[1]] and "image" not in bob[0]
+    assert list(retention.iter_archived(start_time=OLD - timedelta(minutes=1), limit=1))
+
+    days_listed = {day for day, _ in retention.list_partitions()}
+    assert {OLD.date(), (OLD + timedelta(days=1)).date()} <= days_listed
+
+    response = client.get("/v1/user-captures/archive/", params={"user_id": "archive-alice-2"})
+    assert response.status_code == 200
+    assert ids[2] in [json.loads(line)["id"] for line in response.text.splitlines()]
+
+    deleted = client.get("/v1/sync", params={"since": since}).json()["deleted"]
+    assert set(ids) <= set(deleted)
+
+
+def test_preview_replaces_image_and_bumps_change_seq(client, new_capture, db):
+    capture = new_capture(image=_photo(1))
+    _backdate(db, capture["id"], datetime.utcnow() - timedelta(days=100))
+    before = db.query(UserCapture.change_seq).filter(UserCapture.id == capture["id"]).scalar()
+    etag = client.get(f"/v1/user-captures/{capture['id']}").headers["etag"]
+
+    assert retention.downscale_batch(datetime.utcnow() - timedelta(days=90)) >= 1
+
+    db.expire_all()
+    row = db.get(UserCapture, capture["id"])
+    assert row.change_seq > before
+    assert row.image_preview_at is not None
+    assert len(row.image) < len(capture["image"])
+    assert client.get(f"/v1/user-captures/{capture['id']}", headers={"If-None-Match": etag}).status_code == 200
+    changed = client.get("/v1/sync", params={"since": before}).json()["changed"]
+    assert capture["id"] in [c["id"] for c in changed]
+
+    # Already handled: a second pass leaves it alone
+    seq = row.change_seq
+    retention.downscale_batch(datetime.utcnow() - timedelta(days=90))
+    db.expire_all()
+    assert db.get(UserCapture, capture["id"]).change_seq == seq
+
+
+def test_only_one_retention_pass_holds_the_lock():
+    with retention.retention_lock() as first:
+        assert first
+        with retention.retention_lock() as second:
+            assert not second
+    with retention.retention_lock() as again:
+        assert again
+
+
+def test_rearchived_batch_is_read_once_without_hiding_later_parts():
+    day = (OLD - timedelta(days=30)).date()
+    start = datetime.combine(day, datetime.min.time())
+
+    def record(capture_id, hour):
+        created_at = (start + timedelta(hours=hour)).isoformat()
+        return {field: None for field in retention.ARCHIVE_FIELDS} | {
+            "id": capture_id, "user_id": f"rearchived-{capture_id}", "created_at": created_at,
+        }
+
+    # A crash after the first part, then a retry that picked up one more row,
+    # then later runs that archived an older id created later in the day and a newer one
+    retention._write_part(day, [record(10, 1), record(12, 2)])
+    retention._write_part(day, [record(10, 1), record(12, 2), record(14, 3)])
+    retention._write_part(day, [record(11, 20)])
+    separate = retention._write_part(day, [record(30, 21)])
+
+    window = {"start_time": start, "end_time": start + timedelta(days=1) - timedelta(seconds=1)}
+    assert [r["id"] for r in retention.iter_archived(**window)] == [10, 12, 14, 11, 30]
+    parts = retention.list_partitions(day, day)[0][1]
+    assert retention._overlapping_parts(parts) == set(parts) - {separate}
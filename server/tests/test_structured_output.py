@@ -0,0 +1,33 @@
+import pytest
+
+from structured_output import LAWN_PLAN_SCHEMA, StructuredOutputError, extract_json, parse_structured
+
+PLAN = ('{"overall_assessment": "Patchy", "recommended_actions": [{"title": "Rake", "how_to_do_it": "Rake it."}], '
+        '"ongoing_maintenance": "Mow weekly"}')
+
+
+def test_wrapped_and_truncated_replies_are_recovered():
+    assert extract_json(f"Here is the plan:\n```json\n{PLAN}\n```")["overall_assessment"] == "Patchy"
+    truncated = extract_json(PLAN[:PLAN.index('"ongoing_maintenance"') + 30])
+    assert truncated["recommended_actions"][0]["title"] == "Rake"
+
+
+def test_inner_object_is_not_returned_when_the_outer_one_fails():
+    broken = PLAN.replace('"Mow weekly"', "mow weekly")  # unquoted value: the outer object cannot be repaired
+    with pytest.raises(StructuredOutputError):
+        extract_json(broken)
+
+
+def test_later_top_level_object_is_still_found():
+    reply = "Format: {plan goes here}. Result: " + PLAN
+    assert extract_json(reply)["ongoing_maintenance"] == "Mow weekly"
+
+
+def test_failing_reprompt_raises_structured_output_error():
+    def reprompt(raw, errors):
+        raise ConnectionError("backend unavailable")
+
+    with pytest.raises(StructuredOutputError) as excinfo:
+        parse_structured('{"overall_assessment": "only this"}', LAWN_PLAN_SCHEMA, reprompt=reprompt)
+    assert any("backend unavailable" in error for error in excinfo.value.errors)
+    assert parse_structured("no json", LAWN_PLAN_SCHEMA, reprompt=lambda raw, errors: PLAN)["overall_assessment"]